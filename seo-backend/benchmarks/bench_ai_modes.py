@@ -0,0 +1,52 @@
+"""Compare the per-section and structured (single call) AI report modes.
+
+Reports requests, prompt/completion tokens and wall time per report for each
+mode against a local fake OpenAI-compatible server.
+
+Usage: python benchmarks/bench_ai_modes.py [keywords] [delay_seconds]
+"""
+import os
+import sys
+import time
+
+from common import StubOpenAIHandler, create_bench_app, start_stub_server
+
+
+def main():
+    keyword_count = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    server, base_url = start_stub_server(StubOpenAIHandler, delay)
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    # Every run pays for its completions; the LLM cache is measured by bench_llm_cache
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    from src.services.ai_report_service import AIReportService
+
+    keywords = [f'keyword {i}' for i in range(keyword_count)]
+    customer = {'website_url': 'https://example.com', 'target_keywords': keywords,
+                'subscription_plan': 'professional'}
+    seo_data = {'keyword_rankings': {k: {'current_rank': i % 20 or None} for i, k in enumerate(keywords)},
+                'keyword_data': {k: {'search_volume': 100 * i, 'difficulty': 40} for i, k in enumerate(keywords)},
+                'competitors': [{'url': f'https://competitor{i}.example', 'average_rank': i} for i in range(5)],
+                'technical_audit': {'critical': ['Missing meta descriptions'], 'warnings': ['Slow pages']}}
+
+    print(f"{keyword_count} keywords, {delay * 1000:.0f} ms per completion")
+    print(f"{'mode':<12}{'requests':>10}{'prompt tok':>12}{'compl. tok':>12}{'seconds':>10}")
+    app = create_bench_app()
+    with app.app_context():
+        for mode in AIReportService.GENERATION_MODES:
+            service = AIReportService(generation_mode=mode)
+            start = time.perf_counter()
+            report = service.generate_seo_analysis(customer, seo_data)
+            elapsed = time.perf_counter() - start
+            assert set(report) == set(AIReportService.SECTIONS)
+            usage = service.usage
+            print(f"{mode:<12}{usage['requests']:>10}{usage['prompt_tokens']:>12}"
+                  f"{usage['completion_tokens']:>12}{elapsed:>10.2f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark sequential vs. parallel AI report section generation.
+
+Runs AIReportService.generate_seo_analysis against a local fake
+OpenAI-compatible server that answers every request after a fixed delay.
+
+Usage: python benchmarks/bench_ai_sections.py [delay_seconds]
+"""
+import os
+import sys
+import time
+
+from common import StubOpenAIHandler, create_bench_app, start_stub_server
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    server, base_url = start_stub_server(StubOpenAIHandler, delay)
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    # Every run pays for its completions; the LLM cache is measured by bench_llm_cache
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    from src.services.ai_report_service import AIReportService
+
+    customer = {'website_url': 'https://example.com', 'target_keywords': ['seo', 'web design'],
+                'subscription_plan': 'professional'}
+    seo_data = {'keyword_rankings': {'seo': {'current_rank': 4}, 'web design': {'current_rank': None}},
+                'keyword_data': {'seo': {'search_volume': 1000, 'difficulty': 40}},
+                'competitors': [{'url': 'https://competitor.example', 'average_rank': 2}],
+                'technical_audit': {'critical': ['Missing meta descriptions'], 'warnings': []}}
+
+    print(f"{delay * 1000:.0f} ms per completion")
+    app = create_bench_app()
+    with app.app_context():
+        for max_workers in (1, len(AIReportService.SECTIONS)):
+            service = AIReportService(max_workers=max_workers)
+            start = time.perf_counter()
+            report = service.generate_seo_analysis(customer, seo_data)
+            elapsed = time.perf_counter() - start
+            assert set(report) == set(AIReportService.SECTIONS)
+            print(f"max_workers={max_workers}  {elapsed:6.2f} s")
+
+        # A section slower than its timeout falls back instead of holding up the report
+        service = AIReportService(section_timeout=delay / 2)
+        start = time.perf_counter()
+        report = service.generate_seo_analysis(customer, seo_data)
+        print(f"section_timeout={delay / 2:.2f}s  {time.perf_counter() - start:6.2f} s (all sections fell back)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
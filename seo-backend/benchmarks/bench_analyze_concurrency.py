@@ -0,0 +1,44 @@
+"""Benchmark sequential vs. concurrent analyze_customer_seo against a stub DataForSEO server.
+
+Usage: python benchmarks/bench_analyze_concurrency.py [keywords] [latency_seconds]
+"""
+import sys
+import time
+
+from common import StubDataForSEOHandler, create_bench_app, start_stub_server
+from src.services.dataforseo_service import DataForSEOService
+
+
+def run(max_workers: int, keywords, latency: float) -> float:
+    server, base_url = start_stub_server(StubDataForSEOHandler, latency)
+    app = create_bench_app()
+
+    with app.app_context():
+        service = DataForSEOService(max_workers=max_workers, max_per_host=max_workers, serp_batch_size=1)
+        service.base_url = base_url
+
+        start = time.perf_counter()
+        results = service.analyze_customer_seo({
+            'website_url': 'https://site3.example',
+            'target_keywords': keywords
+        })
+        elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    assert list(results['keyword_rankings']) == keywords
+    return elapsed
+
+
+def main():
+    keyword_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    keywords = [f"keyword {i}" for i in range(keyword_count)]
+
+    print(f"{keyword_count} keywords, {latency * 1000:.0f} ms injected latency per call")
+    for max_workers in sorted({1, 8, 32, keyword_count + 2}):
+        elapsed = run(max_workers, keywords, latency)
+        print(f"max_workers={max_workers:<4} {elapsed:7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark a batch refresh with the sync and the async DataForSEO clients.
+
+Fetches SERP results for a list of uncached keywords from a stub server,
+one task per POST (as DataForSEO's live endpoints take them), with the
+thread-pooled sync client and with AsyncDataForSEOService on one event
+loop. Reports wall time, POSTs, connections opened and peak thread count.
+
+The stub speaks HTTP/1.1, so the async client does too here; against the
+real API it negotiates HTTP/2 when h2 is installed.
+
+Usage: python benchmarks/bench_async_dataforseo.py [keywords] [latency_seconds]
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Both clients share dataforseo_scheduler, so its cap must admit the async client's concurrency
+os.environ.setdefault('DATAFORSEO_MAX_CONCURRENCY', '200')
+
+from common import StubDataForSEOHandler, create_bench_app, start_stub_server
+from src.services.async_dataforseo_service import (
+    ASYNC_MAX_CONCURRENCY, HTTP2_AVAILABLE, AsyncDataForSEOService, close_async_clients
+)
+from src.services.dataforseo_service import DataForSEOService
+
+
+def client_threads() -> int:
+    """Live threads, not counting the stub server's connection handlers"""
+    return sum(1 for thread in threading.enumerate() if 'process_request_thread' not in thread.name)
+
+
+class PeakThreads:
+    """Samples client_threads() in the background"""
+
+    def __init__(self):
+        self.peak = client_threads()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, client_threads())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run(mode: str, workers: int, keywords: list, latency: float):
+    server, base_url = start_stub_server(StubDataForSEOHandler, latency)
+    app = create_bench_app()
+
+    with app.app_context():
+        with PeakThreads() as threads:
+            start = time.perf_counter()
+            if mode == 'sync':
+                service = DataForSEOService(max_workers=workers, max_per_host=workers, serp_batch_size=1)
+                service.base_url = base_url
+                results = service.get_serp_results_many(keywords)
+            else:
+                service = AsyncDataForSEOService(max_per_host=workers, serp_batch_size=1)
+                service.base_url = base_url
+
+                async def refresh():
+                    try:
+                        return await service.get_serp_results_many(keywords)
+                    finally:
+                        await close_async_clients()
+
+                results = asyncio.run(refresh())
+            elapsed = time.perf_counter() - start
+
+    assert all(r['tasks'][0]['data']['keyword'] == k for k, r in results.items())
+    server.shutdown()
+    return elapsed, server.request_count, server.connection_count, threads.peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    keywords = [f"batch keyword {i}" for i in range(count)]
+
+    print(f"{count} uncached keywords, one task per POST, {latency * 1000:.0f} ms injected latency "
+          f"(h2 installed: {HTTP2_AVAILABLE})")
+    for mode, workers in (('sync', 8), ('sync', 64), ('async', ASYNC_MAX_CONCURRENCY)):
+        elapsed, posts, connections, threads = run(mode, workers, keywords, latency)
+        print(f"{mode:<5} concurrency={workers:<4} {elapsed:7.2f} s {posts:5d} POSTs "
+              f"{connections:4d} connections {threads:4d} client threads")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark DataForSEO cache storage formats: SQLite file size and cold read latency.
+
+Fills one database per format with SERP "advanced"-sized responses (with a
+share of identical responses, as happens across customers) and reads them all
+back with the in-memory tier cleared.
+
+Usage: python benchmarks/bench_cache_storage.py [entries] [duplicate_ratio]
+"""
+import os
+import random
+import sys
+import time
+
+from common import create_bench_app
+from src.models.seo_models import db
+from src.services.dataforseo_service import DataForSEOService, hot_cache
+
+
+def fake_serp_response(keyword: str) -> dict:
+    items = [{
+        'type': 'organic',
+        'rank_group': rank,
+        'rank_absolute': rank,
+        'domain': f'www.site{rank}.example',
+        'title': f'{keyword.title()} - Best {keyword} services in Sweden | Site {rank}',
+        'url': f'https://www.site{rank}.example/{keyword.replace(" ", "-")}/',
+        'breadcrumb': f'https://www.site{rank}.example › services › {keyword}',
+        'description': f'Looking for {keyword}? We offer professional {keyword} with '
+                       f'transparent pricing, fast delivery and great reviews. ' * 3,
+        'is_image': False, 'is_video': False, 'is_featured_snippet': False,
+        'is_malicious': False, 'is_web_story': False, 'amp_version': False,
+        'rating': None, 'highlighted': [keyword], 'links': None, 'about_this_result': None,
+        'main_domain': f'site{rank}.example', 'relative_url': None, 'etv': None,
+    } for rank in range(1, 101)]
+    return {
+        'status_code': 20000, 'status_message': 'Ok.',
+        'tasks': [{
+            'status_code': 20000, 'status_message': 'Ok.',
+            'data': {'keyword': keyword, 'location_name': 'Sweden', 'language_name': 'en'},
+            'result': [{'keyword': keyword, 'type': 'organic', 'se_domain': 'google.se',
+                        'items_count': len(items), 'items': items}]
+        }]
+    }
+
+
+def run(storage: str, responses):
+    app = create_bench_app()
+    db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+    with app.app_context():
+        service = DataForSEOService(cache_storage_format=storage)
+        start = time.perf_counter()
+        for key, response in responses:
+            service._cache_data(key, response)
+        write_ms = (time.perf_counter() - start) * 1000 / len(responses)
+
+        hot_cache.clear()
+        db.session.remove()
+        start = time.perf_counter()
+        for key, _ in responses:
+            assert service._get_cached_data(key) is not None
+            hot_cache.clear()
+        read_ms = (time.perf_counter() - start) * 1000 / len(responses)
+
+    return os.path.getsize(db_path), write_ms, read_ms
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    duplicate_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    random.seed(1)
+    unique = max(1, int(entries * (1 - duplicate_ratio)))
+    keywords = [f'keyword {i}' for i in range(unique)]
+    # Every entry has its own cache key; some share an identical response body
+    responses = [(f'cache-key-{i}', fake_serp_response(keywords[i] if i < unique else random.choice(keywords)))
+                 for i in range(entries)]
+
+    print(f"{entries} entries, {duplicate_ratio:.0%} duplicate responses")
+    baseline = None
+    for storage in ('json', 'zlib'):
+        size, write_ms, read_ms = run(storage, responses)
+        baseline = baseline or size
+        print(f"{storage:5} {size / 1024 / 1024:8.2f} MiB ({baseline / size:4.1f}x smaller)  "
+              f"write {write_ms:6.2f} ms/entry  cold read {read_ms:6.2f} ms/entry")
+
+
+if __name__ == '__main__':
+    main()
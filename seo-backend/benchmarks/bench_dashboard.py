@@ -0,0 +1,68 @@
+"""Measure the customer dashboard endpoint as keywords and reports grow.
+
+Creates customers with increasing numbers of keywords and reports (reports
+carry realistically large JSON columns) and reports SQL statements and
+latency per dashboard request.
+
+Usage: python benchmarks/bench_dashboard.py [reports]
+"""
+import json
+import sys
+import time
+
+from sqlalchemy import event
+
+from common import create_bench_app
+from src.models.seo_models import db, Customer, Keyword, Report
+from src.routes.seo_routes import seo_bp
+from src.services.seo_tasks import persist_analysis_results
+
+
+def main():
+    report_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    app = create_bench_app()
+    app.register_blueprint(seo_bp, url_prefix='/api/seo')
+    client = app.test_client()
+    large_json = json.dumps({f'keyword {i}': {'current_rank': i, 'competitors': ['x' * 200] * 5} for i in range(200)})
+
+    print(f"{'keywords':>9}{'reports':>9}{'statements':>12}{'ms':>9}")
+    for index, keyword_count in enumerate((10, 100, 1000, 5000)):
+        with app.app_context():
+            keywords = [f'keyword {i}' for i in range(keyword_count)]
+            customer = Customer(name='Bench', email=f'bench{index}@example.com', website_url='https://example.com',
+                                target_keywords=json.dumps(keywords), subscription_plan='professional')
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+            db.session.bulk_insert_mappings(Keyword, [{'customer_id': customer_id, 'keyword': k} for k in keywords])
+            db.session.bulk_insert_mappings(Report, [{
+                'customer_id': customer_id, 'ranking_changes': large_json, 'competitor_data': large_json,
+                'content_suggestions': large_json, 'technical_issues': large_json, 'ai_analysis': large_json
+            } for _ in range(report_count)])
+            db.session.commit()
+            for _ in range(2):
+                persist_analysis_results(customer_id, keywords, {
+                    'keyword_rankings': {k: {'current_rank': i % 90 + 1} for i, k in enumerate(keywords)},
+                    'keyword_data': {k: {'search_volume': i * 10, 'difficulty': 30.0} for i, k in enumerate(keywords)}
+                })
+
+        url = f'/api/seo/customers/{customer_id}/dashboard'
+        assert client.get(url).status_code == 200
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', listener)
+        start = time.perf_counter()
+        for _ in range(20):
+            client.get(url)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / 20
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        print(f"{keyword_count:>9}{report_count:>9}{len(statements) // 20:>12}{elapsed_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Upstream tasks for refreshing every customer: per-customer analyses vs. one fleet refresh.
+
+Customers draw their keywords from a shared pool (with varying case), as
+customers in the same niche do. The fleet refresh is interrupted half way
+once and resumed, to check that resuming fetches nothing twice.
+
+Usage: python benchmarks/bench_fleet_refresh.py [customers] [keywords_per_customer] [keyword_pool]
+"""
+import json
+import random
+import sys
+import time
+
+from common import StubDataForSEOHandler, create_bench_app, start_stub_server
+from src.models.database import db
+from src.models.seo_models import Customer, Keyword
+from src.services import fleet_refresh
+from src.services.dataforseo_service import DataForSEOService
+from src.services.seo_tasks import persist_analysis_results
+
+
+def seed_customers(customers, keywords_per_customer, keyword_pool):
+    rng = random.Random(42)
+    pool = [f'seo keyword {i}' for i in range(keyword_pool)]
+    for i in range(customers):
+        keywords = [k.title() if rng.random() < 0.3 else k for k in rng.sample(pool, keywords_per_customer)]
+        customer = Customer(name=f'Customer {i}', email=f'customer{i}@example.com',
+                            website_url=f'https://site{i % 10 + 1}.example', target_keywords=json.dumps(keywords),
+                            subscription_plan='professional')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.bulk_insert_mappings(Keyword, [{'customer_id': customer.id, 'keyword': k} for k in keywords])
+    db.session.commit()
+
+
+def per_customer(base_url):
+    service = DataForSEOService()
+    service.base_url = base_url
+    for customer in Customer.query.order_by(Customer.id).all():
+        keywords = json.loads(customer.target_keywords)
+        results = service.analyze_customer_seo({
+            'website_url': customer.website_url,
+            'target_keywords': keywords
+        }, parts=['rankings', 'keyword_data'])
+        persist_analysis_results(customer.id, keywords, results)
+
+
+class InterruptingService(DataForSEOService):
+    """Fails after a number of SERP chunks, like a crashed or killed run"""
+
+    def __init__(self, fail_after_chunks, **kwargs):
+        super().__init__(**kwargs)
+        self.chunks_left = fail_after_chunks
+
+    def get_serp_results_many(self, *args, **kwargs):
+        if kwargs.get('allow_stale') is False:
+            if self.chunks_left == 0:
+                raise RuntimeError('Simulated interruption')
+            self.chunks_left -= 1
+        return super().get_serp_results_many(*args, **kwargs)
+
+
+def fleet(base_url, unique_keywords):
+    chunks = (unique_keywords + fleet_refresh.FLEET_REFRESH_CHUNK_SIZE - 1) // fleet_refresh.FLEET_REFRESH_CHUNK_SIZE
+    service = InterruptingService(chunks // 2)
+    service.base_url = base_url
+    try:
+        fleet_refresh.refresh_fleet(tasks_per_second=0, service=service)
+    except RuntimeError as e:
+        print(f"  first attempt stopped: {e}")
+
+    service = DataForSEOService()
+    service.base_url = base_url
+    return fleet_refresh.refresh_fleet(tasks_per_second=0, service=service)
+
+
+def run(mode, customers, keywords_per_customer, keyword_pool):
+    server, base_url = start_stub_server(StubDataForSEOHandler, 0.05)
+    app = create_bench_app()
+    with app.app_context():
+        seed_customers(customers, keywords_per_customer, keyword_pool)
+        unique_keywords = len(fleet_refresh.collect_fleet_keywords()[0])
+        start = time.perf_counter()
+        stats = per_customer(base_url) if mode == 'per-customer' else fleet(base_url, unique_keywords)
+        elapsed = time.perf_counter() - start
+        refreshed = Keyword.query.filter(Keyword.search_volume.isnot(None)).count()
+    server.shutdown()
+    return elapsed, server.request_count, server.task_count, unique_keywords, refreshed, stats
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    keywords_per_customer = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    keyword_pool = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    print(f"{customers} customers x {keywords_per_customer} keywords from a pool of {keyword_pool}")
+    for mode in ('per-customer', 'fleet'):
+        elapsed, posts, tasks, unique_keywords, refreshed, stats = run(mode, customers, keywords_per_customer, keyword_pool)
+        print(f"{mode:<13} {tasks:6d} upstream tasks in {posts:5d} POSTs {elapsed:7.2f} s  "
+              f"({unique_keywords} unique keywords, {refreshed} keyword rows with volume)")
+        if stats:
+            print(f"  run {stats['id']}: {stats['status']}, {stats['customers_refreshed']} customers, "
+                  f"{stats['upstream_tasks']} upstream tasks recorded on the run")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Load test of the DataForSEO HTTP client against a flaky local stub.
+
+Steady load: every call creates a new DataForSEOService (as each route
+does) and POSTs one SERP task. 2% of the stub's answers are 503s and 1%
+hang for 10 s. Compared with the previous client (a new session per
+service, no timeout, no retries) on connections opened, failed calls and
+latency percentiles.
+
+Outage: the stub answers every request with a 503 for a few seconds while
+callers keep going; counts the requests that still reach it with and
+without the circuit breaker.
+
+Usage: python benchmarks/bench_http_client.py [calls] [threads]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATAFORSEO_MAX_CONCURRENCY', '16')
+os.environ.setdefault('DATAFORSEO_RETRY_BACKOFF_SECONDS', '0.05')
+os.environ.setdefault('DATAFORSEO_RETRY_BACKOFF_MAX_SECONDS', '1')
+
+import requests
+
+from common import StubDataForSEOHandler, start_stub_server
+from src.services import dataforseo_service
+from src.services.dataforseo_service import SERP_ENDPOINT, DataForSEOService
+
+TASK = [{'keyword': 'seo tools', 'location_name': 'Sweden', 'language_name': 'en'}]
+
+
+def previous_client(base_url):
+    """One session per service, no timeout, no retries"""
+    session = requests.Session()
+    session.auth = ('demo_user', 'demo_password')
+    response = session.post(f"{base_url}/{SERP_ENDPOINT}", json=TASK)
+    response.raise_for_status()
+    return response.json()
+
+
+def shared_client(base_url, read_timeout=1.0):
+    service = DataForSEOService(max_per_host=16)
+    service.base_url = base_url
+    service.timeout = (1.0, read_timeout)
+    return service._post(SERP_ENDPOINT, TASK)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def timed(call, base_url):
+    started = time.perf_counter()
+    try:
+        call(base_url)
+        failed = False
+    except requests.exceptions.RequestException:
+        failed = True
+    return time.perf_counter() - started, failed
+
+
+def steady_load(call, calls, threads):
+    server, base_url = start_stub_server(StubDataForSEOHandler, 0.02, error_rate=0.02, hang_rate=0.01, hang_seconds=10)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: timed(call, base_url), range(calls)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, f in results if f)
+    print(f"{call.__name__:<16} {server.connection_count:5d} connections  {failed:3d} failed  "
+          f"p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  max {max(latencies) * 1000:8.1f} ms  total {elapsed:5.1f} s")
+
+
+def outage(breaker_enabled, threads, outage_seconds=3.0, run_seconds=6.0):
+    dataforseo_service._circuit_breakers.clear()
+    threshold = dataforseo_service.BREAKER_FAILURE_THRESHOLD
+    dataforseo_service.BREAKER_FAILURE_THRESHOLD = 5 if breaker_enabled else 10 ** 9
+    reset = dataforseo_service.BREAKER_RESET_SECONDS
+    dataforseo_service.BREAKER_RESET_SECONDS = 1.0
+
+    server, base_url = start_stub_server(StubDataForSEOHandler, 0.02)
+    stop = time.perf_counter() + run_seconds
+    outage_requests = [0, 0]
+    lock = threading.Lock()
+
+    def caller():
+        while time.perf_counter() < stop:
+            timed(shared_client, base_url)
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(1.0)
+    before = server.request_count
+    server.outage_until = time.time() + outage_seconds
+    time.sleep(outage_seconds)
+    during = server.request_count - before
+    for worker in workers:
+        worker.join()
+    server.shutdown()
+
+    breaker = dataforseo_service.get_upstream_stats()['circuit_breakers']
+    dataforseo_service.BREAKER_FAILURE_THRESHOLD = threshold
+    dataforseo_service.BREAKER_RESET_SECONDS = reset
+    label = 'with breaker' if breaker_enabled else 'no breaker'
+    opened = sum(b['times_opened'] for b in breaker.values())
+    print(f"{label:<13} {during:5d} requests reached the stub during a {outage_seconds:.0f} s outage "
+          f"({during / outage_seconds:6.1f}/s), breaker opened {opened}x")
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"Steady load: {calls} calls from {threads} threads, 20 ms latency, 2% 503s, 1% hang for 10 s")
+    steady_load(previous_client, calls, threads)
+    steady_load(shared_client, calls, threads)
+
+    print(f"\nOutage: {threads} threads calling continuously")
+    outage(False, threads)
+    outage(True, threads)
+
+
+if __name__ == '__main__':
+    main()
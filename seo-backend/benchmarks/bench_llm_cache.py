@@ -0,0 +1,54 @@
+"""Benchmark the LLM response cache on repeated report generation.
+
+Generates the same report several times against a local fake OpenAI server:
+the first run misses, later runs are served from the cache, and a final
+forced run bypasses it.
+
+Usage: python benchmarks/bench_llm_cache.py [repeats] [delay_seconds]
+"""
+import os
+import sys
+import time
+
+from common import StubOpenAIHandler, create_bench_app, start_stub_server
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    server, base_url = start_stub_server(StubOpenAIHandler, delay)
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    from src.services import llm_cache
+    from src.services.ai_report_service import AIReportService
+
+    keywords = [f'keyword {i}' for i in range(10)]
+    customer = {'website_url': 'https://example.com', 'target_keywords': keywords,
+                'subscription_plan': 'professional'}
+    seo_data = {'keyword_rankings': {k: {'current_rank': i + 1} for i, k in enumerate(keywords)},
+                'keyword_data': {k: {'search_volume': 100 * i, 'difficulty': 40} for i, k in enumerate(keywords)},
+                'competitors': [{'url': f'https://competitor{i}.example', 'average_rank': i} for i in range(5)],
+                'technical_audit': {'critical': [], 'warnings': ['Slow pages']}}
+
+    app = create_bench_app()
+    print(f"{delay * 1000:.0f} ms per completion")
+    with app.app_context():
+        runs = [('cold', False)] + [('cached', False)] * repeats + [('forced', True)]
+        for label, force in runs:
+            service = AIReportService(force_refresh=force)
+            start = time.perf_counter()
+            service.generate_seo_analysis(customer, seo_data)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"{label:<8}{elapsed_ms:10.1f} ms  {service.usage['requests']} API requests")
+
+        stats = llm_cache.get_llm_cache_stats()
+        print(f"hit ratio {stats['hit_ratio']:.0%}, "
+              f"tokens saved {stats['prompt_tokens_saved'] + stats['completion_tokens_saved']}, "
+              f"{stats['entries']} entries / {stats['bytes']} bytes")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Per-customer upstream cost from /metrics, and the cost of the instrumentation.
+
+Analyzes a few customers and generates their PDF reports through the API
+against stub DataForSEO and OpenAI servers, then prints what /metrics
+attributes to each customer. Finally times hot cache lookups with and
+without the lookup counters.
+
+Usage: python benchmarks/bench_metrics.py [customers] [keywords] [lookups]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from common import StubDataForSEOHandler, StubOpenAIHandler, start_stub_server
+
+SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def parse(text: str):
+    """{metric name: [(labels, value)]} from the Prometheus text format"""
+    samples = defaultdict(list)
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2)))
+            samples[match.group(1)].append((labels, float(match.group(3))))
+    return samples
+
+
+def per_customer(samples, name: str, key: str):
+    totals = defaultdict(lambda: defaultdict(float))
+    for labels, value in samples[name]:
+        totals[labels['customer']][labels[key]] += value
+    return totals
+
+
+def time_lookups(service, lookups: int) -> float:
+    service.get_serp_results('warm keyword')
+    started = time.perf_counter()
+    for _ in range(lookups):
+        service.get_serp_results('warm keyword')
+    return (time.perf_counter() - started) / lookups * 1e6
+
+
+def main():
+    customer_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    keyword_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+
+    dataforseo, dataforseo_url = start_stub_server(StubDataForSEOHandler, 0.05)
+    openai, openai_url = start_stub_server(StubOpenAIHandler, 0.05)
+    database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    os.environ.update({
+        'DATAFORSEO_BASE_URL': dataforseo_url,
+        'OPENAI_BASE_URL': f"{openai_url}/v1",
+        'OPENAI_API_KEY': 'stub',
+        'DATABASE_URL': f"sqlite:///{database.name}",
+        'JOB_QUEUE_WORKERS': '0'
+    })
+
+    from src.main import app
+    from src.models.database import db
+    from src.models.seo_models import Report
+    from src.services import dataforseo_service
+    from src.services.dataforseo_service import DataForSEOService
+
+    client = app.test_client()
+    customer_ids = []
+    for i in range(customer_count):
+        # Customers overlap on half their keywords, so later ones hit the cache
+        keywords = [f'shared keyword {k}' for k in range(keyword_count // 2)]
+        keywords += [f'customer {i} keyword {k}' for k in range(keyword_count - len(keywords))]
+        response = client.post('/api/seo/customers', json={
+            'name': f'Customer {i}', 'email': f'customer{i}@example.com',
+            'website_url': f'https://site{i + 1}.example', 'target_keywords': ', '.join(keywords),
+            'subscription_plan': 'professional'
+        })
+        customer_ids.append(response.get_json()['customer']['id'])
+
+    pdf_paths = []
+    started = time.perf_counter()
+    for customer_id in customer_ids:
+        assert client.post(f'/api/seo/customers/{customer_id}/analyze', json={'sync': True}).status_code == 200
+        response = client.post(f'/api/seo/customers/{customer_id}/generate-report',
+                               json={'sync': True, 'generate_pdf': True})
+        assert response.status_code == 200
+        with app.app_context():
+            pdf_paths.append(db.session.get(Report, response.get_json()['report_id']).pdf_path)
+    print(f"{customer_count} customers x {keyword_count} keywords analyzed and reported "
+          f"in {time.perf_counter() - started:.2f} s")
+
+    response = client.get('/metrics')
+    print(f"/metrics: {response.status_code} {response.content_type}, {len(response.data)} bytes")
+    samples = parse(response.get_data(as_text=True))
+
+    lookups_by_customer = per_customer(samples, 'seo_dataforseo_lookups_total', 'cache')
+    tasks_by_customer = per_customer(samples, 'seo_dataforseo_tasks_total', 'endpoint')
+    tokens_by_customer = per_customer(samples, 'seo_openai_tokens_total', 'kind')
+    seconds_by_customer = per_customer(samples, 'seo_customer_seconds_total', 'component')
+    pdfs_by_customer = per_customer(samples, 'seo_pdf_reports_total', 'outcome')
+
+    print(f"{'customer':>8} {'lookups hit/stale/miss/joined':>30} {'tasks':>6} {'tokens':>7} "
+          f"{'dataforseo s':>13} {'openai s':>9} {'pdf s':>6} {'pdfs':>5}")
+    for customer in sorted(set(lookups_by_customer) | set(tokens_by_customer)):
+        cache = lookups_by_customer[customer]
+        seconds = seconds_by_customer[customer]
+        outcomes = '/'.join(f"{cache[outcome]:.0f}" for outcome in ('hit', 'stale', 'miss', 'joined'))
+        print(f"{customer:>8} {outcomes:>30} {sum(tasks_by_customer[customer].values()):>6.0f} "
+              f"{sum(tokens_by_customer[customer].values()):>7.0f} {seconds['dataforseo']:>13.2f} "
+              f"{seconds['openai']:>9.2f} {seconds['pdf']:>6.2f} {pdfs_by_customer[customer]['ok']:>5.0f}")
+    print(f"stub DataForSEO tasks: {dataforseo.task_count}")
+
+    # Overhead per hot cache lookup, with the lookup counters swapped for a no-op
+    with app.app_context():
+        service = DataForSEOService()
+        instrumented = time_lookups(service, lookups)
+        record_lookup = DataForSEOService._record_lookup
+        DataForSEOService._record_lookup = lambda self, endpoint, cache, started: None
+        try:
+            bare = time_lookups(service, lookups)
+        finally:
+            DataForSEOService._record_lookup = record_lookup
+    print(f"hot cache lookup: {instrumented:.1f} us instrumented, {bare:.1f} us without counters "
+          f"({instrumented - bare:+.1f} us)")
+
+    started = time.perf_counter()
+    for _ in range(100):
+        client.get('/metrics')
+    print(f"/metrics render: {(time.perf_counter() - started) * 10:.2f} ms")
+
+    for path in pdf_paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+    dataforseo.shutdown()
+    openai.shutdown()
+    os.unlink(database.name)
+    assert dataforseo_service.hot_cache.stats()['hits'] > 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Count SQL statements and time for persisting one analysis run.
+
+Compares the previous per-keyword persistence loop with the set-based
+seo_tasks.persist_analysis_results for a customer with many keywords.
+
+Usage: python benchmarks/bench_persist_analysis.py [keywords] [competitors]
+"""
+import json
+import sys
+import time
+
+from sqlalchemy import event
+
+from common import create_bench_app
+from src.models.seo_models import db, Competitor, Customer, Keyword
+from src.services.seo_tasks import persist_analysis_results
+
+
+def per_keyword_persist(customer_id, keywords, analysis_results):
+    """The previous implementation: one SELECT per keyword, then per-row UPDATEs"""
+    for keyword in keywords:
+        keyword_entry = Keyword.query.filter_by(customer_id=customer_id, keyword=keyword).first()
+        if keyword_entry and keyword in analysis_results.get('keyword_rankings', {}):
+            keyword_entry.previous_rank = keyword_entry.current_rank
+            keyword_entry.current_rank = analysis_results['keyword_rankings'][keyword].get('current_rank')
+        if keyword_entry and keyword in analysis_results.get('keyword_data', {}):
+            kw_data = analysis_results['keyword_data'][keyword]
+            keyword_entry.search_volume = kw_data.get('search_volume')
+            keyword_entry.difficulty = kw_data.get('difficulty')
+
+    Competitor.query.filter_by(customer_id=customer_id).delete()
+    for competitor_data in analysis_results.get('competitors', []):
+        db.session.add(Competitor(
+            customer_id=customer_id,
+            competitor_url=competitor_data['url'],
+            competitor_rank=int(competitor_data['average_rank']),
+            content_analysis=json.dumps(competitor_data)
+        ))
+    db.session.commit()
+
+
+def run(persist, keyword_count, competitor_count):
+    app = create_bench_app()
+    keywords = [f'keyword {i}' for i in range(keyword_count)]
+    analysis_results = {
+        'keyword_rankings': {k: {'current_rank': i % 50 + 1} for i, k in enumerate(keywords)},
+        'keyword_data': {k: {'search_volume': i * 10, 'difficulty': 30.0} for i, k in enumerate(keywords)},
+        'competitors': [{'url': f'https://competitor{i}.example', 'average_rank': i % 10 + 1}
+                        for i in range(competitor_count)]
+    }
+
+    with app.app_context():
+        customer = Customer(name='Bench', email='bench@example.com', website_url='https://example.com',
+                            target_keywords=json.dumps(keywords), subscription_plan='professional')
+        db.session.add(customer)
+        db.session.commit()
+        db.session.bulk_insert_mappings(Keyword, [{'customer_id': customer.id, 'keyword': k} for k in keywords])
+        db.session.commit()
+        customer_id = customer.id
+        db.session.remove()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        start = time.perf_counter()
+        persist(customer_id, keywords, analysis_results)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert Keyword.query.filter_by(customer_id=customer_id, current_rank=1).count() == len(keywords[::50])
+        assert Competitor.query.filter_by(customer_id=customer_id).count() == competitor_count
+
+    return len(statements), elapsed_ms
+
+
+def main():
+    keyword_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    competitor_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f"{keyword_count} keywords, {competitor_count} competitors")
+    for label, persist in (('per-keyword', per_keyword_persist), ('set-based', persist_analysis_results)):
+        statements, elapsed_ms = run(persist, keyword_count, competitor_count)
+        print(f"{label:<12}{statements:6} statements {elapsed_ms:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Latency of an enterprise customer's SERP lookups while starter customers flood the upstream.
+
+Starter customers each analyse many keywords (unbatched, one POST per
+keyword, 16 threads each) against a stub DataForSEO server; half a second
+in, an enterprise customer asks for a few keywords. Compared with plans ignored (one FIFO
+queue, no per-customer limits) and with plan-aware scheduling.
+
+Usage: python benchmarks/bench_plan_scheduling.py [starter_customers] [keywords_each] [latency_seconds]
+"""
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('DATAFORSEO_MAX_CONCURRENCY', '4')
+os.environ.setdefault('SCHEDULER_TENANT_BURST_SECONDS', '10')
+
+from common import StubDataForSEOHandler, create_bench_app, start_stub_server
+from src.services import upstream_scheduler
+from src.services.concurrency import tenant_context, with_app_context
+from src.services.dataforseo_service import DataForSEOService
+
+
+def lookup(base_url, customer_id, plan, keywords, workers=8):
+    with tenant_context(customer_id, plan):
+        service = DataForSEOService(max_workers=workers, max_per_host=64, serp_batch_size=1)
+        service.base_url = base_url
+        started = time.perf_counter()
+        service.get_serp_results_many(keywords)
+        return time.perf_counter() - started
+
+
+def run(plan_aware, starters, keywords_each, latency):
+    # Ignoring plans = everyone in one tier (FIFO) with no per-customer limits
+    rates = dict(upstream_scheduler.dataforseo_scheduler.tenant_rates)
+    if not plan_aware:
+        upstream_scheduler.dataforseo_scheduler.tenant_rates.clear()
+    scheduler = upstream_scheduler.dataforseo_scheduler
+    scheduler.__init__(scheduler.name, scheduler.max_concurrency, scheduler.tenant_rates)
+
+    server, base_url = start_stub_server(StubDataForSEOHandler, latency)
+    app = create_bench_app()
+    with app.app_context():
+        flood = [
+            threading.Thread(target=with_app_context(lookup), args=(
+                base_url, i + 1, 'starter', [f'starter {i} keyword {k}' for k in range(keywords_each)], 16
+            ))
+            for i in range(starters)
+        ]
+        started = time.perf_counter()
+        for thread in flood:
+            thread.start()
+        time.sleep(0.5)
+        enterprise_latency = lookup(base_url, 1000, 'enterprise' if plan_aware else 'starter',
+                                    [f'enterprise keyword {k}' for k in range(5)])
+        for thread in flood:
+            thread.join()
+        total = time.perf_counter() - started
+
+    stats = scheduler.stats()
+    server.shutdown()
+    scheduler.tenant_rates.update(rates)
+    return enterprise_latency, total, stats
+
+
+def main():
+    starters = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    keywords_each = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    print(f"{starters} starter customers x {keywords_each} keywords, concurrency "
+          f"{upstream_scheduler.dataforseo_scheduler.max_concurrency}, {latency * 1000:.0f} ms per POST")
+    for plan_aware in (False, True):
+        enterprise_latency, total, stats = run(plan_aware, starters, keywords_each, latency)
+        starter = stats['tiers']['starter']
+        print(f"{'plan-aware' if plan_aware else 'fifo':<10}  enterprise 5 keywords {enterprise_latency:6.2f} s  "
+              f"flood done {total:6.2f} s  starter avg wait {starter['avg_wait_ms']:7.1f} ms, "
+              f"max queue wait {max(t['max_wait_ms'] for t in stats['tiers'].values()):7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark rank history range queries and rollup on a large SQLite table.
+
+Fills the table with daily-ish points for many keywords (several raw points
+per day in the most recent period), then times keyword and customer range
+queries and the rollup of old raw points.
+
+Usage: python benchmarks/bench_rank_history.py [customers] [keywords_per_customer] [days] [points_per_day]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app
+from src.models.seo_models import db, Customer, RankHistory
+from src.services import rank_history
+
+SECONDS_PER_DAY = rank_history.SECONDS_PER_DAY
+
+
+def fill(customers, keywords_per_customer, days, points_per_day):
+    """Insert points with raw executemany batches, one transaction per day"""
+    now = rank_history.to_timestamp(datetime.utcnow())
+    first_day = now - now % SECONDS_PER_DAY - days * SECONDS_PER_DAY
+    step = SECONDS_PER_DAY // points_per_day
+    total = 0
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO customer (id, name, email, website_url, target_keywords, subscription_plan, is_active) "
+            "VALUES (?, ?, ?, 'https://example.com', '[]', 'professional', 1)",
+            [(c, f'Customer {c}', f'customer{c}@example.com') for c in range(1, customers + 1)]
+        )
+        for day in range(days):
+            rows = []
+            for slot in range(points_per_day):
+                recorded_at = first_day + day * SECONDS_PER_DAY + slot * step
+                for customer_id in range(1, customers + 1):
+                    base = (customer_id - 1) * keywords_per_customer
+                    for k in range(keywords_per_customer):
+                        rows.append((base + k + 1, recorded_at, customer_id, (k + day) % 100 + 1, 1000 + k, 1))
+            connection.exec_driver_sql(
+                'INSERT INTO rank_history (keyword_id, recorded_at, customer_id, rank, search_volume, samples) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            total += len(rows)
+    return total
+
+
+def timed(label, func, repeats=20):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+    print(f"{label:<44}{elapsed_ms:8.2f} ms")
+    return result
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    keywords_per_customer = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+    points_per_day = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    app = create_bench_app()
+    db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+    with app.app_context():
+        start = time.perf_counter()
+        total = fill(customers, keywords_per_customer, days, points_per_day)
+        print(f"{total:,} points inserted in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(db_path) / total:.1f} bytes/point on disk")
+
+        end = datetime.utcnow()
+        customer_id = customers // 2 + 1
+        keyword_id = (customer_id - 1) * keywords_per_customer + 7
+
+        points = timed('keyword, 90 days', lambda: rank_history.get_series(
+            customer_id, end - timedelta(days=90), end, [keyword_id]))
+        print(f"  {sum(len(p) for p in points.values())} points")
+        timed('keyword, full range', lambda: rank_history.get_series(
+            customer_id, end - timedelta(days=days + 1), end, [keyword_id]))
+        points = timed('customer, 7 days (all keywords)', lambda: rank_history.get_series(
+            customer_id, end - timedelta(days=7), end), repeats=5)
+        print(f"  {sum(len(p) for p in points.values())} points")
+
+        start = time.perf_counter()
+        stats = rank_history.rollup_rank_history(older_than_days=30, since=end - timedelta(days=days + 1))
+        print(f"rollup: {stats['keyword_days_rolled_up']:,} keyword-days, {stats['points_before']:,} -> "
+              f"{stats['points_after']:,} points in {time.perf_counter() - start:.1f}s")
+        print(f"{RankHistory.query.count():,} points after rollup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Compare loading Report metadata with the report body eager vs. deferred.
+
+Fills reports with realistically large JSON columns, then loads a page of
+Report objects and reads only metadata and the summary, measuring time and
+peak Python memory. "eager" undefers the body, as every load did before.
+
+Usage: python benchmarks/bench_report_loading.py [reports]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from common import create_bench_app
+from src.models.seo_models import db, Customer, Report
+
+
+def main():
+    report_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    app = create_bench_app()
+    body = json.dumps({f'keyword {i}': {'current_rank': i, 'competitors': ['x' * 200] * 5} for i in range(200)})
+    with app.app_context():
+        customer = Customer(name='Bench', email='bench@example.com', website_url='https://example.com',
+                            target_keywords='[]', subscription_plan='professional')
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.id
+        db.session.bulk_insert_mappings(Report, [{
+            'customer_id': customer_id, 'summary': json.dumps({'keywords_tracked': 200, 'headline': 'Summary'}),
+            'ranking_changes': body, 'competitor_data': body, 'content_suggestions': body,
+            'technical_issues': body, 'ai_analysis': body
+        } for _ in range(report_count)])
+        db.session.commit()
+        print(f"{report_count} reports, {len(body) * 5 / 1024:.0f} KiB of body each")
+
+        for label, options in (('eager', [db.undefer_group('body')]), ('deferred', [])):
+            db.session.remove()
+            tracemalloc.start()
+            start = time.perf_counter()
+            reports = Report.query.options(*options).filter_by(customer_id=customer_id).all()
+            listed = [report.to_summary_dict() for report in reports]
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert len(listed) == report_count
+            print(f"{label:<9}{elapsed_ms:9.1f} ms  peak {peak / 1024 / 1024:8.1f} MiB")
+
+        # Full access decodes each column once per object
+        report = Report.query.first()
+        start = time.perf_counter()
+        for _ in range(100):
+            report.decoded('ranking_changes')
+        print(f"decoded() x100 on one report: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
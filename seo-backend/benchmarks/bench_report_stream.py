@@ -0,0 +1,73 @@
+"""Measure time to first event, first text and full report on the SSE report endpoint.
+
+Runs /customers/<id>/generate-report/stream against a local fake OpenAI server
+that streams its answers over the given latency, and compares with the
+blocking generate-report endpoint. SEO data comes from a fixed analysis so only
+report generation is measured.
+
+Usage: python benchmarks/bench_report_stream.py [delay_seconds]
+"""
+import json
+import os
+import sys
+import time
+
+from common import StubOpenAIHandler, create_bench_app, start_stub_server
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    server, base_url = start_stub_server(StubOpenAIHandler, delay)
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    from src.models.seo_models import db, Customer
+    from src.routes.seo_routes import seo_bp
+    from src.services.dataforseo_service import DataForSEOService
+
+    keywords = [f'keyword {i}' for i in range(10)]
+    seo_data = {'keyword_rankings': {k: {'current_rank': i + 1} for i, k in enumerate(keywords)},
+                'keyword_data': {k: {'search_volume': 100 * i, 'difficulty': 40} for i, k in enumerate(keywords)},
+                'competitors': [{'url': f'https://competitor{i}.example', 'average_rank': i} for i in range(5)],
+                'technical_audit': {'critical': [], 'warnings': ['Slow pages']}}
+    DataForSEOService.analyze_customer_seo = lambda self, customer_data, parts=None: seo_data
+
+    app = create_bench_app()
+    app.register_blueprint(seo_bp, url_prefix='/api/seo')
+    with app.app_context():
+        customer = Customer(name='Bench', email='bench@example.com', website_url='https://example.com',
+                            target_keywords=json.dumps(keywords), subscription_plan='professional')
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.id
+
+    client = app.test_client()
+    print(f"{delay * 1000:.0f} ms per completion")
+
+    start = time.perf_counter()
+    response = client.get(f'/api/seo/customers/{customer_id}/generate-report/stream', buffered=False)
+    marks = {}
+    for chunk in response.response:
+        now = time.perf_counter() - start
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        for event in ('status', 'delta', 'section', 'done', 'error'):
+            if f'event: {event}\n' in text:
+                marks.setdefault(event, now)
+    response.close()
+    for event, label in (('status', 'first byte'), ('delta', 'first text'),
+                         ('section', 'first section'), ('done', 'report saved')):
+        print(f"stream   {label:<14}{marks.get(event, float('nan')) * 1000:10.1f} ms")
+    if 'error' in marks:
+        print("stream reported an error")
+
+    start = time.perf_counter()
+    response = client.post(f'/api/seo/customers/{customer_id}/generate-report?sync=true')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    print(f"blocking {'first byte':<14}{(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
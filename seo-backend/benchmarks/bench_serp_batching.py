@@ -0,0 +1,54 @@
+"""Benchmark unbatched vs. batched SERP lookups against a stub DataForSEO server.
+
+Simulates several customers analysed at the same time and reports the number
+of upstream POSTs each mode needs.
+
+Usage: python benchmarks/bench_serp_batching.py [customers] [keywords_per_customer] [latency_seconds]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Match the per-host limit the services below are created with
+os.environ.setdefault('DATAFORSEO_MAX_CONCURRENCY', '8')
+
+from common import StubDataForSEOHandler, create_bench_app, start_stub_server
+from src.services.concurrency import with_app_context
+from src.services.dataforseo_service import DataForSEOService
+
+
+def run(serp_batch_size: int, customers: int, keywords_per_customer: int, latency: float):
+    server, base_url = start_stub_server(StubDataForSEOHandler, latency)
+    app = create_bench_app()
+
+    def refresh_customer(index: int):
+        service = DataForSEOService(max_per_host=8, serp_batch_size=serp_batch_size)
+        service.base_url = base_url
+        keywords = [f"customer {index} keyword {i}" for i in range(keywords_per_customer)]
+        results = service.get_serp_results_many(keywords)
+        assert all(r['tasks'][0]['data']['keyword'] == k for k, r in results.items())
+
+    with app.app_context():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=customers) as executor:
+            list(executor.map(with_app_context(refresh_customer), range(customers)))
+        elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    return elapsed, server.request_count
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    keywords_per_customer = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    print(f"{customers} customers x {keywords_per_customer} keywords, {latency * 1000:.0f} ms injected latency")
+    for serp_batch_size in (1, 10, 50, 100):
+        elapsed, posts = run(serp_batch_size, customers, keywords_per_customer, latency)
+        print(f"serp_batch_size={serp_batch_size:<4} {posts:5d} POSTs {elapsed:7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Concurrent read/write load test of the SQLite engine profiles.
+
+Writer threads repeatedly persist analysis results (keyword updates, rank
+history, competitors, stats) while reader threads serve dashboards and keyword
+pages, for a fixed duration per profile. Reports throughput and errors such as
+"database is locked".
+
+Usage: python benchmarks/bench_sqlite_profile.py [writers] [readers] [seconds] [keywords]
+"""
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+from common import create_bench_app
+from src.models.seo_models import db, Customer, Keyword
+from src.routes.seo_routes import seo_bp
+from src.services import customer_stats
+from src.services.seo_tasks import persist_analysis_results
+
+
+def run(profile, writers, readers, seconds, keyword_count):
+    app = create_bench_app(profile=profile)
+    app.register_blueprint(seo_bp, url_prefix='/api/seo')
+
+    customers = []
+    with app.app_context():
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        for c in range(writers):
+            keywords = [f'customer {c} keyword {i}' for i in range(keyword_count)]
+            customer = Customer(name=f'Bench {c}', email=f'bench{c}@example.com', website_url='https://example.com',
+                                target_keywords=json.dumps(keywords), subscription_plan='professional')
+            db.session.add(customer)
+            db.session.commit()
+            db.session.bulk_insert_mappings(Keyword, [{'customer_id': customer.id, 'keyword': k} for k in keywords])
+            customer_stats.update_keyword_stats(customer.id, [(None, None, None)] * len(keywords))
+            db.session.commit()
+            customers.append((customer.id, keywords))
+
+    counts = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer(customer_id, keywords):
+        run_index = 0
+        while not stop.is_set():
+            run_index += 1
+            results = {
+                'keyword_rankings': {k: {'current_rank': (i + run_index) % 90 + 1} for i, k in enumerate(keywords)},
+                'keyword_data': {k: {'search_volume': i * 10, 'difficulty': 30.0} for i, k in enumerate(keywords)},
+                'competitors': [{'url': f'https://competitor{i}.example', 'average_rank': i + 1} for i in range(10)]
+            }
+            with app.app_context():
+                try:
+                    persist_analysis_results(customer_id, keywords, results)
+                    outcome = 'writes'
+                except Exception as e:
+                    db.session.rollback()
+                    outcome = None
+                    with lock:
+                        errors[str(e).split('\n')[0][:160]] += 1
+            if outcome:
+                with lock:
+                    counts[outcome] += 1
+
+    def reader(index):
+        client = app.test_client()
+        while not stop.is_set():
+            customer_id = customers[index % len(customers)][0]
+            index += 1
+            for url in (f'/api/seo/customers/{customer_id}/dashboard',
+                        f'/api/seo/customers/{customer_id}/keywords?limit=100'):
+                response = client.get(url)
+                with lock:
+                    if response.status_code == 200:
+                        counts['reads'] += 1
+                    else:
+                        errors[(response.get_json() or {}).get('error', '')[:160]] += 1
+
+    threads = [threading.Thread(target=writer, args=customer) for customer in customers]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return journal_mode, counts, errors
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    keyword_count = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    print(f"{writers} writers, {readers} readers, {seconds:.0f}s, {keyword_count} keywords per customer")
+    for profile in ('default', 'tuned'):
+        journal_mode, counts, errors = run(profile, writers, readers, seconds, keyword_count)
+        print(f"{profile:<8} journal={journal_mode:<7} writes/s {counts['writes'] / seconds:7.1f}  "
+              f"reads/s {counts['reads'] / seconds:8.1f}  errors {sum(errors.values())}")
+        for message, count in errors.most_common(3):
+            print(f"         {count} x {message}")
+
+
+if __name__ == '__main__':
+    main()
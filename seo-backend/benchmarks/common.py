@@ -0,0 +1,217 @@
+"""Shared helpers for the benchmarks: stub upstream servers and a throwaway app"""
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.database import db, init_database
+import src.models.seo_models  # noqa: F401 (registers the SEO tables)
+
+
+class StubDataForSEOHandler(BaseHTTPRequestHandler):
+    """Answers any DataForSEO v3 POST with one result per submitted task.
+
+    error_rate of the requests get a 503 and hang_rate hang for hang_seconds;
+    every request gets a 503 while time.time() < server.outage_until.
+    """
+    protocol_version = 'HTTP/1.1'
+    latency = 0.2
+    error_rate = 0.0
+    hang_rate = 0.0
+    hang_seconds = 10.0
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, keep-alive
+        # connections hit Nagle + delayed ACK stalls that real servers avoid
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connection_count += 1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        tasks = json.loads(self.rfile.read(length) or b'[]')
+        self.server.request_count += 1
+        if time.time() < self.server.outage_until or random.random() < self.error_rate:
+            self.server.error_count += 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if random.random() < self.hang_rate:
+            time.sleep(self.hang_seconds)
+        time.sleep(self.latency)
+        self.server.task_count += len(tasks)
+
+        body = json.dumps({
+            'status_code': 20000,
+            'status_message': 'Ok.',
+            'tasks_count': len(tasks),
+            'tasks': [self._task_result(self.path, task) for task in tasks]
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _task_result(self, path, task):
+        if 'serp' in path:
+            result = [{
+                'keyword': task.get('keyword'),
+                'items': [
+                    {'rank_group': i, 'rank_absolute': i, 'url': f'https://site{i}.example/{task.get("keyword")}'}
+                    for i in range(1, 11)
+                ]
+            }]
+        elif 'keywords_data' in path:
+            result = [
+                {'keyword': keyword, 'search_volume': 1000, 'keyword_difficulty': 40}
+                for keyword in task.get('keywords', [])
+            ]
+        else:
+            result = []
+        return {'status_code': 20000, 'status_message': 'Ok.', 'data': task, 'result': result}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /v1/chat/completions endpoint with a fixed delay"""
+    protocol_version = 'HTTP/1.1'
+    latency = 1.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.server.request_count += 1
+
+        prompt = body['messages'][-1]['content']
+        prompt_tokens = sum(len(m['content'].split()) for m in body['messages'])
+        content = self._answer(prompt, body)
+        completion_tokens = len(content.split())
+        self.server.prompt_tokens = getattr(self.server, 'prompt_tokens', 0) + prompt_tokens
+
+        if body.get('stream'):
+            self._stream(body, content, prompt_tokens, completion_tokens)
+            return
+        time.sleep(self.latency)
+
+        response = json.dumps({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def _stream(self, body: dict, content: str, prompt_tokens: int, completion_tokens: int):
+        """Send the answer word by word as chat.completion.chunk events, spread over the latency"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices, usage=None):
+            chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': body.get('model', 'gpt-3.5-turbo'), 'choices': choices, 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        words = content.split(' ')
+        time.sleep(self.latency * 0.1)
+        for i, word in enumerate(words):
+            text = word if i == 0 else ' ' + word
+            send([{'index': 0, 'delta': {'content': text}, 'finish_reason': None}])
+            time.sleep(self.latency * 0.9 / len(words))
+        send([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+        send([], {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _answer(self, prompt: str, body: dict) -> str:
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            return json.dumps({
+                'executive_summary': 'Stub summary. ' * 20,
+                'ranking_analysis': 'Stub ranking analysis. ' * 20,
+                'competitor_analysis': 'Stub competitor analysis. ' * 20,
+                'content_suggestions': [{'title': 'Guide', 'keyword': 'seo', 'type': 'Blog Post', 'description': 'A guide'}],
+                'technical_recommendations': ['Compress images', 'Add meta descriptions'],
+                'action_plan': [{'task': 'Fix titles', 'priority': 'High', 'effort': 2, 'impact': 4}]
+            })
+        if 'Content Suggestions (JSON format)' in prompt:
+            return json.dumps([{'title': 'Guide', 'keyword': 'seo', 'type': 'Blog Post', 'description': 'A guide'}])
+        if 'Action Plan (JSON format)' in prompt:
+            return json.dumps([{'task': 'Fix titles', 'priority': 'High', 'effort': 2, 'impact': 4}])
+        if 'Technical Recommendations' in prompt:
+            return '- Compress images\n- Add meta descriptions'
+        return 'Stub analysis text. ' * 20
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for hundreds of clients connecting at once (the default backlog is 5)
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # Clients that time out and hang up are expected in the benchmarks
+        pass
+
+
+def start_stub_server(handler_class, latency: float = 0.2, **handler_attributes):
+    """Start a stub server on a free local port, returning (server, base_url)"""
+    handler = type(handler_class.__name__, (handler_class,), dict(handler_attributes, latency=latency))
+    server = StubServer(('127.0.0.1', 0), handler)
+    server.request_count = 0
+    server.task_count = 0
+    server.connection_count = 0
+    server.error_count = 0
+    server.outage_until = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def create_bench_app(profile: str = None):
+    """Create a Flask app backed by a fresh temporary SQLite database.
+
+    The in-process DataForSEO cache is emptied too, so each run starts cold.
+    """
+    # Imported here so benchmarks can set DATAFORSEO_* variables after importing common
+    from src.services.dataforseo_service import hot_cache
+    hot_cache.clear()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    init_database(app, db, uri=f"sqlite:///{db_path}", profile=profile)
+    with app.app_context():
+        db.create_all()
+    return app
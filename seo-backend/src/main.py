@@ -1,14 +1,24 @@
 import os
 import sys
+import json
+import threading
+import click
+from datetime import datetime
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
-from src.models.user import db
-from src.models.seo_models import Customer, Keyword, Report, Competitor, DataForSEOCache
+from src.models.database import db, init_database, upgrade_schema
+from src.models.user import User
+from src.models.seo_models import Customer, Keyword, Report, Competitor, RankHistory, AnalysisSnapshot, DataForSEOCache, DataForSEOPayload, LLMResponseCache, Job, FleetRefreshRun
 from src.routes.user import user_bp
 from src.routes.seo_routes import seo_bp
+from src.routes.metrics import metrics_bp
+from src.services.cache_maintenance import CacheSweeper, migrate_cache_storage, sweep_expired_cache
+from src.services.fleet_refresh import FleetRefreshScheduler, refresh_fleet
+from src.services.job_queue import job_queue
+from src.services.rank_history import rollup_rank_history
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -19,14 +29,88 @@ CORS(app, origins="*")
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(seo_bp, url_prefix='/api/seo')
+# Prometheus scrape endpoint at /metrics
+app.register_blueprint(metrics_bp)
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+# Database configuration: DATABASE_URL or the bundled SQLite file with the SQLITE_PROFILE pragmas
+init_database(app, db)
 
+# One engine and pool for every model; older databases get additive schema changes
 with app.app_context():
-    db.create_all()
+    upgrade_schema()
+
+# Background workers for analysis and report jobs (JOB_QUEUE_WORKERS, 0 = enqueue only).
+# They start with the first request the web server handles, so one-shot CLI
+# commands that import the app never claim jobs; `flask run-workers` runs its own.
+job_queue.init_app(app)
+
+@app.before_request
+def start_job_workers():
+    job_queue.start()
+
+# Periodically purge expired DataForSEO cache rows (disabled when unset or 0)
+cache_sweep_interval = float(os.environ.get('CACHE_SWEEP_INTERVAL_MINUTES', 0))
+if cache_sweep_interval > 0:
+    CacheSweeper(
+        app,
+        interval_minutes=cache_sweep_interval,
+        vacuum=os.environ.get('CACHE_SWEEP_VACUUM', '').lower() in ('1', 'true', 'yes')
+    ).start()
+
+# Nightly fleet-wide refresh at FLEET_REFRESH_AT (UTC HH:MM); enable on one process only
+fleet_refresh_at = os.environ.get('FLEET_REFRESH_AT')
+if fleet_refresh_at:
+    FleetRefreshScheduler(
+        app,
+        at=fleet_refresh_at,
+        location=os.environ.get('FLEET_REFRESH_LOCATION', 'Sweden'),
+        language=os.environ.get('FLEET_REFRESH_LANGUAGE', 'en')
+    ).start()
+
+@app.cli.command('sweep-cache')
+@click.option('--batch-size', default=500, help='Rows deleted per transaction')
+@click.option('--vacuum', is_flag=True, help='VACUUM the SQLite file afterwards')
+def sweep_cache_command(batch_size, vacuum):
+    """Delete expired DataForSEO cache rows and report table size"""
+    stats = sweep_expired_cache(batch_size=batch_size, vacuum=vacuum)
+    click.echo(json.dumps(stats, indent=2))
+
+@app.cli.command('run-workers')
+@click.option('--workers', default=4, help='Worker threads to run')
+def run_workers_command(workers):
+    """Run job queue workers until interrupted (set JOB_QUEUE_WORKERS=0 on web processes to use only these)"""
+    job_queue.start_workers(workers)
+    click.echo(f"Running {workers} job workers, press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        job_queue.stop()
+
+@app.cli.command('migrate-cache-storage')
+@click.option('--batch-size', default=200, help='Rows converted per transaction')
+def migrate_cache_storage_command(batch_size):
+    """Convert plain-JSON DataForSEO cache rows to compressed payload storage"""
+    stats = migrate_cache_storage(batch_size=batch_size)
+    click.echo(json.dumps(stats, indent=2))
+
+@app.cli.command('rollup-rank-history')
+@click.option('--older-than-days', default=None, type=int, help='Keep raw points newer than this (RANK_HISTORY_RAW_DAYS)')
+@click.option('--since', default=None, help='Roll up from this ISO date instead of the last week before the cutoff')
+def rollup_rank_history_command(older_than_days, since):
+    """Downsample old rank history to one point per keyword per day"""
+    stats = rollup_rank_history(older_than_days, since=datetime.fromisoformat(since) if since else None)
+    click.echo(json.dumps(stats, indent=2))
+
+@app.cli.command('refresh-fleet')
+@click.option('--location', default='Sweden', help='SERP and keyword data location')
+@click.option('--language', default='en', help='SERP language')
+@click.option('--chunk-size', default=None, type=int, help='Keywords fetched per step (FLEET_REFRESH_CHUNK_SIZE)')
+@click.option('--rate', default=None, type=float, help='Upstream tasks per second, 0 = unlimited (FLEET_REFRESH_TASKS_PER_SECOND)')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming an interrupted run')
+def refresh_fleet_command(location, language, chunk_size, rate, restart):
+    """Refresh every active customer, fetching each unique keyword once"""
+    stats = refresh_fleet(location, language, chunk_size=chunk_size, tasks_per_second=rate, restart=restart)
+    click.echo(json.dumps(stats, indent=2))
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -0,0 +1,138 @@
+import os
+from typing import Dict
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# The one SQLAlchemy instance (engine, pool and session) shared by every model and service
+db = SQLAlchemy()
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+# Per-connection SQLite settings (SQLITE_PROFILE=tuned); 'default' leaves SQLite's own defaults
+SQLITE_PROFILES = {
+    'tuned': {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # Readers don't block the writer
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # Safe with WAL, fsync at checkpoints only
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000)),  # Negative = KiB per connection
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE_MB', 256)) * 1024 * 1024,
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000)),  # Wait for locks instead of failing
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    },
+    'default': {}
+}
+
+def get_database_uri() -> str:
+    """DATABASE_URL (e.g. a PostgreSQL server) or the bundled SQLite file"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return f"sqlite:///{DEFAULT_SQLITE_PATH}"
+    # Heroku-style URLs use the scheme name SQLAlchemy dropped
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def get_engine_options(uri: str) -> Dict:
+    """Pool sizing for the configured database (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT)"""
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    }
+
+    if uri.startswith('sqlite'):
+        if ':memory:' in uri or uri.rstrip('/') == 'sqlite:':
+            # In-memory databases live in a single connection
+            return {}
+        # Connections are shared by request, job and pool threads
+        options['connect_args'] = {'check_same_thread': False}
+    else:
+        # Server connections can be dropped by the server or a proxy while idle
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    return options
+
+def apply_sqlite_profile(engine, profile: str = None):
+    """Run the profile's PRAGMAs on every new connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = SQLITE_PROFILES[profile or os.environ.get('SQLITE_PROFILE', 'tuned')]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def init_database(app, db, uri: str = None, profile: str = None):
+    """Configure the app's database URI, pool and SQLite profile, then bind db to the app"""
+    uri = uri or app.config.get('SQLALCHEMY_DATABASE_URI') or get_database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', get_engine_options(uri))
+    db.init_app(app)
+
+    with app.app_context():
+        apply_sqlite_profile(db.engine, profile)
+
+# Sessions remember whether their current transaction wrote anything, so
+# release_connection never ends a transaction that holds the caller's writes
+@event.listens_for(Session, 'after_flush')
+def _mark_flushed_writes(session, flush_context):
+    session.info['has_writes'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_statement_writes(orm_execute_state):
+    # INSERT/UPDATE/DELETE statements and raw SQL run through session.execute()
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['has_writes'] = True
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _clear_writes(session):
+    session.info.pop('has_writes', None)
+
+def has_pending_writes() -> bool:
+    """Whether the current session holds changes (flushed or not) that nobody has committed yet"""
+    session = db.session()
+    return bool(session.new or session.dirty or session.deleted or session.info.get('has_writes'))
+
+def release_connection():
+    """Return the session's pooled connection before a thread blocks on upstream I/O.
+
+    Only a read-only transaction is ended (rolled back, there is nothing to
+    commit); with pending or already written changes the session keeps its
+    connection and the caller stays in charge of committing.
+    """
+    if has_pending_writes():
+        return
+    session = db.session()
+    if session.in_transaction():
+        session.rollback()
+
+def upgrade_schema():
+    """Create missing tables, then add nullable columns and indexes that older databases lack.
+
+    Covers additive changes only; anything else needs a manual migration.
+    """
+    db.create_all()
+
+    engine = db.engine
+    inspector = db.inspect(engine)
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                print(f"Schema upgrade: added {table.name}.{column.name}")
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
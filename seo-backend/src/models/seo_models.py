@@ -1,8 +1,36 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import datetime
+from typing import Dict, List
 import json
+from src.models.database import db
 
-db = SQLAlchemy()
+def upsert(model, values: Dict, index_elements: List[str], update: bool = True):
+    """Insert a row or update it in place when the unique key already exists.
+
+    Uses a single INSERT ... ON CONFLICT statement where the dialect supports
+    it; with update=False an existing row is left untouched. The caller is
+    responsible for committing.
+    """
+    update_values = {k: v for k, v in values.items() if k not in index_elements}
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(model).values(**values)
+        if update:
+            stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=update_values)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        db.session.execute(stmt)
+        return
+    
+    existing = model.query.filter_by(**{k: values[k] for k in index_elements}).first()
+    if existing:
+        if update:
+            for key, value in update_values.items():
+                setattr(existing, key, value)
+    else:
+        db.session.add(model(**values))
 
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -37,8 +65,10 @@ class Customer(db.Model):
         }
 
 class Keyword(db.Model):
+    LIST_FIELDS = ('id', 'customer_id', 'keyword', 'current_rank', 'previous_rank', 'search_volume', 'difficulty', 'last_updated')
+    
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False, index=True)
     keyword = db.Column(db.String(255), nullable=False)
     current_rank = db.Column(db.Integer)
     previous_rank = db.Column(db.Integer)
@@ -62,35 +92,70 @@ class Keyword(db.Model):
         }
 
 class Report(db.Model):
+    __table_args__ = (
+        db.Index('ix_report_customer_date', 'customer_id', 'report_date'),
+    )
+    
+    # Fields returned by list endpoints unless ?fields= asks for more
+    LIST_FIELDS = ('id', 'customer_id', 'report_date', 'pdf_path', 'summary')
+    # JSON text columns and their value when empty
+    JSON_DEFAULTS = {'ranking_changes': {}, 'competitor_data': {}, 'content_suggestions': [], 'technical_issues': [],
+                     'summary': {}}
+    
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     report_date = db.Column(db.DateTime, default=datetime.utcnow)
     pdf_path = db.Column(db.String(255))
-    ranking_changes = db.Column(db.Text)  # JSON string
-    competitor_data = db.Column(db.Text)  # JSON string
-    content_suggestions = db.Column(db.Text)  # JSON string
-    technical_issues = db.Column(db.Text)  # JSON string
-    ai_analysis = db.Column(db.Text)  # AI-generated analysis
+    summary = db.Column(db.Text)  # Small JSON digest for list views
+    # The report body is only loaded (in one query) when one of these is accessed
+    ranking_changes = db.deferred(db.Column(db.Text), group='body')  # JSON string
+    competitor_data = db.deferred(db.Column(db.Text), group='body')  # JSON string
+    content_suggestions = db.deferred(db.Column(db.Text), group='body')  # JSON string
+    technical_issues = db.deferred(db.Column(db.Text), group='body')  # JSON string
+    ai_analysis = db.deferred(db.Column(db.Text), group='body')  # AI-generated analysis
     
     def __repr__(self):
         return f'<Report {self.id} for Customer {self.customer_id}>'
 
+    def decoded(self, field: str):
+        """A JSON column's decoded value, parsed at most once per loaded value"""
+        raw = getattr(self, field)
+        cache = self.__dict__.setdefault('_decoded', {})
+        cached = cache.get(field)
+        if cached is None or cached[0] is not raw:
+            value = json.loads(raw) if raw else self.JSON_DEFAULTS.get(field)
+            cached = cache[field] = (raw, value)
+        return cached[1]
+
+    def to_summary_dict(self):
+        return {
+            'id': self.id,
+            'customer_id': self.customer_id,
+            'report_date': self.report_date.isoformat() if self.report_date else None,
+            'pdf_path': self.pdf_path,
+            'summary': self.decoded('summary')
+        }
+
     def to_dict(self):
         return {
             'id': self.id,
             'customer_id': self.customer_id,
             'report_date': self.report_date.isoformat() if self.report_date else None,
             'pdf_path': self.pdf_path,
-            'ranking_changes': json.loads(self.ranking_changes) if self.ranking_changes else {},
-            'competitor_data': json.loads(self.competitor_data) if self.competitor_data else {},
-            'content_suggestions': json.loads(self.content_suggestions) if self.content_suggestions else [],
-            'technical_issues': json.loads(self.technical_issues) if self.technical_issues else [],
+            'summary': self.decoded('summary'),
+            'ranking_changes': self.decoded('ranking_changes'),
+            'competitor_data': self.decoded('competitor_data'),
+            'content_suggestions': self.decoded('content_suggestions'),
+            'technical_issues': self.decoded('technical_issues'),
             'ai_analysis': self.ai_analysis
         }
 
 class Competitor(db.Model):
+    LIST_FIELDS = ('id', 'customer_id', 'competitor_url', 'competitor_rank', 'last_analyzed')
+    JSON_DEFAULTS = {'content_analysis': {}}
+    
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False, index=True)
     competitor_url = db.Column(db.String(255), nullable=False)
     competitor_rank = db.Column(db.Integer)
     content_analysis = db.Column(db.Text)  # JSON string
@@ -109,13 +174,100 @@ class Competitor(db.Model):
             'last_analyzed': self.last_analyzed.isoformat() if self.last_analyzed else None
         }
 
+class CustomerStats(db.Model):
+    """Dashboard aggregates per customer, kept up to date as analyses and reports are written"""
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    total_keywords = db.Column(db.Integer, nullable=False, default=0)
+    ranked_keywords = db.Column(db.Integer, nullable=False, default=0)
+    ranking_improvements = db.Column(db.Integer, nullable=False, default=0)
+    total_search_volume = db.Column(db.BigInteger, nullable=False, default=0)
+    total_competitors = db.Column(db.Integer, nullable=False, default=0)
+    total_reports = db.Column(db.Integer, nullable=False, default=0)
+    last_report_id = db.Column(db.Integer)
+    last_report_date = db.Column(db.DateTime)
+    last_analysis_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CustomerStats {self.customer_id}>'
+
+    def to_dict(self):
+        return {
+            'total_keywords': self.total_keywords,
+            'ranked_keywords': self.ranked_keywords,
+            'ranking_improvements': self.ranking_improvements,
+            'avg_search_volume': self.total_search_volume // self.total_keywords if self.total_keywords else 0,
+            'total_competitors': self.total_competitors,
+            'total_reports': self.total_reports,
+            'last_report_id': self.last_report_id,
+            'last_report_date': self.last_report_date.isoformat() if self.last_report_date else None,
+            'last_analysis_at': self.last_analysis_at.isoformat() if self.last_analysis_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class RankHistory(db.Model):
+    """Append-only rank/volume time series, one row per keyword per analysis run.
+
+    Timestamps are unix seconds so rows stay small; on SQLite the table is
+    WITHOUT ROWID, clustering each keyword's points together on disk.
+    """
+    __table_args__ = (
+        db.Index('ix_rank_history_customer_time', 'customer_id', 'recorded_at'),
+        {'sqlite_with_rowid': False}
+    )
+    
+    keyword_id = db.Column(db.Integer, db.ForeignKey('keyword.id'), primary_key=True, autoincrement=False)
+    recorded_at = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Unix seconds (UTC)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    rank = db.Column(db.SmallInteger)  # None when not ranking
+    search_volume = db.Column(db.Integer)
+    samples = db.Column(db.SmallInteger, nullable=False, default=1)  # Raw points merged by the daily rollup
+    
+    def __repr__(self):
+        return f'<RankHistory {self.keyword_id} {self.recorded_at}>'
+
+    def to_dict(self):
+        return {
+            'keyword_id': self.keyword_id,
+            'recorded_at': datetime.utcfromtimestamp(self.recorded_at).isoformat(),
+            'rank': self.rank,
+            'search_volume': self.search_volume,
+            'samples': self.samples
+        }
+
+class AnalysisSnapshot(db.Model):
+    """Latest analyze_customer_seo results per customer, with per-part fetch times"""
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    website_url = db.Column(db.String(255), nullable=False)
+    keywords = db.Column(db.Text, nullable=False)  # JSON array the rankings/keyword data were fetched for
+    results = db.Column(db.Text, nullable=False)  # JSON analysis results
+    rankings_at = db.Column(db.DateTime)  # keyword_rankings and competitors
+    keyword_data_at = db.Column(db.DateTime)
+    technical_audit_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AnalysisSnapshot {self.customer_id}>'
+
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'website_url': self.website_url,
+            'keywords': json.loads(self.keywords) if self.keywords else [],
+            'rankings_at': self.rankings_at.isoformat() if self.rankings_at else None,
+            'keyword_data_at': self.keyword_data_at.isoformat() if self.keyword_data_at else None,
+            'technical_audit_at': self.technical_audit_at.isoformat() if self.technical_audit_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class DataForSEOCache(db.Model):
     """Cache for DataForSEO API responses to avoid unnecessary API calls"""
     id = db.Column(db.Integer, primary_key=True)
     cache_key = db.Column(db.String(255), unique=True, nullable=False)
-    cache_data = db.Column(db.Text, nullable=False)  # JSON string
+    cache_data = db.Column(db.Text, nullable=False)  # JSON string, empty when stored in DataForSEOPayload
+    payload_hash = db.Column(db.String(64), index=True)  # DataForSEOPayload.content_hash
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     
     def __repr__(self):
         return f'<DataForSEOCache {self.cache_key}>'
@@ -125,7 +277,109 @@ class DataForSEOCache(db.Model):
             'id': self.id,
             'cache_key': self.cache_key,
             'cache_data': json.loads(self.cache_data) if self.cache_data else {},
+            'payload_hash': self.payload_hash,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None
         }
 
+class DataForSEOPayload(db.Model):
+    """Compressed API response bodies, stored once per distinct content"""
+    content_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the JSON text
+    encoding = db.Column(db.String(16), nullable=False)  # zlib
+    data = db.Column(db.LargeBinary, nullable=False)
+    raw_size = db.Column(db.Integer, nullable=False)  # Uncompressed JSON length
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DataForSEOPayload {self.content_hash}>'
+
+class LLMResponseCache(db.Model):
+    """Cached chat completions keyed on model, messages and sampling params"""
+    cache_key = db.Column(db.String(64), primary_key=True)  # sha256 of the request
+    model = db.Column(db.String(100), nullable=False)
+    response_text = db.Column(db.Text, nullable=False)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+    size = db.Column(db.Integer, nullable=False)  # len(response_text)
+    hit_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<LLMResponseCache {self.cache_key}>'
+
+
+class Job(db.Model):
+    """Background job for long-running analysis and report generation"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # analyze, generate_report
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    payload = db.Column(db.Text)  # JSON string
+    result = db.Column(db.Text)  # JSON string
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.job_type} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'customer_id': self.customer_id,
+            'status': self.status,
+            'payload': json.loads(self.payload) if self.payload else {},
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class FleetRefreshRun(db.Model):
+    """Progress of a fleet-wide refresh, so an interrupted run can resume where it stopped"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running', index=True)  # running, succeeded, failed
+    phase = db.Column(db.String(20), nullable=False, default='fetch')  # fetch, fan_out
+    location = db.Column(db.String(100), nullable=False)
+    language = db.Column(db.String(20), nullable=False)
+    keyword_cursor = db.Column(db.String(255))  # Last keyword fetched (keywords are fetched in sorted order)
+    customer_cursor = db.Column(db.Integer)  # Last customer id refreshed
+    unique_keywords = db.Column(db.Integer, nullable=False, default=0)
+    keyword_references = db.Column(db.Integer, nullable=False, default=0)  # Sum of the customers' keyword lists
+    keywords_fetched = db.Column(db.Integer, nullable=False, default=0)
+    upstream_tasks = db.Column(db.Integer, nullable=False, default=0)
+    customers_refreshed = db.Column(db.Integer, nullable=False, default=0)
+    customers_failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<FleetRefreshRun {self.id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'location': self.location,
+            'language': self.language,
+            'keyword_cursor': self.keyword_cursor,
+            'customer_cursor': self.customer_cursor,
+            'unique_keywords': self.unique_keywords,
+            'keyword_references': self.keyword_references,
+            'keywords_fetched': self.keywords_fetched,
+            'upstream_tasks': self.upstream_tasks,
+            'customers_refreshed': self.customers_refreshed,
+            'customers_failed': self.customers_failed,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,85 @@
+from flask import Blueprint, Response
+from src.services import llm_cache, metrics
+from src.services.dataforseo_service import get_upstream_stats, hot_cache, inflight_requests, refresh_stats
+from src.services.upstream_scheduler import get_scheduler_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _collect_dataforseo():
+    """Counters the DataForSEO client keeps for /cache/stats"""
+    upstream = get_upstream_stats()
+    hot = hot_cache.stats()
+    inflight = inflight_requests.stats()
+    return [
+        metrics.family('seo_dataforseo_upstream_events_total', 'counter',
+                       'DataForSEO POSTs, tasks, retries and failures by kind',
+                       [({'event': event}, value) for event, value in upstream['requests'].items()]),
+        metrics.family('seo_dataforseo_circuit_open', 'gauge',
+                       'Whether the circuit breaker of an upstream host is open (1) or half open (0.5)',
+                       [({'host': host}, {'open': 1, 'half_open': 0.5}.get(breaker['state'], 0))
+                        for host, breaker in upstream['circuit_breakers'].items()]),
+        metrics.family('seo_dataforseo_hot_cache_events_total', 'counter',
+                       'In-memory DataForSEO cache lookups and removals by kind',
+                       [({'event': event}, hot[event])
+                        for event in ('hits', 'stale_hits', 'misses', 'evictions', 'expirations')]),
+        metrics.family('seo_dataforseo_hot_cache_bytes', 'gauge', 'Size of the in-memory DataForSEO cache',
+                       [({}, hot['bytes'])]),
+        metrics.family('seo_dataforseo_hot_cache_entries', 'gauge', 'Entries in the in-memory DataForSEO cache',
+                       [({}, hot['entries'])]),
+        metrics.family('seo_dataforseo_inflight_events_total', 'counter',
+                       'DataForSEO calls made (leaders) and shared by identical concurrent lookups',
+                       [({'event': 'leaders'}, inflight['leaders']), ({'event': 'shared'}, inflight['shared'])]),
+        metrics.family('seo_dataforseo_stale_events_total', 'counter',
+                       'Stale DataForSEO entries served and background refreshes started',
+                       [({'event': event}, value) for event, value in refresh_stats.items()])
+    ]
+
+def _collect_llm_cache():
+    """Process counters of the LLM response cache (the table totals need a query, see /cache/stats)"""
+    stats = llm_cache.get_cache_counters()
+    return [
+        metrics.family('seo_llm_cache_events_total', 'counter', 'LLM response cache lookups and writes by kind',
+                       [({'event': event}, stats[event])
+                        for event in ('hits', 'misses', 'bypassed', 'stores', 'evictions')]),
+        metrics.family('seo_llm_cache_tokens_saved_total', 'counter', 'OpenAI tokens not spent thanks to cache hits',
+                       [({'kind': 'prompt'}, stats['prompt_tokens_saved']),
+                        ({'kind': 'completion'}, stats['completion_tokens_saved'])])
+    ]
+
+def _collect_schedulers():
+    """Per-tier queueing of every upstream scheduler"""
+    gauges = {'in_flight': [], 'queue_depth': []}
+    counters = {'dispatched': [], 'queued': [], 'throttled': [], 'wait_seconds': [], 'throttled_seconds': []}
+    for api, stats in get_scheduler_stats().items():
+        for tier, tier_stats in stats['tiers'].items():
+            labels = {'api': api, 'tier': tier}
+            for name in gauges:
+                gauges[name].append((labels, tier_stats[name]))
+            for name in counters:
+                counters[name].append((labels, tier_stats[name]))
+
+    return [
+        metrics.family('seo_scheduler_in_flight', 'gauge', 'Upstream calls in flight by plan tier',
+                       gauges['in_flight']),
+        metrics.family('seo_scheduler_queue_depth', 'gauge', 'Upstream calls waiting for a slot by plan tier',
+                       gauges['queue_depth']),
+        metrics.family('seo_scheduler_dispatched_total', 'counter', 'Upstream calls given a slot by plan tier',
+                       counters['dispatched']),
+        metrics.family('seo_scheduler_queued_total', 'counter', 'Upstream calls that had to wait for a slot',
+                       counters['queued']),
+        metrics.family('seo_scheduler_wait_seconds_total', 'counter', 'Time upstream calls waited for a slot',
+                       counters['wait_seconds']),
+        metrics.family('seo_scheduler_throttled_total', 'counter', 'Calls delayed by a customer rate limit',
+                       counters['throttled']),
+        metrics.family('seo_scheduler_throttled_seconds_total', 'counter', 'Time calls waited for a customer rate limit',
+                       counters['throttled_seconds'])
+    ]
+
+metrics.registry.register_collector(_collect_dataforseo)
+metrics.registry.register_collector(_collect_llm_cache)
+metrics.registry.register_collector(_collect_schedulers)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Upstream cost, latency and cache metrics of this process in the Prometheus text format"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
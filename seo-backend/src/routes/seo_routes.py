@@ -1,12 +1,86 @@
-from flask import Blueprint, request, jsonify, send_from_directory
-from datetime import datetime
+from flask import Blueprint, Response, g, request, jsonify, send_from_directory, stream_with_context
+from datetime import datetime, timedelta, timezone
 import json
 import os
-from src.models.seo_models import db, Customer, Keyword, Report, Competitor
+from src.models.database import db
+from src.models.seo_models import Customer, Keyword, Report, Competitor, Job
+from src.services import analysis_snapshots, customer_stats, metrics, pagination, rank_history, seo_tasks
 from src.services.dataforseo_service import DataForSEOService
+from src.services.concurrency import Tenant, current_tenant
+from src.services.job_queue import job_queue
 
 seo_bp = Blueprint('seo', __name__)
 
+@seo_bp.before_request
+def _set_tenant():
+    """Attribute upstream calls made by customer routes to the customer's plan tier"""
+    customer_id = (request.view_args or {}).get('customer_id')
+    if customer_id is None:
+        return
+    # Loaded into the session's identity map, so the view's own lookup is free
+    customer = db.session.get(Customer, customer_id)
+    if customer is not None:
+        g.tenant_token = current_tenant.set(Tenant(customer.id, customer.subscription_plan))
+
+@seo_bp.teardown_request
+def _reset_tenant(exception=None):
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        current_tenant.reset(token)
+
+def _run_synchronously(data) -> bool:
+    """Whether the caller asked to run heavy work inline (?sync=true or {"sync": true})"""
+    if request.args.get('sync', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(data and data.get('sync'))
+
+def _force_refresh(data=None) -> bool:
+    """Whether the caller asked to bypass cached AI responses (?force=true or {"force": true})"""
+    if request.args.get('force', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(data and data.get('force'))
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _parse_utc(value: str) -> datetime:
+    """ISO date or datetime -> naive UTC; offsets are converted rather than dropped"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _date_range(default_days: int = 90):
+    """(start, end) from ?start=&end= ISO dates, defaulting to the last default_days"""
+    end = _parse_utc(request.args['end']) if request.args.get('end') else datetime.utcnow()
+    start = _parse_utc(request.args['start']) if request.args.get('start') else end - timedelta(days=default_days)
+    return start, end
+
+def _list_page(model, customer_id: int, sort_columns, descending: bool = False):
+    """Keyset-paginated list response (?limit=, ?cursor=, ?fields=a,b)"""
+    allowed = [column.key for column in model.__table__.columns]
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or list(model.LIST_FIELDS)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}", 'allowed_fields': allowed}), 400
+    
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    try:
+        items, next_cursor = pagination.paginate(
+            model, [model.customer_id == customer_id], sort_columns, descending,
+            fields, limit, request.args.get('cursor')
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({'items': items, 'next_cursor': next_cursor, 'limit': limit})
+
+def _job_accepted(job, body: dict):
+    """202 response pointing at the status endpoint of a queued job"""
+    body.update({'job_id': job.id, 'status': job.status, 'status_url': f'/api/seo/jobs/{job.id}'})
+    return jsonify(body), 202, {'Location': f'/api/seo/jobs/{job.id}'}
+
 @seo_bp.route('/customers', methods=['POST'])
 def create_customer():
     """Create a new customer account"""
@@ -40,58 +114,30 @@ def create_customer():
         db.session.commit()
         
         # Create keyword entries
-        for keyword in keywords:
-            keyword_entry = Keyword(
-                customer_id=customer.id,
-                keyword=keyword
-            )
-            db.session.add(keyword_entry)
+        db.session.bulk_insert_mappings(Keyword, [
+            {'customer_id': customer.id, 'keyword': keyword} for keyword in keywords
+        ])
+        customer_stats.update_keyword_stats(customer.id, [(None, None, None)] * len(keywords))
         
         db.session.commit()
         
         # Trigger initial SEO analysis
-        try:
-            seo_service = DataForSEOService()
-            analysis_results = seo_service.analyze_customer_seo({
-                'website_url': customer.website_url,
-                'target_keywords': keywords
-            })
-            
-            # Update keyword data
-            for keyword in keywords:
-                keyword_entry = Keyword.query.filter_by(
-                    customer_id=customer.id, 
-                    keyword=keyword
-                ).first()
-                
-                if keyword_entry and keyword in analysis_results.get('keyword_rankings', {}):
-                    ranking_data = analysis_results['keyword_rankings'][keyword]
-                    keyword_entry.current_rank = ranking_data.get('current_rank')
-                    
-                if keyword_entry and keyword in analysis_results.get('keyword_data', {}):
-                    kw_data = analysis_results['keyword_data'][keyword]
-                    keyword_entry.search_volume = kw_data.get('search_volume')
-                    keyword_entry.difficulty = kw_data.get('difficulty')
-            
-            # Store competitors
-            for competitor_data in analysis_results.get('competitors', []):
-                competitor = Competitor(
-                    customer_id=customer.id,
-                    competitor_url=competitor_data['url'],
-                    competitor_rank=int(competitor_data['average_rank']),
-                    content_analysis=json.dumps(competitor_data)
-                )
-                db.session.add(competitor)
+        if _run_synchronously(data):
+            try:
+                seo_tasks.run_customer_analysis(customer.id)
+            except Exception as e:
+                metrics.report_error('seo_routes', "Error in initial SEO analysis", e)
             
-            db.session.commit()
-            
-        except Exception as e:
-            print(f"Error in initial SEO analysis: {e}")
-        
-        return jsonify({
-            'message': 'Customer created successfully',
+            return jsonify({
+                'message': 'Customer created successfully',
+                'customer': customer.to_dict()
+            }), 201
+        
+        job = job_queue.enqueue('analyze', customer_id=customer.id)
+        return _job_accepted(job, {
+            'message': 'Customer created successfully, initial SEO analysis queued',
             'customer': customer.to_dict()
-        }), 201
+        })
         
     except Exception as e:
         db.session.rollback()
@@ -108,31 +154,28 @@ def get_customer(customer_id):
 
 @seo_bp.route('/customers/<int:customer_id>/keywords', methods=['GET'])
 def get_customer_keywords(customer_id):
-    """Get all keywords for a customer"""
+    """Get a page of a customer's keywords"""
     try:
         customer = Customer.query.get_or_404(customer_id)
-        keywords = Keyword.query.filter_by(customer_id=customer_id).all()
-        return jsonify([keyword.to_dict() for keyword in keywords])
+        return _list_page(Keyword, customer_id, [Keyword.id])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @seo_bp.route('/customers/<int:customer_id>/competitors', methods=['GET'])
 def get_customer_competitors(customer_id):
-    """Get all competitors for a customer"""
+    """Get a page of a customer's competitors"""
     try:
         customer = Customer.query.get_or_404(customer_id)
-        competitors = Competitor.query.filter_by(customer_id=customer_id).all()
-        return jsonify([competitor.to_dict() for competitor in competitors])
+        return _list_page(Competitor, customer_id, [Competitor.id])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @seo_bp.route('/customers/<int:customer_id>/reports', methods=['GET'])
 def get_customer_reports(customer_id):
-    """Get all reports for a customer"""
+    """Get a page of a customer's reports, newest first (JSON columns only via ?fields=)"""
     try:
         customer = Customer.query.get_or_404(customer_id)
-        reports = Report.query.filter_by(customer_id=customer_id).order_by(Report.report_date.desc()).all()
-        return jsonify([report.to_dict() for report in reports])
+        return _list_page(Report, customer_id, [Report.report_date, Report.id], descending=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -141,92 +184,86 @@ def analyze_customer_seo(customer_id):
     """Trigger SEO analysis for a customer"""
     try:
         customer = Customer.query.get_or_404(customer_id)
-        keywords = json.loads(customer.target_keywords)
-        
-        # Initialize DataForSEO service
-        seo_service = DataForSEOService()
         
-        # Perform SEO analysis
-        analysis_results = seo_service.analyze_customer_seo({
-            'website_url': customer.website_url,
-            'target_keywords': keywords
-        })
+        if _run_synchronously(request.get_json(silent=True)):
+            analysis_results = seo_tasks.run_customer_analysis(customer_id)
+            return jsonify({
+                'message': 'SEO analysis completed successfully',
+                'results': analysis_results
+            })
         
-        # Update keyword rankings
-        for keyword in keywords:
-            keyword_entry = Keyword.query.filter_by(
-                customer_id=customer_id, 
-                keyword=keyword
-            ).first()
-            
-            if keyword_entry and keyword in analysis_results.get('keyword_rankings', {}):
-                ranking_data = analysis_results['keyword_rankings'][keyword]
-                
-                # Store previous rank
-                keyword_entry.previous_rank = keyword_entry.current_rank
-                keyword_entry.current_rank = ranking_data.get('current_rank')
-                keyword_entry.last_updated = datetime.utcnow()
-                
-            if keyword_entry and keyword in analysis_results.get('keyword_data', {}):
-                kw_data = analysis_results['keyword_data'][keyword]
-                keyword_entry.search_volume = kw_data.get('search_volume')
-                keyword_entry.difficulty = kw_data.get('difficulty')
-        
-        # Update competitors
-        Competitor.query.filter_by(customer_id=customer_id).delete()
-        for competitor_data in analysis_results.get('competitors', []):
-            competitor = Competitor(
-                customer_id=customer_id,
-                competitor_url=competitor_data['url'],
-                competitor_rank=int(competitor_data['average_rank']),
-                content_analysis=json.dumps(competitor_data)
-            )
-            db.session.add(competitor)
+        job = job_queue.enqueue('analyze', customer_id=customer.id)
+        return _job_accepted(job, {'message': 'SEO analysis queued'})
         
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@seo_bp.route('/customers/<int:customer_id>/rank-history', methods=['GET'])
+def get_customer_rank_history(customer_id):
+    """Get rank history for a customer's keywords (?start=&end=&keyword_id=)"""
+    try:
+        Customer.query.get_or_404(customer_id)
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO dates'}), 400
         
+        keyword_ids = request.args.getlist('keyword_id', type=int)
+        series = rank_history.get_series(customer_id, start, end, keyword_ids)
         return jsonify({
-            'message': 'SEO analysis completed successfully',
-            'results': analysis_results
+            'customer_id': customer_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'series': {str(keyword_id): points for keyword_id, points in series.items()}
         })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@seo_bp.route('/keywords/<int:keyword_id>/rank-history', methods=['GET'])
+def get_keyword_rank_history(keyword_id):
+    """Get rank history for one keyword (?start=&end=)"""
+    try:
+        keyword = Keyword.query.get_or_404(keyword_id)
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO dates'}), 400
         
+        series = rank_history.get_series(keyword.customer_id, start, end, [keyword_id])
+        return jsonify({
+            'keyword': keyword.to_dict(),
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'points': series.get(keyword_id, [])
+        })
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @seo_bp.route('/customers/<int:customer_id>/dashboard', methods=['GET'])
 def get_customer_dashboard(customer_id):
-    """Get dashboard data for a customer"""
+    """Get dashboard data for a customer.
+    
+    Reads the precomputed stats row plus bounded lists, so the cost doesn't
+    grow with the number of keywords or reports (?keyword_limit=, default 20).
+    """
     try:
         customer = Customer.query.get_or_404(customer_id)
-        keywords = Keyword.query.filter_by(customer_id=customer_id).all()
-        competitors = Competitor.query.filter_by(customer_id=customer_id).limit(5).all()
-        recent_reports = Report.query.filter_by(customer_id=customer_id).order_by(Report.report_date.desc()).limit(3).all()
-        
-        # Calculate ranking improvements
-        ranking_improvements = 0
-        total_keywords = len(keywords)
-        
-        for keyword in keywords:
-            if keyword.current_rank and keyword.previous_rank:
-                if keyword.current_rank < keyword.previous_rank:  # Lower rank number is better
-                    ranking_improvements += 1
+        stats = customer_stats.get_customer_stats(customer_id)
+        keyword_limit = max(1, min(request.args.get('keyword_limit', 20, type=int), 100))
         
-        # Calculate average search volume
-        total_volume = sum(k.search_volume or 0 for k in keywords)
-        avg_search_volume = total_volume // total_keywords if total_keywords > 0 else 0
+        # Best ranked keywords first, unranked ones last
+        keywords = Keyword.query.filter_by(customer_id=customer_id).order_by(
+            Keyword.current_rank.is_(None), Keyword.current_rank, Keyword.id
+        ).limit(keyword_limit).all()
+        competitors = Competitor.query.filter_by(customer_id=customer_id).limit(5).all()
         
         dashboard_data = {
             'customer': customer.to_dict(),
-            'stats': {
-                'total_keywords': total_keywords,
-                'ranking_improvements': ranking_improvements,
-                'avg_search_volume': avg_search_volume,
-                'total_competitors': len(competitors)
-            },
+            'stats': stats.to_dict(),
             'keywords': [k.to_dict() for k in keywords],
             'competitors': [c.to_dict() for c in competitors],
-            'recent_reports': [r.to_dict() for r in recent_reports]
+            'recent_reports': customer_stats.recent_report_summaries(customer_id, limit=3)
         }
         
         return jsonify(dashboard_data)
@@ -254,6 +291,27 @@ def test_dataforseo():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@seo_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get DataForSEO and LLM response cache, sweep and request deduplication stats"""
+    from src.services import cache_maintenance, llm_cache
+    from src.services.dataforseo_service import get_upstream_stats, hot_cache, inflight_requests, refresh_stats
+    return jsonify({
+        'dataforseo_upstream': get_upstream_stats(),
+        'dataforseo_hot_cache': hot_cache.stats(),
+        'dataforseo_inflight': inflight_requests.stats(),
+        'dataforseo_stale_while_revalidate': dict(refresh_stats),
+        'dataforseo_cache_table': cache_maintenance.get_cache_table_stats(),
+        'last_sweep': cache_maintenance.last_sweep_stats,
+        'llm_response_cache': llm_cache.get_llm_cache_stats()
+    })
+
+@seo_bp.route('/scheduler/stats', methods=['GET'])
+def get_scheduler_stats():
+    """Queue depth, in-flight calls and wait times per plan tier for each upstream API"""
+    from src.services.upstream_scheduler import get_scheduler_stats
+    return jsonify(get_scheduler_stats())
+
 @seo_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -269,76 +327,80 @@ def health_check():
 def generate_ai_report(customer_id):
     """Generate AI-powered SEO report for a customer"""
     try:
-        from src.services.ai_report_service import AIReportService
-        
         customer = Customer.query.get_or_404(customer_id)
-        keywords = json.loads(customer.target_keywords)
-        
-        # Get latest SEO data
-        from src.services.dataforseo_service import DataForSEOService
-        seo_service = DataForSEOService()
-        
-        seo_data = seo_service.analyze_customer_seo({
-            'website_url': customer.website_url,
-            'target_keywords': keywords
-        })
-        
-        # Generate AI report
-        ai_service = AIReportService()
-        report_data = ai_service.generate_seo_analysis(customer.to_dict(), seo_data)
-        
-        # Create report record
-        report = Report(
-            customer_id=customer_id,
-            ranking_changes=json.dumps(seo_data.get('keyword_rankings', {})),
-            competitor_data=json.dumps(seo_data.get('competitors', [])),
-            content_suggestions=json.dumps(report_data.get('content_suggestions', [])),
-            technical_issues=json.dumps(seo_data.get('technical_audit', {})),
-            ai_analysis=json.dumps({
-                'executive_summary': report_data.get('executive_summary', ''),
-                'ranking_analysis': report_data.get('ranking_analysis', ''),
-                'competitor_analysis': report_data.get('competitor_analysis', ''),
-                'technical_recommendations': report_data.get('technical_recommendations', []),
-                'action_plan': report_data.get('action_plan', [])
+        data = request.get_json(silent=True) or {}
+        generate_pdf = bool(data.get('generate_pdf', False))
+        force = _force_refresh(data)
+        
+        if _run_synchronously(data):
+            result = seo_tasks.run_report_generation(customer_id, generate_pdf=generate_pdf, force=force)
+            return jsonify({
+                'message': 'AI report generated successfully',
+                'report_id': result['report_id'],
+                'report_data': result['report_data']
             })
-        )
-        
-        # Generate PDF if requested
-        data = request.get_json() or {}
-        if data.get('generate_pdf', False):
-            import os
-            pdf_dir = os.path.join(os.path.dirname(__file__), '..', 'reports')
-            os.makedirs(pdf_dir, exist_ok=True)
-            
-            pdf_filename = f"seo_report_{customer_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            pdf_path = os.path.join(pdf_dir, pdf_filename)
-            
-            generated_pdf = ai_service.generate_pdf_report(customer.to_dict(), report_data, pdf_path)
-            if generated_pdf:
-                report.pdf_path = pdf_path
-        
-        db.session.add(report)
-        
-        # Update customer's last report date
-        customer.last_report_date = datetime.utcnow()
-        
-        db.session.commit()
         
-        return jsonify({
-            'message': 'AI report generated successfully',
-            'report_id': report.id,
-            'report_data': report_data
-        })
+        job = job_queue.enqueue('generate_report', customer_id=customer.id, payload={'generate_pdf': generate_pdf, 'force': force})
+        return _job_accepted(job, {'message': 'AI report generation queued'})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@seo_bp.route('/customers/<int:customer_id>/generate-report/stream', methods=['GET', 'POST'])
+def stream_ai_report(customer_id):
+    """Generate an AI report, streaming sections as server-sent events.
+
+    Events: status, delta (text chunks of free-text sections), section
+    (final content), done (with report_id) or error.
+    """
+    from src.services.ai_report_service import AIReportService
+    
+    customer = Customer.query.get_or_404(customer_id)
+    data = request.get_json(silent=True) or {}
+    generate_pdf = bool(data.get('generate_pdf')) or request.args.get('generate_pdf', '').lower() in ('1', 'true', 'yes')
+    force = _force_refresh(data)
+    
+    def events():
+        yield _sse('status', {'stage': 'collecting_seo_data'})
+        try:
+            seo_data = analysis_snapshots.get_customer_analysis(customer)
+            
+            yield _sse('status', {'stage': 'generating_sections'})
+            ai_service = AIReportService(force_refresh=force)
+            report_data = {}
+            for event, payload in ai_service.stream_seo_analysis(customer.to_dict(), seo_data):
+                if event == 'section':
+                    report_data[payload['section']] = payload['content']
+                yield _sse(event, payload)
+            
+            if generate_pdf:
+                yield _sse('status', {'stage': 'rendering_pdf'})
+            report = seo_tasks.save_report(customer, seo_data, report_data, ai_service, generate_pdf)
+            yield _sse('done', {'report_id': report.id, 'pdf': bool(report.pdf_path)})
+        except Exception as e:
+            db.session.rollback()
+            yield _sse('error', {'error': str(e)})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@seo_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status (and result, once finished) of a background job"""
+    try:
+        job = Job.query.get_or_404(job_id)
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @seo_bp.route('/reports/<int:report_id>', methods=['GET'])
 def get_report(report_id):
     """Get a specific report"""
     try:
-        report = Report.query.get_or_404(report_id)
+        report = Report.query.options(db.undefer_group('body')).get_or_404(report_id)
         return jsonify(report.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -378,7 +440,7 @@ def get_content_ideas(customer_id):
         Business Type: General Business
         """
         
-        ai_service = AIReportService()
+        ai_service = AIReportService(force_refresh=_force_refresh())
         content_suggestions = ai_service._generate_content_suggestions(context)
         
         return jsonify({
@@ -1,39 +1,375 @@
 import openai
 import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Tuple
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 import os
+from src.models.database import release_connection
+from src.services import llm_cache, metrics
+from src.services.concurrency import with_app_context
+from src.services.upstream_scheduler import openai_scheduler
 
 class AIReportService:
     """Service for generating AI-powered SEO reports"""
     
-    def __init__(self):
+    # Report section -> (generator, fallback) method names
+    SECTIONS = {
+        'executive_summary': ('_generate_executive_summary', '_get_fallback_executive_summary'),
+        'ranking_analysis': ('_generate_ranking_analysis', '_get_fallback_ranking_analysis'),
+        'competitor_analysis': ('_generate_competitor_analysis', '_get_fallback_competitor_analysis'),
+        'content_suggestions': ('_generate_content_suggestions', '_get_fallback_content_suggestions'),
+        'technical_recommendations': ('_generate_technical_recommendations', '_get_fallback_technical_recommendations'),
+        'action_plan': ('_generate_action_plan', '_get_fallback_action_plan')
+    }
+    
+    # Expected shape of each section in a structured (single call) response:
+    # (type, required keys for list items)
+    SECTION_SCHEMA = {
+        'executive_summary': (str, None),
+        'ranking_analysis': (str, None),
+        'competitor_analysis': (str, None),
+        'content_suggestions': (list, ('title', 'keyword', 'type', 'description')),
+        'technical_recommendations': (list, None),
+        'action_plan': (list, ('task', 'priority', 'effort', 'impact'))
+    }
+    
+    # sections: one completion per section; structured: all sections in one JSON completion
+    GENERATION_MODES = ('sections', 'structured')
+    
+    # Free-text sections whose tokens are forwarded as they arrive when streaming
+    STREAMED_SECTIONS = ('executive_summary', 'ranking_analysis', 'competitor_analysis')
+    
+    MODEL = "gpt-3.5-turbo"
+    
+    def __init__(self, max_workers: int = None, section_timeout: float = None, generation_mode: str = None,
+                 force_refresh: bool = False):
         # OpenAI is already configured via environment variables
         self.client = openai.OpenAI()
         
+        # Sections are generated concurrently; each gets section_timeout seconds
+        self.max_workers = max_workers or int(os.environ.get('AI_REPORT_MAX_WORKERS', len(self.SECTIONS)))
+        self.section_timeout = section_timeout or float(os.environ.get('AI_REPORT_SECTION_TIMEOUT', 60))
+        
+        self.generation_mode = generation_mode or os.environ.get('AI_REPORT_MODE', 'sections')
+        if self.generation_mode not in self.GENERATION_MODES:
+            raise ValueError(f"Unknown AI report mode: {self.generation_mode}")
+        
+        # Requests and tokens used by this instance, for comparing modes
+        self.usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._usage_lock = threading.Lock()
+        
+        # Reuse cached completions for identical requests (LLM_CACHE_ENABLED);
+        # force_refresh skips the lookup and replaces the cached response
+        self.cache_enabled = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() != 'false'
+        self.force_refresh = force_refresh
+        
     def generate_seo_analysis(self, customer_data: Dict, seo_data: Dict) -> Dict:
         """Generate comprehensive SEO analysis using AI"""
         
         # Prepare data for AI analysis
         analysis_context = self._prepare_analysis_context(customer_data, seo_data)
         
-        # Generate different sections of the report
-        report_sections = {
-            'executive_summary': self._generate_executive_summary(analysis_context),
-            'ranking_analysis': self._generate_ranking_analysis(analysis_context),
-            'competitor_analysis': self._generate_competitor_analysis(analysis_context),
-            'content_suggestions': self._generate_content_suggestions(analysis_context),
-            'technical_recommendations': self._generate_technical_recommendations(analysis_context),
-            'action_plan': self._generate_action_plan(analysis_context)
+        if self.generation_mode == 'structured':
+            return self._generate_structured_report(analysis_context)
+        
+        # Generate the independent report sections in parallel
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ai-section')
+        futures = {
+            section: executor.submit(with_app_context(getattr(self, generator)), analysis_context)
+            for section, (generator, _) in self.SECTIONS.items()
         }
         
+        report_sections = {}
+        deadline = time.monotonic() + self.section_timeout
+        for section, future in futures.items():
+            try:
+                report_sections[section] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                metrics.report_error('ai_report', f"AI generation error ({section})", e)
+                report_sections[section] = getattr(self, self.SECTIONS[section][1])()
+        
+        # Don't wait on sections that timed out; their requests time out on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+        
         return report_sections
     
+    def stream_seo_analysis(self, customer_data: Dict, seo_data: Dict) -> Iterator[Tuple[str, Dict]]:
+        """Generate the report sections, yielding (event, data) as results arrive.
+        
+        Yields ('delta', {'section', 'text'}) for streamed text of the free-text
+        sections and ('section', {'section', 'content'}) once a section is final,
+        in completion order. Every section is yielded exactly once.
+        """
+        
+        analysis_context = self._prepare_analysis_context(customer_data, seo_data)
+        
+        if self.generation_mode == 'structured':
+            for section, content in self._generate_structured_report(analysis_context).items():
+                yield 'section', {'section': section, 'content': content}
+            return
+        
+        events = queue.Queue()
+        
+        def run_section(section: str):
+            generator = getattr(self, self.SECTIONS[section][0])
+            try:
+                if section in self.STREAMED_SECTIONS:
+                    content = generator(analysis_context, on_delta=lambda text: events.put(
+                        ('delta', {'section': section, 'text': text})
+                    ))
+                else:
+                    content = generator(analysis_context)
+            except Exception as e:
+                metrics.report_error('ai_report', f"AI generation error ({section})", e)
+                content = getattr(self, self.SECTIONS[section][1])()
+            events.put(('section', {'section': section, 'content': content}))
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ai-section')
+        for section in self.SECTIONS:
+            executor.submit(with_app_context(run_section), section)
+        
+        pending = set(self.SECTIONS)
+        deadline = time.monotonic() + self.section_timeout
+        try:
+            while pending:
+                try:
+                    event, data = events.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event == 'section':
+                    if data['section'] not in pending:
+                        continue
+                    pending.discard(data['section'])
+                elif data['section'] not in pending:
+                    continue
+                yield event, data
+            
+            # Sections still running at the deadline get their fallback content
+            for section in list(pending):
+                metrics.report_error('ai_report', f"AI generation error ({section})", TimeoutError('timed out'))
+                pending.discard(section)
+                yield 'section', {'section': section, 'content': getattr(self, self.SECTIONS[section][1])()}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _complete(self, system_message: str, prompt: str, max_tokens: int, temperature: float,
+                  response_format: Dict = None, on_delta: Callable[[str], None] = None,
+                  expect_json: bool = False) -> str:
+        """Run a chat completion, served from the LLM response cache when possible.
+        
+        With on_delta the completion is streamed and each text chunk is passed
+        to it as it arrives; a cached or shared response arrives as one chunk.
+        With expect_json, responses that don't parse as JSON are not cached.
+        """
+        streamed = []
+        fetched = []
+        
+        def request():
+            # Per-customer rate limit, then a fair share of the OpenAI concurrency by plan;
+            # no database connection is held while waiting
+            release_connection()
+            openai_scheduler.throttle()
+            with openai_scheduler.slot():
+                started = time.perf_counter()
+                try:
+                    with metrics.openai_request_seconds.time(model=self.MODEL):
+                        return send()
+                finally:
+                    metrics.customer_seconds.inc(time.perf_counter() - started, component='openai',
+                                                 customer=metrics.customer_label())
+        
+        def send():
+            if on_delta is None:
+                return self._request_completion(system_message, prompt, max_tokens, temperature, response_format)
+            streamed.append(True)
+            return self._request_completion_stream(system_message, prompt, max_tokens, temperature,
+                                                   response_format, on_delta)
+        
+        def deliver(text: str) -> str:
+            if on_delta is not None and not streamed:
+                on_delta(text)
+            return text
+        
+        if not self.cache_enabled:
+            self._count_completion('disabled')
+            return deliver(request()[0])
+        
+        cache_key = llm_cache.make_cache_key(self.MODEL, system_message, prompt, {
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'response_format': response_format
+        })
+        if self.force_refresh:
+            llm_cache.cache_stats_increment(bypassed=1)
+        else:
+            cached = llm_cache.get_cached_completion(cache_key)
+            if cached is not None:
+                self._count_completion('hit')
+                return deliver(cached)
+        
+        def fetch():
+            fetched.append(True)
+            text, usage, finish_reason = request()
+            # Truncated or unparseable answers are returned but not reused
+            if finish_reason != 'length' and (not expect_json or self._parses_as_json(text)):
+                llm_cache.store_completion(
+                    cache_key, self.MODEL, text,
+                    usage.prompt_tokens if usage else 0,
+                    usage.completion_tokens if usage else 0
+                )
+            return text
+        
+        text = llm_cache.inflight_completions.do(cache_key, fetch)
+        self._count_completion('bypassed' if self.force_refresh else 'miss' if fetched else 'joined')
+        return deliver(text)
+    
+    def _parses_as_json(self, text: str) -> bool:
+        try:
+            json.loads(text)
+            return True
+        except ValueError:
+            return False
+    
+    def _count_completion(self, cache: str):
+        metrics.openai_completions.inc(cache=cache, customer=metrics.customer_label())
+    
+    def _chat_request(self, system_message: str, prompt: str, max_tokens: int, temperature: float,
+                      response_format: Dict = None, **options) -> Dict:
+        """Keyword arguments for a chat completions call"""
+        if response_format:
+            options['response_format'] = response_format
+        return dict(
+            model=self.MODEL,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=self.section_timeout,
+            **options
+        )
+    
+    def _record_usage(self, usage):
+        with self._usage_lock:
+            self.usage['requests'] += 1
+            if usage:
+                self.usage['prompt_tokens'] += usage.prompt_tokens
+                self.usage['completion_tokens'] += usage.completion_tokens
+        
+        # Billed tokens per customer, for /metrics
+        if usage:
+            customer = metrics.customer_label()
+            metrics.openai_tokens.inc(usage.prompt_tokens, model=self.MODEL, kind='prompt', customer=customer)
+            metrics.openai_tokens.inc(usage.completion_tokens, model=self.MODEL, kind='completion', customer=customer)
+    
+    def _request_completion(self, system_message: str, prompt: str, max_tokens: int, temperature: float,
+                            response_format: Dict = None):
+        """Call the chat completions API, returning (text, usage, finish_reason)"""
+        response = self.client.chat.completions.create(
+            **self._chat_request(system_message, prompt, max_tokens, temperature, response_format)
+        )
+        self._record_usage(response.usage)
+        
+        choice = response.choices[0]
+        return choice.message.content.strip(), response.usage, choice.finish_reason
+    
+    def _request_completion_stream(self, system_message: str, prompt: str, max_tokens: int, temperature: float,
+                                   response_format: Dict, on_delta: Callable[[str], None]):
+        """Stream a chat completion into on_delta, returning (text, usage, finish_reason)"""
+        stream = self.client.chat.completions.create(
+            **self._chat_request(system_message, prompt, max_tokens, temperature, response_format,
+                                 stream=True, stream_options={"include_usage": True})
+        )
+        
+        chunks = []
+        usage = None
+        finish_reason = None
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta and choice.delta.content:
+                chunks.append(choice.delta.content)
+                on_delta(choice.delta.content)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        self._record_usage(usage)
+        
+        return ''.join(chunks).strip(), usage, finish_reason
+    
+    @metrics.timed(metrics.ai_section_seconds, section='structured')
+    def _generate_structured_report(self, context: str) -> Dict:
+        """Generate every report section with one JSON-mode completion"""
+        
+        prompt = f"""
+        Based on the SEO data below, write a monthly SEO report for a business client.
+        Respond with a single JSON object with exactly these keys:
+        - "executive_summary": string, 2-3 paragraphs highlighting key performance indicators,
+          main opportunities and overall SEO health, in a confident, professional tone
+        - "ranking_analysis": string covering which keywords perform well, which need improvement,
+          ranking trends and opportunities, and specific recommendations
+        - "competitor_analysis": string covering the main competitors, what they do well,
+          opportunities to outrank them and specific strategies
+        - "content_suggestions": array of 5 objects with keys title, keyword, type, description
+        - "technical_recommendations": array of 5-7 actionable technical SEO recommendation strings
+        - "action_plan": array of 5 prioritized tasks, objects with keys task, priority (High/Medium/Low),
+          effort (1-5) and impact (1-5)
+        
+        {context}
+        """
+        
+        try:
+            report_text = self._complete(
+                "You are an expert SEO analyst writing professional reports for business clients. Always respond with valid JSON.",
+                prompt,
+                max_tokens=3600,
+                temperature=0.7,
+                response_format={"type": "json_object"},
+                expect_json=True
+            )
+            report = json.loads(report_text)
+            if not isinstance(report, dict):
+                raise ValueError("Structured report is not a JSON object")
+        except Exception as e:
+            metrics.report_error('ai_report', "AI generation error (structured)", e)
+            report = {}
+        
+        # Keep valid sections, fall back per section for anything missing or malformed
+        report_sections = {}
+        for section, (_, fallback) in self.SECTIONS.items():
+            value = report.get(section)
+            if self._is_valid_section(section, value):
+                report_sections[section] = value.strip() if isinstance(value, str) else value
+            else:
+                if report:
+                    metrics.report_error('ai_report', "AI generation error (structured)",
+                                         ValueError(f"invalid '{section}' section"))
+                report_sections[section] = getattr(self, fallback)()
+        
+        return report_sections
+    
+    def _is_valid_section(self, section: str, value) -> bool:
+        """Check a structured-response section against SECTION_SCHEMA"""
+        expected_type, item_keys = self.SECTION_SCHEMA[section]
+        if not isinstance(value, expected_type) or not value:
+            return False
+        if expected_type is list:
+            if item_keys:
+                return all(isinstance(item, dict) and all(key in item for key in item_keys) for item in value)
+            return all(isinstance(item, str) for item in value)
+        return True
+    
     def _prepare_analysis_context(self, customer_data: Dict, seo_data: Dict) -> str:
         """Prepare context for AI analysis"""
         
@@ -93,7 +429,8 @@ class AIReportService:
         else:
             return 'General Business'
     
-    def _generate_executive_summary(self, context: str) -> str:
+    @metrics.timed(metrics.ai_section_seconds, section='executive_summary')
+    def _generate_executive_summary(self, context: str, on_delta: Callable[[str], None] = None) -> str:
         """Generate executive summary using AI"""
         
         prompt = f"""
@@ -107,22 +444,19 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert SEO analyst writing professional reports for business clients."},
-                    {"role": "user", "content": prompt}
-                ],
+            return self._complete(
+                "You are an expert SEO analyst writing professional reports for business clients.",
+                prompt,
                 max_tokens=500,
-                temperature=0.7
+                temperature=0.7,
+                on_delta=on_delta
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"AI generation error: {e}")
+            metrics.report_error('ai_report', "AI generation error", e)
             return self._get_fallback_executive_summary()
     
-    def _generate_ranking_analysis(self, context: str) -> str:
+    @metrics.timed(metrics.ai_section_seconds, section='ranking_analysis')
+    def _generate_ranking_analysis(self, context: str, on_delta: Callable[[str], None] = None) -> str:
         """Generate ranking analysis using AI"""
         
         prompt = f"""
@@ -138,22 +472,19 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an SEO expert analyzing keyword rankings for a client report."},
-                    {"role": "user", "content": prompt}
-                ],
+            return self._complete(
+                "You are an SEO expert analyzing keyword rankings for a client report.",
+                prompt,
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                on_delta=on_delta
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"AI generation error: {e}")
-            return "Ranking analysis data is being processed. Please check back in your next report."
+            metrics.report_error('ai_report', "AI generation error", e)
+            return self._get_fallback_ranking_analysis()
     
-    def _generate_competitor_analysis(self, context: str) -> str:
+    @metrics.timed(metrics.ai_section_seconds, section='competitor_analysis')
+    def _generate_competitor_analysis(self, context: str, on_delta: Callable[[str], None] = None) -> str:
         """Generate competitor analysis using AI"""
         
         prompt = f"""
@@ -169,21 +500,18 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an SEO strategist analyzing competitors for a client."},
-                    {"role": "user", "content": prompt}
-                ],
+            return self._complete(
+                "You are an SEO strategist analyzing competitors for a client.",
+                prompt,
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                on_delta=on_delta
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"AI generation error: {e}")
-            return "Competitor analysis is being processed. Detailed insights will be available in your next report."
+            metrics.report_error('ai_report', "AI generation error", e)
+            return self._get_fallback_competitor_analysis()
     
+    @metrics.timed(metrics.ai_section_seconds, section='content_suggestions')
     def _generate_content_suggestions(self, context: str) -> List[Dict]:
         """Generate content suggestions using AI"""
         
@@ -203,17 +531,14 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a content strategist creating SEO-focused content ideas. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
+            content_text = self._complete(
+                "You are a content strategist creating SEO-focused content ideas. Always respond with valid JSON.",
+                prompt,
                 max_tokens=800,
-                temperature=0.8
+                temperature=0.8,
+                expect_json=True
             )
             
-            content_text = response.choices[0].message.content.strip()
             # Try to parse JSON, fallback to default if parsing fails
             try:
                 return json.loads(content_text)
@@ -221,9 +546,10 @@ class AIReportService:
                 return self._get_fallback_content_suggestions()
                 
         except Exception as e:
-            print(f"AI generation error: {e}")
+            metrics.report_error('ai_report', "AI generation error", e)
             return self._get_fallback_content_suggestions()
     
+    @metrics.timed(metrics.ai_section_seconds, section='technical_recommendations')
     def _generate_technical_recommendations(self, context: str) -> List[str]:
         """Generate technical SEO recommendations using AI"""
         
@@ -237,23 +563,19 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a technical SEO expert providing actionable recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
+            recommendations = self._complete(
+                "You are a technical SEO expert providing actionable recommendations.",
+                prompt,
                 max_tokens=500,
                 temperature=0.7
-            )
-            
-            recommendations = response.choices[0].message.content.strip().split('\n')
+            ).split('\n')
             return [rec.strip('- ').strip() for rec in recommendations if rec.strip()]
             
         except Exception as e:
-            print(f"AI generation error: {e}")
+            metrics.report_error('ai_report', "AI generation error", e)
             return self._get_fallback_technical_recommendations()
     
+    @metrics.timed(metrics.ai_section_seconds, section='action_plan')
     def _generate_action_plan(self, context: str) -> List[Dict]:
         """Generate prioritized action plan using AI"""
         
@@ -273,29 +595,27 @@ class AIReportService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an SEO consultant creating actionable plans. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
+            action_text = self._complete(
+                "You are an SEO consultant creating actionable plans. Always respond with valid JSON.",
+                prompt,
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                expect_json=True
             )
             
-            action_text = response.choices[0].message.content.strip()
             try:
                 return json.loads(action_text)
             except json.JSONDecodeError:
                 return self._get_fallback_action_plan()
                 
         except Exception as e:
-            print(f"AI generation error: {e}")
+            metrics.report_error('ai_report', "AI generation error", e)
             return self._get_fallback_action_plan()
     
     def generate_pdf_report(self, customer_data: Dict, report_data: Dict, output_path: str) -> str:
         """Generate PDF report from analysis data"""
         
+        started = time.perf_counter()
         try:
             doc = SimpleDocTemplate(output_path, pagesize=letter)
             styles = getSampleStyleSheet()
@@ -357,18 +677,35 @@ class AIReportService:
                 story.append(Spacer(1, 10))
             
             doc.build(story)
+            self._record_pdf('ok', started)
             return output_path
             
         except Exception as e:
-            print(f"PDF generation error: {e}")
+            metrics.report_error('pdf', "PDF generation error", e)
+            self._record_pdf('error', started)
             return None
     
+    def _record_pdf(self, outcome: str, started: float):
+        elapsed = time.perf_counter() - started
+        customer = metrics.customer_label()
+        metrics.pdf_reports.inc(outcome=outcome, customer=customer)
+        metrics.pdf_render_seconds.observe(elapsed, outcome=outcome)
+        metrics.customer_seconds.inc(elapsed, component='pdf', customer=customer)
+    
     def _get_fallback_executive_summary(self) -> str:
         """Fallback executive summary when AI is unavailable"""
         return """Your SEO performance is being analyzed using advanced algorithms and competitor intelligence. 
         This month's data shows opportunities for improvement in keyword rankings and content optimization. 
         Our AI-powered analysis has identified specific strategies to enhance your search visibility and outrank competitors."""
     
+    def _get_fallback_ranking_analysis(self) -> str:
+        """Fallback ranking analysis when AI is unavailable"""
+        return "Ranking analysis data is being processed. Please check back in your next report."
+    
+    def _get_fallback_competitor_analysis(self) -> str:
+        """Fallback competitor analysis when AI is unavailable"""
+        return "Competitor analysis is being processed. Detailed insights will be available in your next report."
+    
     def _get_fallback_content_suggestions(self) -> List[Dict]:
         """Fallback content suggestions when AI is unavailable"""
         return [
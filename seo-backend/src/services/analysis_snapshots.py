@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+from src.models.database import db
+from src.models.seo_models import AnalysisSnapshot, Customer
+from src.services.dataforseo_service import ANALYSIS_PARTS, DataForSEOService
+
+# A stored part is reused for this long (ANALYSIS_SNAPSHOT_MAX_AGE_HOURS),
+# overridable per part, e.g. ANALYSIS_SNAPSHOT_TECHNICAL_AUDIT_HOURS
+ANALYSIS_SNAPSHOT_MAX_AGE_HOURS = float(os.environ.get('ANALYSIS_SNAPSHOT_MAX_AGE_HOURS', 24))
+
+# Result keys filled in by each part
+PART_RESULT_KEYS = {
+    'rankings': ('keyword_rankings', 'competitors'),
+    'keyword_data': ('keyword_data',),
+    'technical_audit': ('technical_audit',)
+}
+
+def part_max_age_hours(part: str, max_age_hours: float = None) -> float:
+    """Freshness threshold for one analysis part"""
+    if max_age_hours is not None:
+        return max_age_hours
+    override = os.environ.get(f'ANALYSIS_SNAPSHOT_{part.upper()}_HOURS')
+    return float(override) if override else ANALYSIS_SNAPSHOT_MAX_AGE_HOURS
+
+def stale_parts(snapshot: AnalysisSnapshot, website_url: str, keywords: List[str],
+                max_age_hours: float = None) -> List[str]:
+    """Parts of a snapshot that are too old or were fetched for other inputs"""
+    if snapshot is None:
+        return list(ANALYSIS_PARTS)
+
+    now = datetime.utcnow()
+    same_keywords = json.loads(snapshot.keywords) == list(keywords)
+    same_website = snapshot.website_url == website_url
+    stale = []
+    for part in ANALYSIS_PARTS:
+        fetched_at = getattr(snapshot, f'{part}_at')
+        if fetched_at is None or fetched_at <= now - timedelta(hours=part_max_age_hours(part, max_age_hours)):
+            stale.append(part)
+        elif part == 'technical_audit' and not same_website:
+            stale.append(part)
+        elif part != 'technical_audit' and not (same_keywords and same_website):
+            stale.append(part)
+    return stale
+
+def save_snapshot(customer_id: int, website_url: str, keywords: List[str], results: Dict, parts: List[str]):
+    """Store the given (successfully fetched) parts of an analysis as the customer's latest snapshot (caller commits)"""
+    now = datetime.utcnow()
+    snapshot = db.session.get(AnalysisSnapshot, customer_id)
+    if snapshot is None:
+        snapshot = AnalysisSnapshot(customer_id=customer_id, results='{}')
+        db.session.add(snapshot)
+
+    stored = json.loads(snapshot.results)
+    for part in parts:
+        for key in PART_RESULT_KEYS[part]:
+            stored[key] = results.get(key)
+        setattr(snapshot, f'{part}_at', now)
+
+    # Parts left out were fetched for the previous inputs; if those changed they are no longer fresh
+    same_keywords = bool(snapshot.keywords) and json.loads(snapshot.keywords) == list(keywords)
+    same_website = snapshot.website_url == website_url
+    for part in ANALYSIS_PARTS:
+        if part not in parts and (not same_website or (part != 'technical_audit' and not same_keywords)):
+            setattr(snapshot, f'{part}_at', None)
+
+    snapshot.website_url = website_url
+    snapshot.keywords = json.dumps(list(keywords))
+    snapshot.results = json.dumps(stored)
+    snapshot.updated_at = now
+    return snapshot
+
+def get_customer_analysis(customer: Customer, max_age_hours: float = None,
+                          seo_service: DataForSEOService = None) -> Dict:
+    """Latest analysis for a customer, re-fetching only the stale parts of its snapshot"""
+    keywords = json.loads(customer.target_keywords)
+    snapshot = db.session.get(AnalysisSnapshot, customer.id)
+    parts = stale_parts(snapshot, customer.website_url, keywords, max_age_hours)
+
+    results = json.loads(snapshot.results) if snapshot else {}
+    if parts:
+        seo_service = seo_service or DataForSEOService()
+        fresh = seo_service.analyze_customer_seo({
+            'website_url': customer.website_url,
+            'target_keywords': keywords
+        }, parts=parts)
+        # Failed parts aren't stored, so the next call retries them; until then
+        # their previous results (if any) are served instead of the failed fetch
+        failed = set(fresh.get('failed_parts', []))
+        refreshed = [part for part in parts if part not in failed]
+        for part in parts:
+            for key in PART_RESULT_KEYS[part]:
+                if part not in failed or not results.get(key):
+                    results[key] = fresh.get(key)
+
+        if refreshed:
+            save_snapshot(customer.id, customer.website_url, keywords, fresh, refreshed)
+            db.session.commit()
+
+    return {
+        'keyword_rankings': results.get('keyword_rankings') or {},
+        'keyword_data': results.get('keyword_data') or {},
+        'competitors': results.get('competitors') or [],
+        'technical_audit': results.get('technical_audit') or {}
+    }
@@ -0,0 +1,367 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from src.services import metrics
+from src.services.concurrency import current_tenant, get_host_semaphore, with_app_context
+from src.services.dataforseo_service import (
+    ANALYSIS_PARTS, COMPETITORS_ENDPOINT, CONNECT_TIMEOUT, KEYWORD_DATA_ENDPOINT, READ_TIMEOUT,
+    RETRY_STATUSES, SERP_ENDPOINT, TECHNICAL_AUDIT_ENDPOINT, CircuitOpenError, DataForSEOService,
+    backoff_delay, endpoint_family, get_circuit_breaker, hot_cache, inflight_requests, retry_after_seconds,
+    split_batch_response, upstream_stats
+)
+from src.services.upstream_scheduler import dataforseo_scheduler
+
+# HTTP/2 needs the optional h2 package; without it the client speaks HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Upstream calls in flight at once per event loop and account, and pooled
+# connections per httpx client (calls are spread over several clients)
+ASYNC_MAX_CONCURRENCY = int(os.environ.get('DATAFORSEO_ASYNC_MAX_CONCURRENCY', 200))
+ASYNC_CONNECTIONS_PER_CLIENT = int(os.environ.get('DATAFORSEO_ASYNC_CONNECTIONS_PER_CLIENT', 16))
+
+class AsyncClientPool:
+    """httpx clients shared by every async service of one account on one event loop.
+
+    httpcore scans all of a client's connections for every queued request,
+    which turns CPU-bound with hundreds of connections in one client. Calls
+    are spread over enough small clients to reach max_concurrency instead,
+    and never queue inside httpx.
+    """
+
+    def __init__(self, username: str, password: str, max_concurrency: int, connections_per_client: int):
+        count = max(1, -(-max_concurrency // connections_per_client))
+        self.clients = [
+            httpx.AsyncClient(
+                auth=(username, password),
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=connections_per_client,
+                                    max_keepalive_connections=connections_per_client),
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+            for _ in range(count)
+        ]
+        self._in_use = [0] * count
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def client(self):
+        """Hold one of the max_concurrency slots on the least busy client"""
+        async with self._semaphore:
+            index = self._in_use.index(min(self._in_use))
+            self._in_use[index] += 1
+            try:
+                yield self.clients[index]
+            finally:
+                self._in_use[index] -= 1
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
+
+# httpx clients are bound to the event loop they were created on:
+# event loop -> {(username, password): AsyncClientPool}
+_client_pools = weakref.WeakKeyDictionary()
+_client_pools_lock = threading.Lock()
+
+def get_async_client_pool(username: str, password: str) -> AsyncClientPool:
+    """Client pool shared by every async service on the running event loop, per account"""
+    loop = asyncio.get_running_loop()
+    key = (username, password)
+    with _client_pools_lock:
+        pools = _client_pools.setdefault(loop, {})
+        if key not in pools:
+            pools[key] = AsyncClientPool(username, password, ASYNC_MAX_CONCURRENCY, ASYNC_CONNECTIONS_PER_CLIENT)
+        return pools[key]
+
+async def close_async_clients():
+    """Close the running event loop's clients (call before the loop is closed)"""
+    with _client_pools_lock:
+        pools = _client_pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.aclose()
+
+class AsyncDataForSEOService(DataForSEOService):
+    """asyncio variant of DataForSEOService on a shared httpx.AsyncClient.
+
+    The public methods are coroutines with the same arguments and results.
+    Both classes share the caching layer: the hot cache, the DataForSEOCache
+    table (read and written in worker threads so the event loop never waits
+    on the database) and in-flight deduplication, so a sync and an async
+    caller asking for the same data make one upstream call.
+
+    Upstream calls share the retry policy, circuit breakers, customer rate
+    limits and concurrency caps of the sync client: each POST holds a
+    dataforseo_scheduler slot (aslot) and the host's limiter, awaited on the
+    event loop, so sync and async traffic together stay within
+    DATAFORSEO_MAX_CONCURRENCY and its plan weighting. Within that,
+    DATAFORSEO_ASYNC_MAX_CONCURRENCY bounds calls per event loop.
+    """
+
+    async def _aget_cache_entry(self, cache_key: str) -> Optional[Tuple[Dict, bool]]:
+        """Async _get_cache_entry; only hot cache misses go to a worker thread"""
+        return (await self._aget_cache_entries([cache_key]))[0]
+
+    def _load_cache_entries(self, cache_keys: List[str]) -> List[Optional[Tuple[Dict, bool]]]:
+        return [self._load_cache_entry(cache_key) for cache_key in cache_keys]
+
+    async def _aget_cache_entries(self, cache_keys: List[str]) -> List[Optional[Tuple[Dict, bool]]]:
+        """_aget_cache_entry for many keys, with one worker thread call for all hot cache misses"""
+        entries = [hot_cache.lookup(cache_key) for cache_key in cache_keys]
+        misses = [i for i, entry in enumerate(entries) if entry is None]
+        if misses:
+            loaded = await asyncio.to_thread(with_app_context(self._load_cache_entries),
+                                             [cache_keys[i] for i in misses])
+            for i, entry in zip(misses, loaded):
+                entries[i] = entry
+        return entries
+
+    def _cache_many(self, entries: List[Tuple[str, Dict, float]]):
+        """Cache (cache_key, data, hours) entries with a single commit"""
+        for cache_key, data, hours in entries:
+            self._cache_data(cache_key, data, hours)
+        self._commit_cache()
+
+    async def _acache_many(self, entries: List[Tuple[str, Dict, float]]):
+        if entries:
+            await asyncio.to_thread(with_app_context(self._cache_many), entries)
+
+    async def _acharge(self, endpoint: str, tasks: int):
+        """Async _charge: the customer's rate limit is waited for without blocking the event loop"""
+        metrics.dataforseo_tasks.inc(tasks, endpoint=endpoint_family(endpoint), customer=metrics.customer_label())
+        if current_tenant.get() is not None:
+            await asyncio.to_thread(dataforseo_scheduler.throttle, tasks)
+
+    async def _amake_request(self, endpoint: str, data: List[Dict], cache_hours: float = None,
+                             allow_stale: bool = True) -> Dict:
+        """Async _make_request: cached, stale-while-revalidate, one upstream call per cache key"""
+        started = time.perf_counter()
+        cache_key = self._generate_cache_key(endpoint, data[0] if data else {})
+        cache_hours = cache_hours or self._cache_ttl_hours(endpoint)
+
+        cache_entry = await self._aget_cache_entry(cache_key)
+        if cache_entry and (allow_stale or not cache_entry[1]):
+            cached_data, stale = cache_entry
+            if stale:
+                self._refresh_in_background(endpoint, data, cache_key, cache_hours)
+            self._record_lookup(endpoint, 'stale' if stale else 'hit', started)
+            return cached_data
+
+        flight, leader = inflight_requests.begin(cache_key)
+        if not leader:
+            result = await asyncio.wrap_future(flight)
+            self._record_lookup(endpoint, 'joined', started)
+            return result
+        try:
+            result = await self._afetch_and_cache(endpoint, data, cache_key, cache_hours)
+        except BaseException as e:
+            inflight_requests.finish(cache_key, flight, exception=e)
+            raise
+        inflight_requests.finish(cache_key, flight, result)
+        self._record_lookup(endpoint, 'miss', started)
+        return result
+
+    async def _afetch_and_cache(self, endpoint: str, data: List[Dict], cache_key: str, cache_hours: float) -> Dict:
+        """Async _fetch_and_cache"""
+        # A previous leader may have filled the cache since our miss
+        cache_entry = await self._aget_cache_entry(cache_key)
+        if cache_entry and not cache_entry[1]:
+            return cache_entry[0]
+
+        try:
+            await self._acharge(endpoint, len(data))
+            result = await self._apost(endpoint, data)
+        except (httpx.HTTPError, CircuitOpenError, ValueError) as e:
+            return self._get_fallback_data(endpoint, e)
+
+        await self._acache_many([(cache_key, result, cache_hours)])
+        return result
+
+    async def _apost(self, endpoint: str, data: List[Dict]) -> Dict:
+        """Async _post: same retries, backoff and circuit breaker, on the shared httpx client"""
+        with metrics.dataforseo_request_seconds.time(endpoint=endpoint_family(endpoint)):
+            return await self._apost_with_retries(endpoint, data)
+
+    async def _apost_with_retries(self, endpoint: str, data: List[Dict]) -> Dict:
+        url = f"{self.base_url}/{endpoint}"
+        host = urlparse(url).netloc
+        breaker = get_circuit_breaker(host)
+        pool = get_async_client_pool(self.username, self.password)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                upstream_stats['circuit_rejections'] += 1
+                raise CircuitOpenError(f"Circuit breaker open for {host}")
+
+            retry_after = None
+            try:
+                # Same fair share by plan and per-host limit as the sync client's threads
+                async with dataforseo_scheduler.aslot(), get_host_semaphore(host, self.max_per_host), \
+                        pool.client() as client:
+                    upstream_stats['requests'] += 1
+                    upstream_stats['tasks'] += len(data)
+                    response = await client.post(url, json=data)
+            except httpx.TransportError as e:
+                upstream_stats['timeouts' if isinstance(e, httpx.TimeoutException) else 'connection_errors'] += 1
+                breaker.record_failure()
+                error = e
+            except Exception:
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    # Any other answer, even a 4xx, means the API is up
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response.json()
+
+                if response.status_code == 429:
+                    upstream_stats['rate_limited'] += 1
+                    breaker.record_success()
+                else:
+                    upstream_stats['server_errors'] += 1
+                    breaker.record_failure()
+                retry_after = retry_after_seconds(response)
+                error = httpx.HTTPStatusError(f"{response.status_code} from {url}",
+                                              request=response.request, response=response)
+
+            if attempt >= self.max_retries:
+                raise error
+            upstream_stats['retries'] += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    async def get_serp_results(self, keyword: str, location: str = "Sweden", language: str = "en",
+                               allow_stale: bool = True) -> Dict:
+        """Get SERP results for a keyword"""
+        data = [self._serp_task(keyword, location, language)]
+
+        return await self._amake_request(SERP_ENDPOINT, data, allow_stale=allow_stale)
+
+    async def get_serp_results_many(self, keywords: List[str], location: str = "Sweden", language: str = "en",
+                                    allow_stale: bool = True) -> Dict[str, Dict]:
+        """Get SERP results for several keywords, keyed in keyword order.
+
+        Cache misses are sent serp_batch_size tasks per POST, all POSTs concurrently.
+        """
+        started = time.perf_counter()
+        tasks = {keyword: self._serp_task(keyword, location, language) for keyword in keywords}
+        cache_keys = {keyword: self._generate_cache_key(SERP_ENDPOINT, task) for keyword, task in tasks.items()}
+        cache_hours = self._cache_ttl_hours(SERP_ENDPOINT)
+        entries = await self._aget_cache_entries([cache_keys[keyword] for keyword in tasks])
+
+        # Misses already in flight elsewhere (sync or async) are joined instead of re-sent
+        results = {}
+        pending = []
+        joined = {}
+        for keyword, cache_entry in zip(tasks, entries):
+            cache_key = cache_keys[keyword]
+            if cache_entry and (allow_stale or not cache_entry[1]):
+                results[keyword], stale = cache_entry
+                if stale:
+                    self._refresh_in_background(SERP_ENDPOINT, [tasks[keyword]], cache_key, cache_hours)
+                self._record_lookup(SERP_ENDPOINT, 'stale' if stale else 'hit', started)
+                continue
+
+            flight, leader = inflight_requests.begin(cache_key)
+            if leader:
+                pending.append((keyword, cache_key, flight))
+            else:
+                joined[keyword] = flight
+
+        async def send(batch):
+            try:
+                await self._acharge(SERP_ENDPOINT, len(batch))
+                response = await self._apost(SERP_ENDPOINT, [tasks[keyword] for keyword, _, _ in batch])
+                batch_results = split_batch_response(response, len(batch))
+            except Exception as e:
+                batch_results = [e] * len(batch)
+            except BaseException as e:
+                for _, cache_key, flight in batch:
+                    inflight_requests.finish(cache_key, flight, exception=e)
+                raise
+
+            for (keyword, cache_key, flight), result in zip(batch, batch_results):
+                if isinstance(result, Exception):
+                    # Waiters must always be released, whatever the failure
+                    result = self._get_fallback_data(SERP_ENDPOINT, result)
+                else:
+                    fetched.append((cache_key, result, cache_hours))
+                results[keyword] = result
+                inflight_requests.finish(cache_key, flight, result)
+                self._record_lookup(SERP_ENDPOINT, 'miss', started)
+
+        fetched = []
+        batch_size = max(self.serp_batch_size, 1)
+        await asyncio.gather(*(send(pending[i:i + batch_size]) for i in range(0, len(pending), batch_size)))
+        # Each task is cached under its own key, all in one transaction
+        await self._acache_many(fetched)
+
+        for keyword, flight in joined.items():
+            results[keyword] = await asyncio.wrap_future(flight)
+            self._record_lookup(SERP_ENDPOINT, 'joined', started)
+
+        return {keyword: results[keyword] for keyword in keywords}
+
+    async def get_keyword_data(self, keywords: List[str], location: str = "Sweden", allow_stale: bool = True) -> Dict:
+        """Get keyword data including search volume and difficulty"""
+        data = [self._keyword_data_task(keywords, location)]
+
+        return await self._amake_request(KEYWORD_DATA_ENDPOINT, data, allow_stale=allow_stale)
+
+    async def get_keyword_volumes(self, keywords: List[str], location: str = "Sweden",
+                                  allow_stale: bool = True) -> Dict[str, Dict]:
+        """Search volume and difficulty per keyword, as returned by the API"""
+        return self._extract_keyword_data(await self.get_keyword_data(keywords, location, allow_stale))
+
+    async def get_competitor_analysis(self, domain: str, competitor_domains: List[str]) -> Dict:
+        """Get competitor analysis data"""
+        data = [self._competitor_task(domain, competitor_domains)]
+
+        return await self._amake_request(COMPETITORS_ENDPOINT, data)
+
+    async def get_technical_audit(self, domain: str) -> Dict:
+        """Get technical SEO audit data"""
+        data = [self._technical_audit_task(domain)]
+
+        return await self._amake_request(TECHNICAL_AUDIT_ENDPOINT, data)
+
+    async def analyze_customer_seo(self, customer_data: Dict, parts: List[str] = None) -> Dict:
+        """Comprehensive SEO analysis for a customer (see DataForSEOService.analyze_customer_seo)"""
+        website_url = customer_data['website_url']
+        keywords = customer_data['target_keywords']
+        parts = set(ANALYSIS_PARTS if parts is None else parts)
+
+        results = {
+            'keyword_rankings': {},
+            'keyword_data': {},
+            'competitors': [],
+            'technical_audit': {},
+            'failed_parts': []
+        }
+
+        try:
+            # The SERP lookups, keyword data and technical audit run concurrently
+            fetches = {
+                'rankings': lambda: self.get_serp_results_many(keywords),
+                'keyword_data': lambda: self.get_keyword_data(keywords),
+                'technical_audit': lambda: self.get_technical_audit(website_url)
+            }
+            requested = [part for part in ANALYSIS_PARTS if part in parts]
+            responses = await asyncio.gather(*(fetches[part]() for part in requested), return_exceptions=True)
+            self._apply_analysis_responses(results, dict(zip(requested, responses)), website_url, keywords)
+
+        except Exception as e:
+            metrics.report_error('dataforseo', "Error in SEO analysis", e)
+            results['failed_parts'] = [part for part in ANALYSIS_PARTS if part in parts]
+
+        return results
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from src.models.database import db
+from src.models.seo_models import DataForSEOCache, DataForSEOPayload
+from src.services import cache_storage, metrics
+from src.services.dataforseo_service import STALE_WHILE_REVALIDATE_HOURS
+
+# Stats from the most recent sweep, reported by /cache/stats
+last_sweep_stats: Optional[Dict] = None
+
+def get_cache_table_stats() -> Dict:
+    """Row count of the DataForSEO cache table and size of the database file"""
+    stats = {
+        'rows': DataForSEOCache.query.count(),
+        'expired_rows': DataForSEOCache.query.filter(DataForSEOCache.expires_at <= datetime.utcnow()).count(),
+        'payload_rows': DataForSEOPayload.query.count(),
+        'payload_bytes': db.session.query(db.func.coalesce(db.func.sum(db.func.length(DataForSEOPayload.data)), 0)).scalar(),
+        'payload_raw_bytes': db.session.query(db.func.coalesce(db.func.sum(DataForSEOPayload.raw_size), 0)).scalar()
+    }
+
+    if db.session.get_bind().dialect.name == 'sqlite':
+        page_size = db.session.execute(db.text('PRAGMA page_size')).scalar()
+        page_count = db.session.execute(db.text('PRAGMA page_count')).scalar()
+        freelist_count = db.session.execute(db.text('PRAGMA freelist_count')).scalar()
+        stats['database_bytes'] = page_size * page_count
+        stats['free_bytes'] = page_size * freelist_count
+
+    return stats
+
+def sweep_expired_cache(batch_size: int = 500, vacuum: bool = False) -> Dict:
+    """Delete expired cache rows in bounded batches, optionally VACUUMing afterwards.
+
+    Rows still inside the stale-while-revalidate window are kept.
+    """
+    global last_sweep_stats
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=STALE_WHILE_REVALIDATE_HOURS)
+    deleted = 0
+
+    # Small batches keep each write transaction (and the SQLite lock) short
+    while True:
+        expired_ids = [
+            row.id for row in db.session.query(DataForSEOCache.id)
+            .filter(DataForSEOCache.expires_at <= cutoff)
+            .limit(batch_size)
+        ]
+        if not expired_ids:
+            break
+
+        DataForSEOCache.query.filter(DataForSEOCache.id.in_(expired_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(expired_ids)
+
+    # Drop compressed payloads no cache row points at any more
+    deleted_payloads = 0
+    while True:
+        orphan_hashes = [
+            row.content_hash for row in db.session.query(DataForSEOPayload.content_hash)
+            .filter(~db.exists().where(DataForSEOCache.payload_hash == DataForSEOPayload.content_hash))
+            .limit(batch_size)
+        ]
+        if not orphan_hashes:
+            break
+
+        # Re-check inside the DELETE: a cache row may have started using a payload since the SELECT
+        deleted_payloads += DataForSEOPayload.query.filter(
+            DataForSEOPayload.content_hash.in_(orphan_hashes),
+            ~db.exists().where(DataForSEOCache.payload_hash == DataForSEOPayload.content_hash)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    if vacuum and db.session.get_bind().dialect.name == 'sqlite':
+        db.session.close()
+        with db.session.get_bind().connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('VACUUM')
+
+    stats = get_cache_table_stats()
+    stats.update({
+        'deleted_rows': deleted,
+        'deleted_payloads': deleted_payloads,
+        'vacuumed': vacuum,
+        'duration_seconds': round(time.perf_counter() - started, 3),
+        'swept_at': now.isoformat()
+    })
+    last_sweep_stats = stats
+    return stats
+
+def ensure_cache_schema():
+    """Bring cache tables created by older versions up to the current schema"""
+    table = DataForSEOCache.__tablename__
+    columns = {column['name'] for column in db.inspect(db.session.get_bind()).get_columns(table)}
+    if 'payload_hash' not in columns:
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN payload_hash VARCHAR(64)'))
+    db.session.execute(db.text(f'CREATE INDEX IF NOT EXISTS ix_{table}_payload_hash ON {table} (payload_hash)'))
+    db.session.execute(db.text(f'CREATE INDEX IF NOT EXISTS ix_{table}_expires_at ON {table} (expires_at)'))
+    db.session.commit()
+    DataForSEOPayload.__table__.create(db.session.get_bind(), checkfirst=True)
+
+def migrate_cache_storage(batch_size: int = 200) -> Dict:
+    """Move existing plain-JSON cache rows into compressed, deduplicated payloads"""
+    started = time.perf_counter()
+    ensure_cache_schema()
+
+    migrated = 0
+    json_bytes = 0
+    while True:
+        rows = DataForSEOCache.query.filter(
+            DataForSEOCache.payload_hash.is_(None),
+            DataForSEOCache.cache_data != ''
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        for row in rows:
+            json_bytes += len(row.cache_data)
+            text = cache_storage.serialize(json.loads(row.cache_data), 'zlib')
+            row.payload_hash = cache_storage.store_payload(text)
+            row.cache_data = ''
+        db.session.commit()
+        migrated += len(rows)
+
+    stats = get_cache_table_stats()
+    stats.update({
+        'migrated_rows': migrated,
+        'migrated_json_bytes': json_bytes,
+        'duration_seconds': round(time.perf_counter() - started, 3)
+    })
+    return stats
+
+class CacheSweeper:
+    """Background thread that periodically sweeps expired DataForSEO cache rows"""
+
+    def __init__(self, app, interval_minutes: float = 60, batch_size: int = 500, vacuum: bool = False):
+        self.app = app
+        self.interval_seconds = interval_minutes * 60
+        self.batch_size = batch_size
+        self.vacuum = vacuum
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sweeping in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name='cache-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the sweeper thread to exit"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                with self.app.app_context():
+                    stats = sweep_expired_cache(self.batch_size, self.vacuum)
+                print(f"Cache sweep: deleted {stats['deleted_rows']} rows in {stats['duration_seconds']}s, "
+                      f"{stats['rows']} rows remain ({stats.get('database_bytes', 'n/a')} bytes)")
+            except Exception as e:
+                metrics.report_error('cache_maintenance', "Cache sweep error", e)
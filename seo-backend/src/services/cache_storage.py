@@ -0,0 +1,56 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from src.models.database import db
+from src.models.seo_models import DataForSEOPayload, upsert
+
+# Storage formats for cached API payloads:
+#   json - raw JSON text in DataForSEOCache.cache_data (original format)
+#   zlib - compressed, content-addressed rows in DataForSEOPayload
+STORAGE_FORMATS = ('json', 'zlib')
+
+def serialize(data: Dict, storage: str) -> str:
+    """Serialize a payload to JSON text for the given storage format"""
+    if storage == 'zlib':
+        # Compact separators; the text is never read by humans once compressed
+        return json.dumps(data, separators=(',', ':'))
+    return json.dumps(data)
+
+def store_payload(text: str) -> str:
+    """Store compressed JSON text once per content hash, returning the hash"""
+    raw = text.encode()
+    content_hash = hashlib.sha256(raw).hexdigest()
+    # Duplicates only need the hash, but touch the row rather than just reading it: the write
+    # holds it in this transaction, so a concurrent orphan sweep can't drop it before the
+    # caller's cache row (committed together) points at it
+    touched = DataForSEOPayload.query.filter_by(content_hash=content_hash).update(
+        {'created_at': DataForSEOPayload.created_at}, synchronize_session=False
+    )
+    if touched:
+        return content_hash
+
+    # Still an insert-if-absent, in case another writer stored the same payload meanwhile
+    upsert(DataForSEOPayload, {
+        'content_hash': content_hash,
+        'encoding': 'zlib',
+        'data': zlib.compress(raw, 6),
+        'raw_size': len(text),
+        'created_at': datetime.utcnow()
+    }, index_elements=['content_hash'], update=False)
+    return content_hash
+
+def decode_payload(encoding: str, data: bytes) -> str:
+    """Decompress a stored payload back to JSON text"""
+    if encoding == 'zlib':
+        return zlib.decompress(data).decode()
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+def load_cache_text(cache_entry, payload: Optional[DataForSEOPayload]) -> Tuple[str, int]:
+    """Get the JSON text and its size for a cache row, whichever format it uses"""
+    if cache_entry.payload_hash:
+        if payload is None:
+            raise ValueError(f"Missing payload {cache_entry.payload_hash}")
+        return decode_payload(payload.encoding, payload.data), payload.raw_size
+    return cache_entry.cache_data, len(cache_entry.cache_data)
@@ -0,0 +1,314 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+
+class Tenant(NamedTuple):
+    """The customer (and plan) that upstream work is being done for"""
+    customer_id: int
+    plan: str
+
+
+# Tenant of the current request or job; None for background work
+current_tenant: ContextVar[Optional[Tenant]] = ContextVar('current_tenant', default=None)
+
+
+@contextmanager
+def tenant_context(customer_id: int, plan: str):
+    """Attribute upstream work in this block (and threads started via with_app_context) to a customer"""
+    token = current_tenant.set(Tenant(customer_id, plan))
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+def with_app_context(func: Callable) -> Callable:
+    """Wrap a callable so it runs inside the caller's Flask app context and tenant.
+
+    Worker threads don't inherit the app context, so anything that touches
+    the database (e.g. the DataForSEO cache) needs it pushed explicitly.
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+    tenant = current_tenant.get()
+    if app is None and tenant is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        token = current_tenant.set(tenant)
+        try:
+            if app is None:
+                return func(*args, **kwargs)
+            with app.app_context():
+                return func(*args, **kwargs)
+        finally:
+            current_tenant.reset(token)
+
+    return wrapper
+
+
+class Waiter:
+    """A thread, or a coroutine on loop, queued for a permit that a releasing thread hands over.
+
+    grant() and the cancelled flag are only touched under the owner's lock.
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.granted = False
+        self._event = threading.Event() if loop is None else None
+        self._future = loop.create_future() if loop is not None else None
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self._event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+    def wait(self):
+        self._event.wait()
+
+    async def wait_async(self):
+        await self._future
+
+
+class HostLimiter:
+    """Bounded number of in-flight requests to one host, shared by threads and coroutines"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_flight = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _acquire_or_queue(self, loop=None) -> Optional[Waiter]:
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return None
+            waiter = Waiter(loop)
+            self._waiters.append(waiter)
+            return waiter
+
+    def acquire(self):
+        waiter = self._acquire_or_queue()
+        if waiter is not None:
+            waiter.wait()
+
+    async def acquire_async(self):
+        waiter = self._acquire_or_queue(asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await waiter.wait_async()
+        except BaseException:
+            # Cancelled while queued: leave the queue, or pass on a permit granted meanwhile
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The permit passes straight to the longest waiting caller
+                self._waiters.popleft().grant()
+            else:
+                self._in_flight -= 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+_host_semaphores: Dict[str, HostLimiter] = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def get_host_semaphore(host: str, limit: int) -> HostLimiter:
+    """Get the process-wide limiter of in-flight requests to a host (with or async with)"""
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = HostLimiter(limit)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key (the leader) does the work; callers arriving
+    while it is in flight wait on the leader's future and share its result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def begin(self, key: str) -> Tuple[Future, bool]:
+        """Join the in-flight call for key, returning (future, is_leader)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, result: Any = None, exception: BaseException = None):
+        """Publish the leader's outcome to every waiter and release the key"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """Run func once per key across concurrent callers"""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, future, exception=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict:
+        """Leader vs. shared call counters"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'shared': self.shared
+            }
+
+
+class RateLimiter:
+    """Token bucket: acquire() blocks until the requested number of tokens is available.
+
+    Refills at rate tokens per second up to burst; a rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self, tokens: float = 1):
+        """Take tokens, sleeping off any shortfall at the refill rate"""
+        if self.rate <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative reserves the tokens; the caller sleeps off the debt
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+
+        if wait:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stop calling an upstream that keeps failing, then probe it again after a cool-down.
+
+    closed: calls go through; failure_threshold consecutive failures open it.
+    open: calls are rejected until reset_timeout seconds have passed.
+    half_open: one probe call goes through; success closes, failure re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = 'half_open'
+                self._probe_in_flight = False
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self.opened += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        """Current state and counters"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'times_opened': self.opened,
+                'rejected_calls': self.rejected
+            }
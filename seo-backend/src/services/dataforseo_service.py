@@ -1,81 +1,516 @@
 import requests
 import json
 import hashlib
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from src.models.seo_models import DataForSEOCache, db
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from src.models.database import db, has_pending_writes, release_connection
+from src.models.seo_models import DataForSEOCache, DataForSEOPayload, upsert
+from src.services import cache_storage, metrics
+from src.services.concurrency import CircuitBreaker, SingleFlight, Tenant, current_tenant, get_host_semaphore, with_app_context
+from src.services.memory_cache import MemoryLRUCache
+from src.services.upstream_scheduler import dataforseo_scheduler, highest_priority
+
+SERP_ENDPOINT = "serp/google/organic/live/advanced"
+KEYWORD_DATA_ENDPOINT = "keywords_data/google/search_volume/live"
+COMPETITORS_ENDPOINT = "domain_analytics/google/competitors/live"
+TECHNICAL_AUDIT_ENDPOINT = "on_page/instant_pages"
+
+# Independently fetchable parts of analyze_customer_seo
+ANALYSIS_PARTS = ('rankings', 'keyword_data', 'technical_audit')
+
+def normalize_keyword(keyword: str) -> str:
+    """Case- and whitespace-insensitive form of a keyword, as searched and cached"""
+    return ' '.join(keyword.lower().split())
+
+def is_fallback(response: Dict) -> bool:
+    """Whether a response is mock data served because the API call failed"""
+    return isinstance(response, dict) and response.get('fallback') is True
+
+class SerpTaskBatcher:
+    """Coalesces single SERP tasks from concurrent callers into multi-task POSTs"""
+    
+    def __init__(self, post: Callable[[str, List[Dict]], Dict], endpoint: str,
+                 max_batch_size: int, max_wait: float):
+        self.post = post
+        self.endpoint = endpoint
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Dict, Future, Optional[Tenant]]] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(thread_name_prefix='serp-batch')
+    
+    def submit(self, task: Dict) -> Future:
+        """Queue a task; the future resolves to a one-task API response"""
+        future = Future()
+        with self._lock:
+            self._pending.append((task, future, current_tenant.get()))
+            if len(self._pending) >= self.max_batch_size:
+                self._executor.submit(self._send, self._take_pending())
+            elif len(self._pending) == 1:
+                # First task of a new batch: flush whatever has gathered after max_wait
+                timer = threading.Timer(self.max_wait, self._flush)
+                timer.daemon = True
+                timer.start()
+        return future
+    
+    def _take_pending(self) -> List[Tuple[Dict, Future, Optional[Tenant]]]:
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        return batch
+    
+    def _flush(self):
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._send(batch)
+    
+    def _send(self, batch: List[Tuple[Dict, Future, Optional[Tenant]]]):
+        """POST a batch and demultiplex tasks[i] back to the i-th caller"""
+        # The shared POST is scheduled at the priority of its most important caller
+        token = current_tenant.set(highest_priority(tenant for _, _, tenant in batch))
+        try:
+            response = self.post(self.endpoint, [task for task, _, _ in batch])
+            for (_, future, _), result in zip(batch, split_batch_response(response, len(batch))):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            current_tenant.reset(token)
+
+def split_batch_response(response: Dict, count: int) -> List:
+    """Split a multi-task response into one single-task response per submitted task.
+
+    A task missing from the response is returned as an exception in its place.
+    """
+    tasks = response.get('tasks') or []
+    results = []
+    for i in range(count):
+        if i < len(tasks):
+            results.append({
+                'status_code': response.get('status_code'),
+                'status_message': response.get('status_message'),
+                'tasks': [tasks[i]]
+            })
+        else:
+            results.append(requests.exceptions.RequestException(
+                f"Batched response is missing task {i} of {count}"
+            ))
+    return results
+
+_batchers: Dict[Tuple[str, str, str], SerpTaskBatcher] = {}
+_batchers_lock = threading.Lock()
+
+# Hot tier in front of the DataForSEOCache table, shared by all service instances
+hot_cache = MemoryLRUCache(
+    max_entries=int(os.environ.get('DATAFORSEO_HOT_CACHE_ENTRIES', 2000)),
+    max_bytes=int(os.environ.get('DATAFORSEO_HOT_CACHE_MB', 128)) * 1024 * 1024
+)
+
+# Identical in-flight requests (same cache key) share one upstream call
+inflight_requests = SingleFlight()
+
+# Cache lifetime per endpoint family in hours; override with e.g. DATAFORSEO_TTL_SERP_HOURS
+CACHE_TTL_HOURS = {
+    'serp': 24,
+    'keywords_data': 24 * 7,
+    'domain_analytics': 24 * 3,
+    'on_page': 24 * 3
+}
+DEFAULT_CACHE_TTL_HOURS = 24
+
+# How long past expiry an entry may still be served while it is refreshed
+STALE_WHILE_REVALIDATE_HOURS = float(os.environ.get('DATAFORSEO_STALE_WHILE_REVALIDATE_HOURS', 24))
+
+# Background refreshes of stale entries
+refresh_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('DATAFORSEO_REFRESH_WORKERS', 4)),
+    thread_name_prefix='cache-refresh'
+)
+refresh_stats = {'stale_served': 0, 'refreshes_started': 0}
+
+# POSTs and tasks actually sent upstream by this process, and how calls failed
+upstream_stats = {
+    'requests': 0, 'tasks': 0, 'retries': 0, 'timeouts': 0, 'connection_errors': 0,
+    'server_errors': 0, 'rate_limited': 0, 'circuit_rejections': 0, 'mock_fallbacks': 0
+}
+
+# Shared HTTP client: pooled connections per host and (connect, read) timeouts in seconds
+HTTP_POOL_SIZE = int(os.environ.get('DATAFORSEO_POOL_SIZE', 16))
+CONNECT_TIMEOUT = float(os.environ.get('DATAFORSEO_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('DATAFORSEO_READ_TIMEOUT', 60))
+
+# 429/5xx responses, timeouts and connection errors are retried with
+# exponential backoff and full jitter, honouring Retry-After
+MAX_RETRIES = int(os.environ.get('DATAFORSEO_MAX_RETRIES', 3))
+RETRY_BACKOFF_SECONDS = float(os.environ.get('DATAFORSEO_RETRY_BACKOFF_SECONDS', 0.5))
+RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get('DATAFORSEO_RETRY_BACKOFF_MAX_SECONDS', 10))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('DATAFORSEO_BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('DATAFORSEO_BREAKER_RESET_SECONDS', 30))
+
+# Probe idle pooled connections so ones dropped by a proxy or NAT are noticed
+KEEPALIVE_SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, name)
+]
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling DataForSEO while the host's circuit breaker is open"""
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets have TCP keep-alive enabled"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + KEEPALIVE_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+_http_sessions: Dict[Tuple[str, str], requests.Session] = {}
+_http_sessions_lock = threading.Lock()
+
+def get_http_session(username: str, password: str) -> requests.Session:
+    """Process-wide session per account, so connections are reused across requests and services"""
+    key = (username, password)
+    with _http_sessions_lock:
+        session = _http_sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.auth = key
+            # Retries are done by _post, which knows about backoff and the circuit breaker
+            adapter = KeepAliveAdapter(pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_sessions[key] = session
+        return session
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for an upstream host"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+            _circuit_breakers[host] = breaker
+        return breaker
+
+def get_upstream_stats() -> Dict:
+    """Request, retry and failure counters plus the circuit breaker of each host"""
+    with _circuit_breakers_lock:
+        breakers = dict(_circuit_breakers)
+    return {
+        'requests': dict(upstream_stats),
+        'circuit_breakers': {host: breaker.stats() for host, breaker in breakers.items()}
+    }
+
+def endpoint_family(endpoint: str) -> str:
+    """Family of an endpoint (serp, keywords_data, ...), the unit TTLs and metrics use"""
+    return endpoint.split('/')[0]
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff for a retry, at least any Retry-After (both capped)"""
+    delay = random.uniform(0, min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, RETRY_BACKOFF_MAX_SECONDS)
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Retry-After of a requests or httpx response, in seconds"""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
 
 class DataForSEOService:
     """Service for integrating with DataForSEO API"""
     
-    def __init__(self, username: str = None, password: str = None):
-        # In production, these would come from environment variables
-        self.username = username or "demo_user"  # Replace with actual credentials
-        self.password = password or "demo_password"  # Replace with actual credentials
-        self.base_url = "https://api.dataforseo.com/v3"
-        self.session = requests.Session()
-        self.session.auth = (self.username, self.password)
+    def __init__(self, username: str = None, password: str = None,
+                 max_workers: int = None, max_per_host: int = None,
+                 serp_batch_size: int = None, cache_storage_format: str = None):
+        # Credentials from DATAFORSEO_LOGIN / DATAFORSEO_PASSWORD, demo account otherwise
+        self.username = username or os.environ.get('DATAFORSEO_LOGIN', "demo_user")
+        self.password = password or os.environ.get('DATAFORSEO_PASSWORD', "demo_password")
+        self.base_url = os.environ.get('DATAFORSEO_BASE_URL', "https://api.dataforseo.com/v3")
+        
+        # Bounded concurrency for analyze_customer_seo (1 = sequential)
+        self.max_workers = max_workers or int(os.environ.get('DATAFORSEO_MAX_WORKERS', 8))
+        self.max_per_host = max_per_host or int(os.environ.get('DATAFORSEO_MAX_PER_HOST', 4))
+        
+        # SERP tasks per POST body (1 = no batching) and how long to gather a batch
+        self.serp_batch_size = serp_batch_size or int(os.environ.get('DATAFORSEO_SERP_BATCH_SIZE', 50))
+        self.batch_wait = float(os.environ.get('DATAFORSEO_BATCH_WAIT_MS', 20)) / 1000
+        
+        # How new cache entries are written (see cache_storage.STORAGE_FORMATS)
+        self.cache_storage_format = cache_storage_format or os.environ.get('DATAFORSEO_CACHE_STORAGE', 'zlib')
+        
+        # (connect, read) timeouts and retries per upstream call
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.max_retries = MAX_RETRIES
+        
+        # Shared by every instance with the same credentials, so connections stay warm
+        self.session = get_http_session(self.username, self.password)
         
     def _generate_cache_key(self, endpoint: str, params: Dict) -> str:
         """Generate a unique cache key for API requests"""
         key_string = f"{endpoint}_{json.dumps(params, sort_keys=True)}"
         return hashlib.md5(key_string.encode()).hexdigest()
     
+    def _cache_ttl_hours(self, endpoint: str) -> float:
+        """Cache lifetime for an endpoint, by its family (serp, keywords_data, ...)"""
+        family = endpoint_family(endpoint)
+        override = os.environ.get(f'DATAFORSEO_TTL_{family.upper()}_HOURS')
+        if override:
+            return float(override)
+        return CACHE_TTL_HOURS.get(family, DEFAULT_CACHE_TTL_HOURS)
+    
     def _get_cached_data(self, cache_key: str) -> Optional[Dict]:
         """Get cached data if it exists and hasn't expired"""
+        entry = self._get_cache_entry(cache_key)
+        if entry and not entry[1]:
+            return entry[0]
+        return None
+    
+    def _get_cache_entry(self, cache_key: str) -> Optional[Tuple[Dict, bool]]:
+        """Get (data, is_stale) for an entry that is fresh or within the stale window"""
+        entry = hot_cache.lookup(cache_key)
+        if entry is not None:
+            return entry
+        return self._load_cache_entry(cache_key)
+    
+    def _load_cache_entry(self, cache_key: str) -> Optional[Tuple[Dict, bool]]:
+        """Read an entry from the DataForSEOCache table into the hot cache"""
         try:
-            cache_entry = DataForSEOCache.query.filter_by(cache_key=cache_key).first()
-            if cache_entry and cache_entry.expires_at > datetime.utcnow():
-                return json.loads(cache_entry.cache_data)
+            now = datetime.utcnow()
+            stale_window = timedelta(hours=STALE_WHILE_REVALIDATE_HOURS)
+            # Fetch the row and its compressed payload (if any) in one query
+            row = db.session.query(DataForSEOCache, DataForSEOPayload).outerjoin(
+                DataForSEOPayload, DataForSEOPayload.content_hash == DataForSEOCache.payload_hash
+            ).filter(DataForSEOCache.cache_key == cache_key).first()
+            if row and row[0].expires_at + stale_window > now:
+                cache_entry, payload = row
+                text, size = cache_storage.load_cache_text(cache_entry, payload)
+                data = json.loads(text)
+                hot_cache.set(cache_key, data, cache_entry.expires_at, size,
+                              stale_until=cache_entry.expires_at + stale_window)
+                return data, cache_entry.expires_at <= now
         except Exception as e:
-            print(f"Cache retrieval error: {e}")
+            metrics.report_error('dataforseo_cache', "Cache retrieval error", e)
         return None
     
-    def _cache_data(self, cache_key: str, data: Dict, hours: int = 24):
-        """Cache API response data"""
+    def _cache_data(self, cache_key: str, data: Dict, hours: float = 24, commit: bool = False):
+        """Cache API response data; commit=True commits it unless the session holds the caller's writes"""
+        caller_writes = commit and has_pending_writes()
         try:
             expires_at = datetime.utcnow() + timedelta(hours=hours)
+            cache_data = cache_storage.serialize(data, self.cache_storage_format)
+            hot_cache.set(cache_key, data, expires_at, len(cache_data),
+                          stale_until=expires_at + timedelta(hours=STALE_WHILE_REVALIDATE_HOURS))
             
-            # Remove existing cache entry if it exists
-            existing = DataForSEOCache.query.filter_by(cache_key=cache_key).first()
-            if existing:
-                db.session.delete(existing)
+            # Compressed payloads are stored once per content hash
+            payload_hash = None
+            if self.cache_storage_format == 'zlib':
+                payload_hash = cache_storage.store_payload(cache_data)
+                cache_data = ''
             
-            # Create new cache entry
-            cache_entry = DataForSEOCache(
-                cache_key=cache_key,
-                cache_data=json.dumps(data),
-                expires_at=expires_at
-            )
-            db.session.add(cache_entry)
+            # Insert or replace the entry in a single statement
+            upsert(DataForSEOCache, {
+                'cache_key': cache_key,
+                'cache_data': cache_data,
+                'payload_hash': payload_hash,
+                'created_at': datetime.utcnow(),
+                'expires_at': expires_at
+            }, index_elements=['cache_key'])
+        except Exception as e:
+            metrics.report_error('dataforseo_cache', "Cache storage error", e)
+        if commit and not caller_writes:
+            self._commit_cache()
+
+    def _commit_cache(self):
+        """Commit cache rows written in a session that holds nothing else"""
+        try:
             db.session.commit()
         except Exception as e:
-            print(f"Cache storage error: {e}")
+            db.session.rollback()
+            metrics.report_error('dataforseo_cache', "Cache storage error", e)
     
-    def _make_request(self, endpoint: str, data: List[Dict], cache_hours: int = 24) -> Dict:
-        """Make a request to DataForSEO API with caching"""
+    def _make_request(self, endpoint: str, data: List[Dict], cache_hours: float = None,
+                      allow_stale: bool = True) -> Dict:
+        """Make a request to DataForSEO API with caching.
+        
+        Stale entries are served (and refreshed in the background) unless
+        allow_stale is False, in which case they are re-fetched first.
+        """
+        started = time.perf_counter()
         cache_key = self._generate_cache_key(endpoint, data[0] if data else {})
+        cache_hours = cache_hours or self._cache_ttl_hours(endpoint)
+        
+        # Try to get cached data first; stale data is served while it is refreshed
+        cache_entry = self._get_cache_entry(cache_key)
+        if cache_entry and (allow_stale or not cache_entry[1]):
+            cached_data, stale = cache_entry
+            if stale:
+                self._refresh_in_background(endpoint, data, cache_key, cache_hours)
+            self._record_lookup(endpoint, 'stale' if stale else 'hit', started)
+            return cached_data
+        
+        led = []
+        
+        def fetch():
+            led.append(True)
+            return self._fetch_and_cache(endpoint, data, cache_key, cache_hours)
+        
+        result = inflight_requests.do(cache_key, fetch)
+        self._record_lookup(endpoint, 'miss' if led else 'joined', started)
+        return result
+    
+    def _record_lookup(self, endpoint: str, cache: str, started: float):
+        """Count a lookup by cache outcome and attribute its time to the current customer"""
+        elapsed = time.perf_counter() - started
+        family = endpoint_family(endpoint)
+        customer = metrics.customer_label()
+        metrics.dataforseo_lookups.inc(endpoint=family, cache=cache, customer=customer)
+        metrics.dataforseo_lookup_seconds.observe(elapsed, endpoint=family, cache=cache)
+        metrics.customer_seconds.inc(elapsed, component='dataforseo', customer=customer)
+    
+    def _charge(self, endpoint: str, tasks: int):
+        """Count tasks about to be sent upstream against the current customer, waiting for its rate limit"""
+        metrics.dataforseo_tasks.inc(tasks, endpoint=endpoint_family(endpoint), customer=metrics.customer_label())
+        dataforseo_scheduler.throttle(tasks)
+    
+    def _refresh_in_background(self, endpoint: str, data: List[Dict], cache_key: str, cache_hours: float):
+        """Re-fetch a stale entry off the request path, unless it is already in flight"""
+        refresh_stats['stale_served'] += 1
+        flight, leader = inflight_requests.begin(cache_key)
+        if not leader:
+            return
         
-        # Try to get cached data first
+        def refresh():
+            try:
+                result = self._fetch_and_cache(endpoint, data, cache_key, cache_hours)
+            except Exception as e:
+                result = self._get_fallback_data(endpoint, e)
+            inflight_requests.finish(cache_key, flight, result)
+        
+        refresh_stats['refreshes_started'] += 1
+        refresh_executor.submit(with_app_context(refresh))
+    
+    def _fetch_and_cache(self, endpoint: str, data: List[Dict], cache_key: str, cache_hours: float = 24) -> Dict:
+        """Fetch from the API and cache the response (run once per in-flight cache key)"""
+        # A previous leader may have filled the cache since our miss
         cached_data = self._get_cached_data(cache_key)
         if cached_data:
             return cached_data
         
         try:
-            url = f"{self.base_url}/{endpoint}"
-            response = self.session.post(url, json=data)
-            response.raise_for_status()
+            result = self._fetch(endpoint, data)
             
-            result = response.json()
-            
-            # Cache the response
-            self._cache_data(cache_key, result, cache_hours)
+            # Cache the response; rows join the caller's transaction if it has one open
+            self._cache_data(cache_key, result, cache_hours, commit=True)
             
             return result
         except requests.exceptions.RequestException as e:
-            print(f"DataForSEO API error: {e}")
-            # Return mock data for demo purposes
-            return self._get_mock_data(endpoint)
+            return self._get_fallback_data(endpoint, e)
+    
+    def _fetch(self, endpoint: str, data: List[Dict]) -> Dict:
+        """Fetch from the API, routing single SERP tasks through the batcher"""
+        # Don't hold a database connection while queued or waiting on the API
+        release_connection()
+        # Each task counts against the customer's rate limit
+        self._charge(endpoint, len(data))
+        if endpoint == SERP_ENDPOINT and len(data) == 1 and self.serp_batch_size > 1:
+            return self._get_batcher(endpoint).submit(data[0]).result()
+        return self._post(endpoint, data)
+    
+    def _post(self, endpoint: str, data: List[Dict]) -> Dict:
+        """POST a task list to the DataForSEO API.
+        
+        429/5xx responses, timeouts and connection errors are retried with
+        backoff; while the host's circuit breaker is open the call fails fast
+        with CircuitOpenError.
+        """
+        with metrics.dataforseo_request_seconds.time(endpoint=endpoint_family(endpoint)):
+            return self._post_with_retries(endpoint, data)
+    
+    def _post_with_retries(self, endpoint: str, data: List[Dict]) -> Dict:
+        url = f"{self.base_url}/{endpoint}"
+        host = urlparse(url).netloc
+        breaker = get_circuit_breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                upstream_stats['circuit_rejections'] += 1
+                raise CircuitOpenError(f"Circuit breaker open for {host}")
+            
+            retry_after = None
+            try:
+                # Fair share of the upstream's capacity by plan, then the per-host limit
+                with dataforseo_scheduler.slot(), get_host_semaphore(host, self.max_per_host):
+                    upstream_stats['requests'] += 1
+                    upstream_stats['tasks'] += len(data)
+                    response = self.session.post(url, json=data, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                upstream_stats['timeouts' if isinstance(e, requests.exceptions.Timeout) else 'connection_errors'] += 1
+                breaker.record_failure()
+                error = e
+            except Exception:
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    # Any other answer, even a 4xx, means the API is up
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response.json()
+                
+                if response.status_code == 429:
+                    upstream_stats['rate_limited'] += 1
+                    breaker.record_success()
+                else:
+                    upstream_stats['server_errors'] += 1
+                    breaker.record_failure()
+                retry_after = retry_after_seconds(response)
+                error = requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+            
+            if attempt >= self.max_retries:
+                raise error
+            upstream_stats['retries'] += 1
+            time.sleep(backoff_delay(attempt, retry_after))
+            attempt += 1
+    
+    def _get_batcher(self, endpoint: str) -> SerpTaskBatcher:
+        """Get the process-wide batcher so tasks coalesce across concurrent requests"""
+        key = (self.base_url, self.username, endpoint)
+        with _batchers_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = SerpTaskBatcher(self._post, endpoint, self.serp_batch_size, self.batch_wait)
+                _batchers[key] = batcher
+            return batcher
+    
+    def _get_fallback_data(self, endpoint: str, error: Exception) -> Dict:
+        """Mock data served when the API call failed, counted in upstream_stats"""
+        upstream_stats['mock_fallbacks'] += 1
+        metrics.report_error('dataforseo', f"DataForSEO API error, serving mock data for {endpoint}", error)
+        mock_data = self._get_mock_data(endpoint)
+        mock_data['fallback'] = True
+        return mock_data
     
     def _get_mock_data(self, endpoint: str) -> Dict:
         """Return mock data for demo purposes when API is not available"""
@@ -107,83 +542,230 @@ class DataForSEOService:
             }
         return {"status_code": 20000, "status_message": "Ok.", "tasks": []}
     
-    def get_serp_results(self, keyword: str, location: str = "Sweden", language: str = "en") -> Dict:
-        """Get SERP results for a keyword"""
-        data = [{
-            "keyword": keyword,
+    def _serp_task(self, keyword: str, location: str, language: str) -> Dict:
+        """Build the SERP task payload for a keyword.
+        
+        Search results don't depend on case or spacing, so every caller
+        (on-demand or fleet refresh) shares one cache entry per keyword.
+        """
+        return {
+            "keyword": normalize_keyword(keyword),
             "location_name": location,
             "language_name": language,
             "device": "desktop",
             "os": "windows"
-        }]
-        
-        return self._make_request("serp/google/organic/live/advanced", data)
+        }
     
-    def get_keyword_data(self, keywords: List[str], location: str = "Sweden") -> Dict:
-        """Get keyword data including search volume and difficulty"""
-        data = [{
+    def _keyword_data_task(self, keywords: List[str], location: str) -> Dict:
+        """Build the search volume task payload for a keyword list"""
+        return {
             "keywords": keywords,
             "location_name": location,
             "language_name": "English"
-        }]
-        
-        return self._make_request("keywords_data/google/search_volume/live", data)
+        }
     
-    def get_competitor_analysis(self, domain: str, competitor_domains: List[str]) -> Dict:
-        """Get competitor analysis data"""
-        data = [{
+    def _competitor_task(self, domain: str, competitor_domains: List[str]) -> Dict:
+        """Build the competitor analysis task payload for a domain"""
+        return {
             "target": domain,
             "competitors": competitor_domains,
             "location_name": "Sweden",
             "language_name": "English"
-        }]
+        }
+    
+    def _technical_audit_task(self, domain: str) -> Dict:
+        """Build the technical audit task payload for a domain"""
+        return {
+            "target": domain,
+            "max_crawl_pages": 100
+        }
+    
+    def get_serp_results(self, keyword: str, location: str = "Sweden", language: str = "en",
+                         allow_stale: bool = True) -> Dict:
+        """Get SERP results for a keyword"""
+        data = [self._serp_task(keyword, location, language)]
+        
+        return self._make_request(SERP_ENDPOINT, data, allow_stale=allow_stale)
+    
+    def get_serp_results_many(self, keywords: List[str], location: str = "Sweden", language: str = "en",
+                              allow_stale: bool = True) -> Dict[str, Dict]:
+        """Get SERP results for several keywords, keyed in keyword order"""
+        if self.serp_batch_size <= 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    (keyword, executor.submit(with_app_context(self.get_serp_results),
+                                              keyword, location, language, allow_stale))
+                    for keyword in keywords
+                ]
+                return {keyword: future.result() for keyword, future in futures}
+        
+        # Queue every cache miss up front so they coalesce into full batches;
+        # misses already in flight elsewhere are joined instead of re-sent
+        started = time.perf_counter()
+        results = {}
+        pending = {}
+        joined = {}
+        batcher = self._get_batcher(SERP_ENDPOINT)
+        cache_hours = self._cache_ttl_hours(SERP_ENDPOINT)
+        for keyword in keywords:
+            task = self._serp_task(keyword, location, language)
+            cache_key = self._generate_cache_key(SERP_ENDPOINT, task)
+            cache_entry = self._get_cache_entry(cache_key)
+            if cache_entry and (allow_stale or not cache_entry[1]):
+                results[keyword], stale = cache_entry
+                if stale:
+                    self._refresh_in_background(SERP_ENDPOINT, [task], cache_key, cache_hours)
+                self._record_lookup(SERP_ENDPOINT, 'stale' if stale else 'hit', started)
+                continue
+            
+            flight, leader = inflight_requests.begin(cache_key)
+            if leader:
+                pending[keyword] = (cache_key, flight, task)
+            else:
+                joined[keyword] = flight
+        
+        # Don't hold a database connection while throttled or waiting on the API
+        release_connection()
+        for keyword, (cache_key, flight, task) in pending.items():
+            self._charge(SERP_ENDPOINT, 1)
+            pending[keyword] = (cache_key, flight, batcher.submit(task))
         
-        return self._make_request("domain_analytics/google/competitors/live", data)
+        for keyword, (cache_key, flight, future) in pending.items():
+            try:
+                result = future.result()
+                # Each task is cached under its own key
+                self._cache_data(cache_key, result, cache_hours, commit=True)
+            except Exception as e:
+                # Waiters must always be released, whatever the failure
+                result = self._get_fallback_data(SERP_ENDPOINT, e)
+            inflight_requests.finish(cache_key, flight, result)
+            results[keyword] = result
+            self._record_lookup(SERP_ENDPOINT, 'miss', started)
+        
+        for keyword, flight in joined.items():
+            results[keyword] = flight.result()
+            self._record_lookup(SERP_ENDPOINT, 'joined', started)
+        
+        return {keyword: results[keyword] for keyword in keywords}
+    
+    def get_keyword_data(self, keywords: List[str], location: str = "Sweden", allow_stale: bool = True) -> Dict:
+        """Get keyword data including search volume and difficulty"""
+        data = [self._keyword_data_task(keywords, location)]
+        
+        return self._make_request(KEYWORD_DATA_ENDPOINT, data, allow_stale=allow_stale)
+    
+    def get_keyword_volumes(self, keywords: List[str], location: str = "Sweden", allow_stale: bool = True) -> Dict[str, Dict]:
+        """Search volume and difficulty per keyword, as returned by the API"""
+        return self._extract_keyword_data(self.get_keyword_data(keywords, location, allow_stale))
+    
+    def get_competitor_analysis(self, domain: str, competitor_domains: List[str]) -> Dict:
+        """Get competitor analysis data"""
+        data = [self._competitor_task(domain, competitor_domains)]
+        
+        return self._make_request(COMPETITORS_ENDPOINT, data)
     
     def get_technical_audit(self, domain: str) -> Dict:
         """Get technical SEO audit data"""
-        data = [{
-            "target": domain,
-            "max_crawl_pages": 100
-        }]
+        data = [self._technical_audit_task(domain)]
         
-        return self._make_request("on_page/instant_pages", data)
+        return self._make_request(TECHNICAL_AUDIT_ENDPOINT, data)
     
-    def analyze_customer_seo(self, customer_data: Dict) -> Dict:
-        """Comprehensive SEO analysis for a customer"""
+    def analyze_customer_seo(self, customer_data: Dict, parts: List[str] = None) -> Dict:
+        """Comprehensive SEO analysis for a customer.
+        
+        parts limits the upstream work to some of ANALYSIS_PARTS ('rankings'
+        covers keyword_rankings and competitors); other results stay empty.
+        Parts that raised, got mock fallback data or came back empty are
+        listed in failed_parts.
+        """
         website_url = customer_data['website_url']
         keywords = customer_data['target_keywords']
+        parts = set(ANALYSIS_PARTS if parts is None else parts)
         
         results = {
             'keyword_rankings': {},
             'keyword_data': {},
             'competitors': [],
-            'technical_audit': {}
+            'technical_audit': {},
+            'failed_parts': []
         }
         
         try:
-            # Get rankings for each keyword
-            for keyword in keywords:
-                serp_data = self.get_serp_results(keyword)
-                results['keyword_rankings'][keyword] = self._extract_ranking_data(serp_data, website_url)
-            
-            # Get keyword volume and difficulty data
-            keyword_data = self.get_keyword_data(keywords)
-            results['keyword_data'] = self._extract_keyword_data(keyword_data)
-            
-            # Get competitor data
-            competitors = self._extract_competitors_from_serp(results['keyword_rankings'])
-            results['competitors'] = competitors
+            # Fan out the SERP lookups, keyword data and technical audit;
+            # they are independent of each other
+            responses = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {}
+                if 'keyword_data' in parts:
+                    futures['keyword_data'] = executor.submit(with_app_context(self.get_keyword_data), keywords)
+                if 'technical_audit' in parts:
+                    futures['technical_audit'] = executor.submit(with_app_context(self.get_technical_audit), website_url)
+                
+                # Rankings come back in keyword order
+                if 'rankings' in parts:
+                    try:
+                        responses['rankings'] = self.get_serp_results_many(keywords)
+                    except Exception as e:
+                        responses['rankings'] = e
+                
+                for part, future in futures.items():
+                    responses[part] = future.exception() or future.result()
             
-            # Get technical audit
-            technical_data = self.get_technical_audit(website_url)
-            results['technical_audit'] = self._extract_technical_issues(technical_data)
+            self._apply_analysis_responses(results, responses, website_url, keywords)
             
         except Exception as e:
-            print(f"Error in SEO analysis: {e}")
+            metrics.report_error('dataforseo', "Error in SEO analysis", e)
+            results['failed_parts'] = [part for part in ANALYSIS_PARTS if part in parts]
         
         return results
     
+    def _apply_analysis_responses(self, results: Dict, responses: Dict, website_url: str, keywords: List[str]):
+        """Fill analysis results from each part's responses (or exception), listing the parts that failed"""
+        for part in ANALYSIS_PARTS:
+            if part not in responses:
+                continue
+            response = responses[part]
+            try:
+                if isinstance(response, BaseException):
+                    raise response
+                if part == 'rankings':
+                    for keyword, serp_data in response.items():
+                        results['keyword_rankings'][keyword] = self._extract_ranking_data(serp_data, website_url)
+                    succeeded = bool(results['keyword_rankings'] or not keywords) and \
+                        not any(is_fallback(serp_data) for serp_data in response.values())
+                elif part == 'keyword_data':
+                    results['keyword_data'] = self._extract_keyword_data(response)
+                    succeeded = bool(results['keyword_data'] or not keywords) and not is_fallback(response)
+                else:
+                    results['technical_audit'] = self._extract_technical_issues(response)
+                    succeeded = not is_fallback(response)
+            except Exception as e:
+                metrics.report_error('dataforseo', f"Error in SEO analysis ({part})", e)
+                succeeded = False
+            if not succeeded:
+                results['failed_parts'].append(part)
+        
+        results['competitors'] = self._extract_competitors_from_serp(results['keyword_rankings'])
+    
+    def build_keyword_results(self, website_url: str, keywords: List[str],
+                              serp_results: Dict[str, Dict], keyword_data: Dict[str, Dict]) -> Dict:
+        """Rankings, keyword data and competitors for one website from already fetched data.
+        
+        serp_results maps each keyword to its SERP response and keyword_data
+        to its extracted volume/difficulty; keywords missing from either are
+        left out of the corresponding result.
+        """
+        keyword_rankings = {
+            keyword: self._extract_ranking_data(serp_results[keyword], website_url)
+            for keyword in keywords if keyword in serp_results
+        }
+        return {
+            'keyword_rankings': keyword_rankings,
+            'keyword_data': {keyword: keyword_data[keyword] for keyword in keywords if keyword in keyword_data},
+            'competitors': self._extract_competitors_from_serp(keyword_rankings),
+            'technical_audit': {}
+        }
+    
     def _extract_ranking_data(self, serp_data: Dict, target_url: str) -> Dict:
         """Extract ranking information from SERP data"""
         ranking_info = {
@@ -209,7 +791,7 @@ class DataForSEOService:
                             'description': item.get('description', '')
                         })
         except Exception as e:
-            print(f"Error extracting ranking data: {e}")
+            metrics.report_error('dataforseo', "Error extracting ranking data", e)
         
         return ranking_info
     
@@ -226,7 +808,7 @@ class DataForSEOService:
                         'difficulty': item.get('keyword_difficulty', 0)
                     }
         except Exception as e:
-            print(f"Error extracting keyword data: {e}")
+            metrics.report_error('dataforseo', "Error extracting keyword data", e)
         
         return extracted_data
     
@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from src.models.database import db
+from src.models.seo_models import Customer, FleetRefreshRun
+from src.services import analysis_snapshots, metrics, seo_tasks
+from src.services.concurrency import RateLimiter, with_app_context
+from src.services.dataforseo_service import DataForSEOService, normalize_keyword, upstream_stats
+
+# Keywords fetched per step (SERP tasks plus one keyword data request); progress is saved after each
+FLEET_REFRESH_CHUNK_SIZE = int(os.environ.get('FLEET_REFRESH_CHUNK_SIZE', 100))
+
+# Upstream tasks per second across the run (0 = unlimited)
+FLEET_REFRESH_TASKS_PER_SECOND = float(os.environ.get('FLEET_REFRESH_TASKS_PER_SECOND', 20))
+
+# A running run not updated for this long is treated as abandoned and resumed
+FLEET_REFRESH_STALE_MINUTES = float(os.environ.get('FLEET_REFRESH_STALE_MINUTES', 30))
+
+# Analysis parts a fleet refresh brings up to date; technical audits stay on demand
+REFRESHED_PARTS = ('rankings', 'keyword_data')
+
+CUSTOMER_BATCH_SIZE = 200
+
+def collect_fleet_keywords() -> Tuple[List[str], int]:
+    """Sorted unique keywords of all active customers, and the sum of their keyword lists"""
+    unique_keywords = set()
+    references = 0
+    for row in db.session.query(Customer.target_keywords).filter(Customer.is_active.is_(True)).yield_per(500):
+        keywords = json.loads(row.target_keywords) if row.target_keywords else []
+        references += len(keywords)
+        unique_keywords.update(normalize_keyword(keyword) for keyword in keywords)
+    unique_keywords.discard('')
+    return sorted(unique_keywords), references
+
+def _slim_serp(serp_data: Dict) -> Dict:
+    """Keep only the top 10 items and the fields rankings are extracted from"""
+    try:
+        items = serp_data['tasks'][0]['result'][0].get('items') or []
+    except (KeyError, IndexError, TypeError):
+        return {'tasks': []}
+
+    return {'tasks': [{'result': [{'items': [{
+        'url': item.get('url', ''),
+        'rank_absolute': item.get('rank_absolute', 0),
+        'title': item.get('title', ''),
+        'description': item.get('description', '')
+    } for item in items[:10]]}]}]}
+
+def _start_run(location: str, language: str, restart: bool) -> FleetRefreshRun:
+    """Resume the last unfinished run for this location/language, or start a new one"""
+    unfinished = FleetRefreshRun.query.filter(
+        FleetRefreshRun.status.in_(('running', 'failed')),
+        FleetRefreshRun.location == location,
+        FleetRefreshRun.language == language
+    ).order_by(FleetRefreshRun.id.desc()).first()
+
+    if unfinished and unfinished.status == 'running' and \
+            unfinished.updated_at > datetime.utcnow() - timedelta(minutes=FLEET_REFRESH_STALE_MINUTES):
+        raise RuntimeError(f"Fleet refresh run {unfinished.id} is in progress (last update {unfinished.updated_at.isoformat()})")
+
+    if unfinished and not restart:
+        unfinished.status = 'running'
+        unfinished.error = None
+        unfinished.updated_at = datetime.utcnow()
+        db.session.commit()
+        return unfinished
+
+    if unfinished:
+        unfinished.status = 'abandoned'
+    run = FleetRefreshRun(location=location, language=language)
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+def _fetch_keywords(run: FleetRefreshRun, keywords: List[str], service: DataForSEOService,
+                    limiter: RateLimiter, chunk_size: int) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """Fetch every keyword once, chunk by chunk, returning (SERP, volume data) per keyword.
+
+    Chunks up to the run's keyword cursor were fetched before an interruption
+    and are read back from the DataForSEO cache instead of upstream.
+    """
+    serp_results = {}
+    keyword_volumes = {}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for start in range(0, len(keywords), chunk_size):
+            chunk = keywords[start:start + chunk_size]
+            fetched = run.keyword_cursor is not None and chunk[-1] <= run.keyword_cursor
+            if not fetched:
+                limiter.acquire(len(chunk) + 1)
+
+            tasks_before = upstream_stats['tasks']
+            volumes_future = executor.submit(
+                with_app_context(service.get_keyword_volumes), chunk, run.location, fetched
+            )
+            serps = service.get_serp_results_many(chunk, run.location, run.language, allow_stale=fetched)
+            volumes = volumes_future.result()
+
+            for keyword in chunk:
+                serp_results[keyword] = _slim_serp(serps[keyword])
+            for keyword, data in volumes.items():
+                keyword_volumes[normalize_keyword(keyword)] = data
+
+            # Process-wide counter, so this includes any other traffic in the same process
+            run.upstream_tasks += upstream_stats['tasks'] - tasks_before
+            if not fetched:
+                run.keyword_cursor = chunk[-1]
+                run.keywords_fetched += len(chunk)
+            run.updated_at = datetime.utcnow()
+            db.session.commit()
+
+    return serp_results, keyword_volumes
+
+def _fan_out(run: FleetRefreshRun, serp_results: Dict[str, Dict], keyword_volumes: Dict[str, Dict],
+             service: DataForSEOService):
+    """Write the fetched data to every active customer after the run's customer cursor"""
+    while True:
+        customers = db.session.query(Customer.id, Customer.website_url, Customer.target_keywords).filter(
+            Customer.is_active.is_(True), Customer.id > (run.customer_cursor or 0)
+        ).order_by(Customer.id).limit(CUSTOMER_BATCH_SIZE).all()
+        if not customers:
+            return
+
+        for customer in customers:
+            try:
+                keywords = json.loads(customer.target_keywords) if customer.target_keywords else []
+                results = service.build_keyword_results(
+                    customer.website_url, keywords,
+                    {k: serp_results[normalize_keyword(k)] for k in keywords if normalize_keyword(k) in serp_results},
+                    {k: keyword_volumes[normalize_keyword(k)] for k in keywords if normalize_keyword(k) in keyword_volumes}
+                )
+                analysis_snapshots.save_snapshot(customer.id, customer.website_url, keywords, results, REFRESHED_PARTS)
+                run.customer_cursor = customer.id
+                run.customers_refreshed += 1
+                run.updated_at = datetime.utcnow()
+                # Commits the customer's data, snapshot and the run's progress together
+                seo_tasks.persist_analysis_results(customer.id, keywords, results)
+            except Exception as e:
+                db.session.rollback()
+                metrics.report_error('fleet_refresh', f"Fleet refresh error for customer {customer.id}", e)
+                run.customer_cursor = customer.id
+                run.customers_failed += 1
+                run.updated_at = datetime.utcnow()
+                db.session.commit()
+
+def refresh_fleet(location: str = "Sweden", language: str = "en", chunk_size: int = None,
+                  tasks_per_second: float = None, restart: bool = False,
+                  service: DataForSEOService = None) -> Dict:
+    """Refresh rankings and keyword data of every active customer.
+
+    Each unique (keyword, location, language) is fetched once, rate limited,
+    and the results are fanned out to every customer tracking the keyword.
+    An interrupted run is resumed from its saved cursors unless restart is set.
+    """
+    started = time.perf_counter()
+    chunk_size = chunk_size or FLEET_REFRESH_CHUNK_SIZE
+    if tasks_per_second is None:
+        tasks_per_second = FLEET_REFRESH_TASKS_PER_SECOND
+    limiter = RateLimiter(tasks_per_second, burst=max(tasks_per_second, chunk_size + 1))
+    service = service or DataForSEOService()
+
+    run = _start_run(location, language, restart)
+    run_id = run.id
+    try:
+        keywords, references = collect_fleet_keywords()
+        run.unique_keywords = len(keywords)
+        run.keyword_references = references
+        db.session.commit()
+
+        serp_results, keyword_volumes = _fetch_keywords(run, keywords, service, limiter, chunk_size)
+
+        run.phase = 'fan_out'
+        db.session.commit()
+        _fan_out(run, serp_results, keyword_volumes, service)
+
+        run.status = 'succeeded'
+        run.finished_at = datetime.utcnow()
+        run.updated_at = run.finished_at
+        db.session.commit()
+    except BaseException as e:
+        # Leave the cursors in place so the next run resumes from them
+        db.session.rollback()
+        run = db.session.get(FleetRefreshRun, run_id)
+        run.status = 'failed'
+        run.error = str(e) or type(e).__name__
+        run.updated_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+    stats = run.to_dict()
+    stats.update({
+        'rate_limited_seconds': round(limiter.waited_seconds, 3),
+        'duration_seconds': round(time.perf_counter() - started, 3)
+    })
+    return stats
+
+class FleetRefreshScheduler:
+    """Background thread that runs refresh_fleet once a day at a fixed UTC time (HH:MM).
+
+    Enable it in one process only; other processes would see the run in
+    progress and skip.
+    """
+
+    def __init__(self, app, at: str = '02:00', location: str = "Sweden", language: str = "en"):
+        self.app = app
+        self.hour, self.minute = (int(part) for part in at.split(':'))
+        self.location = location
+        self.language = language
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name='fleet-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the scheduler thread to exit"""
+        self._stop.set()
+
+    def seconds_until_next_run(self) -> float:
+        now = datetime.utcnow()
+        next_run = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def _run(self):
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                with self.app.app_context():
+                    stats = refresh_fleet(self.location, self.language)
+                print(f"Fleet refresh: {stats['unique_keywords']} unique keywords "
+                      f"({stats['keyword_references']} tracked), {stats['upstream_tasks']} upstream tasks, "
+                      f"{stats['customers_refreshed']} customers in {stats['duration_seconds']}s")
+            except Exception as e:
+                metrics.report_error('fleet_refresh', "Fleet refresh error", e)
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from src.models.database import db
+from src.models.seo_models import Customer, Job
+from src.services import metrics, seo_tasks
+from src.services.concurrency import tenant_context
+
+class JobQueue:
+    """SQLite-backed job queue executed by a pool of worker threads.
+
+    Jobs are persisted in the Job table, so any process sharing the database
+    can enqueue them and any process running workers can execute them.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.handlers: Dict[str, Callable] = {}
+        self.poll_interval = 1.0
+        self.workers = 0
+        self.requeue_interval = 60.0
+        self.abandoned_minutes = 30
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._requeue_lock = threading.Lock()
+        self._next_requeue = 0.0
+
+    def init_app(self, app, workers: int = None):
+        """Bind to an app; workers start with start() (JOB_QUEUE_WORKERS, 0 = enqueue only)"""
+        # Jobs enqueued through an unbound Job model would be accepted and never run
+        if app.extensions.get('sqlalchemy') is not db:
+            raise RuntimeError("Job queue needs the app's database (db.init_app(app)) to be set up first")
+        self.app = app
+        self.poll_interval = float(os.environ.get('JOB_QUEUE_POLL_SECONDS', 1.0))
+        self.requeue_interval = float(os.environ.get('JOB_QUEUE_REQUEUE_SECONDS', 60))
+        self.abandoned_minutes = int(os.environ.get('JOB_QUEUE_ABANDONED_MINUTES', 30))
+        self.workers = workers if workers is not None else int(os.environ.get('JOB_QUEUE_WORKERS', 2))
+
+    def start(self):
+        """Start this process's JOB_QUEUE_WORKERS worker threads, once"""
+        if self._threads or not self.workers:
+            return
+        with self._start_lock:
+            if not self._threads:
+                self.start_workers(self.workers)
+
+    def register(self, job_type: str, handler: Callable):
+        """Register the function that executes a job type"""
+        self.handlers[job_type] = handler
+
+    def enqueue(self, job_type: str, customer_id: int = None, payload: Dict = None) -> Job:
+        """Persist a new job and wake an idle worker"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = Job(
+            job_type=job_type,
+            customer_id=customer_id,
+            payload=json.dumps(payload or {})
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def start_workers(self, workers: int):
+        """Start worker threads for this process"""
+        for i in range(len(self._threads), len(self._threads) + workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Ask the worker threads to exit after their current job"""
+        self._stop.set()
+        self._wakeup.set()
+
+    def requeue_abandoned_jobs(self, older_than_minutes: int = None):
+        """Put jobs left running by a dead worker back on the queue"""
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes or self.abandoned_minutes)
+        Job.query.filter(Job.status == 'running', Job.started_at < cutoff).update(
+            {'status': 'queued', 'started_at': None}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def _claim_next(self) -> Optional[int]:
+        """Atomically move the oldest queued job to running, returning its id"""
+        while True:
+            candidate = db.session.query(Job.id).filter_by(status='queued').order_by(Job.id).first()
+            if candidate is None:
+                return None
+
+            # The status check makes the claim safe across threads and processes
+            claimed = Job.query.filter_by(id=candidate.id, status='queued').update(
+                {'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                return candidate.id
+
+    def _requeue_if_due(self):
+        """Requeue abandoned jobs every requeue_interval seconds, from one idle worker at a time"""
+        now = time.monotonic()
+        if now < self._next_requeue or not self._requeue_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_requeue = now + self.requeue_interval
+            self.requeue_abandoned_jobs()
+        finally:
+            self._requeue_lock.release()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job_id = self._claim_next()
+                    if job_id is not None:
+                        self._execute(job_id)
+                        continue
+                    self._requeue_if_due()
+            except Exception as e:
+                metrics.report_error('job_queue', "Job worker error", e)
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _execute(self, job_id: int):
+        job = db.session.get(Job, job_id)
+        job_type = job.job_type
+        payload = json.loads(job.payload) if job.payload else {}
+
+        try:
+            customer = db.session.get(Customer, job.customer_id) if job.customer_id else None
+            if customer is not None:
+                # Upstream calls made by the job are scheduled at the customer's plan tier
+                with tenant_context(customer.id, customer.subscription_plan):
+                    result = self.handlers[job_type](job.customer_id, **payload)
+            else:
+                result = self.handlers[job_type](job.customer_id, **payload)
+            job = db.session.get(Job, job_id)
+            job.status = 'succeeded'
+            job.result = json.dumps(result)
+        except Exception as e:
+            db.session.rollback()
+            metrics.report_error('job_queue', f"Job {job_id} ({job_type}) failed", e)
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+job_queue = JobQueue()
+job_queue.register('analyze', seo_tasks.run_customer_analysis)
+job_queue.register('generate_report', seo_tasks.run_report_generation)
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from flask import current_app
+from src.models.database import db, has_pending_writes
+from src.models.seo_models import LLMResponseCache, upsert
+from src.services import metrics
+from src.services.concurrency import SingleFlight
+
+# Cached completions are reused for this long (LLM_CACHE_TTL_HOURS)
+LLM_CACHE_TTL_HOURS = float(os.environ.get('LLM_CACHE_TTL_HOURS', 168))
+
+# Least recently used rows are evicted beyond these bounds
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_CACHE_MAX_BYTES = int(float(os.environ.get('LLM_CACHE_MAX_MB', 50)) * 1024 * 1024)
+
+# Eviction runs on every Nth store instead of after each one
+LLM_CACHE_EVICT_EVERY = int(os.environ.get('LLM_CACHE_EVICT_EVERY', 50))
+
+# Hit counts and last_used_at are buffered and written in one batch this often
+LLM_CACHE_HIT_FLUSH_SECONDS = float(os.environ.get('LLM_CACHE_HIT_FLUSH_SECONDS', 30))
+
+# Identical prompts in flight at the same time share one completion
+inflight_completions = SingleFlight()
+
+# cache_key -> [hits, last used] not yet written, and the timer that will write them
+_pending_hits: Dict[str, list] = {}
+_pending_lock = threading.Lock()
+_flush_timer = None
+_stores_since_evict = 0
+
+_stats_lock = threading.Lock()
+cache_stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'evictions': 0,
+               'prompt_tokens_saved': 0, 'completion_tokens_saved': 0}
+
+def cache_stats_increment(**increments):
+    """Add to the process-wide cache counters"""
+    with _stats_lock:
+        for name, value in increments.items():
+            cache_stats[name] += value
+
+def make_cache_key(model: str, system_message: str, prompt: str, params: Dict) -> str:
+    """Hash everything that determines a completion into a fixed-size key"""
+    request = json.dumps({
+        'model': model,
+        'system': system_message,
+        'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+        'params': params
+    }, sort_keys=True)
+    return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+def get_cached_completion(cache_key: str) -> Optional[str]:
+    """Return a fresh cached response text, or None"""
+    try:
+        entry = db.session.get(LLMResponseCache, cache_key)
+        if not entry or entry.expires_at <= datetime.utcnow():
+            cache_stats_increment(misses=1)
+            return None
+
+        _record_hit(cache_key)
+        cache_stats_increment(hits=1, prompt_tokens_saved=entry.prompt_tokens or 0,
+               completion_tokens_saved=entry.completion_tokens or 0)
+        return entry.response_text
+    except Exception as e:
+        metrics.report_error('llm_cache', "LLM cache read error", e)
+        cache_stats_increment(misses=1)
+        return None
+
+def _record_hit(cache_key: str):
+    """Buffer a hit; a timer writes the buffered hits in its own session, never the caller's"""
+    global _flush_timer
+    with _pending_lock:
+        pending = _pending_hits.setdefault(cache_key, [0, None])
+        pending[0] += 1
+        pending[1] = datetime.utcnow()
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(LLM_CACHE_HIT_FLUSH_SECONDS, flush_hits,
+                                           args=(current_app._get_current_object(),))
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+def flush_hits(app=None) -> int:
+    """Write buffered hit counts and last_used_at in one batch, returning the rows updated"""
+    global _flush_timer
+    with _pending_lock:
+        pending = list(_pending_hits.items())
+        _pending_hits.clear()
+        _flush_timer = None
+    if not pending:
+        return 0
+
+    table = LLMResponseCache.__table__
+    statement = table.update().where(table.c.cache_key == db.bindparam('key')).values(
+        hit_count=table.c.hit_count + db.bindparam('hits'),
+        last_used_at=db.bindparam('used')
+    )
+    with (app or current_app._get_current_object()).app_context():
+        try:
+            db.session.execute(statement, [{'key': key, 'hits': hits, 'used': used} for key, (hits, used) in pending])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            metrics.report_error('llm_cache', "LLM cache hit flush error", e)
+            # Keep the hits for the next flush
+            with _pending_lock:
+                for key, (hits, used) in pending:
+                    merged = _pending_hits.setdefault(key, [0, used])
+                    merged[0] += hits
+            return 0
+    return len(pending)
+
+def store_completion(cache_key: str, model: str, response_text: str, prompt_tokens: int = 0,
+                     completion_tokens: int = 0, hours: float = None):
+    """Store a completion in its own session, never the caller's; every LLM_CACHE_EVICT_EVERY stores also evict"""
+    now = datetime.utcnow()
+    values = {
+        'cache_key': cache_key,
+        'model': model,
+        'response_text': response_text,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'size': len(response_text),
+        'hit_count': 0,
+        'created_at': now,
+        'last_used_at': now,
+        'expires_at': now + timedelta(hours=hours or LLM_CACHE_TTL_HOURS)
+    }
+    app = current_app._get_current_object()
+    if has_pending_writes():
+        # The caller's open write transaction holds the SQLite write lock; store once it commits
+        threading.Thread(target=_store, args=(app, values), daemon=True).start()
+    else:
+        _store(app, values)
+
+def _store(app, values: Dict):
+    global _stores_since_evict
+    with app.app_context():
+        try:
+            upsert(LLMResponseCache, values, ['cache_key'])
+            db.session.commit()
+            cache_stats_increment(stores=1)
+        except Exception as e:
+            db.session.rollback()
+            metrics.report_error('llm_cache', "LLM cache write error", e)
+            return
+
+        with _pending_lock:
+            _stores_since_evict += 1
+            due = _stores_since_evict >= LLM_CACHE_EVICT_EVERY
+            if due:
+                _stores_since_evict = 0
+        if due:
+            try:
+                evict()
+            except Exception as e:
+                db.session.rollback()
+                metrics.report_error('llm_cache', "LLM cache eviction error", e)
+
+def evict(max_entries: int = None, max_bytes: int = None) -> int:
+    """Delete expired rows, then least recently used rows until within bounds"""
+    max_entries = LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    max_bytes = LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    deleted = LLMResponseCache.query.filter(
+        LLMResponseCache.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+    entries, total_bytes = db.session.query(
+        db.func.count(LLMResponseCache.cache_key),
+        db.func.coalesce(db.func.sum(LLMResponseCache.size), 0)
+    ).one()
+
+    excess_entries = entries - max_entries
+    excess_bytes = total_bytes - max_bytes
+    if excess_entries > 0 or excess_bytes > 0:
+        # One DELETE of the least recently used rows: the first excess_entries of
+        # them, plus as many as it takes to free excess_bytes
+        lru_order = (LLMResponseCache.last_used_at, LLMResponseCache.cache_key)
+        ranked = db.select(
+            LLMResponseCache.cache_key,
+            db.func.row_number().over(order_by=lru_order).label('position'),
+            (db.func.sum(LLMResponseCache.size).over(order_by=lru_order) - LLMResponseCache.size).label('freed_before')
+        ).subquery()
+        doomed = db.select(ranked.c.cache_key).where(db.or_(
+            ranked.c.position <= excess_entries,
+            ranked.c.freed_before < excess_bytes
+        ))
+        deleted += LLMResponseCache.query.filter(
+            LLMResponseCache.cache_key.in_(doomed)
+        ).delete(synchronize_session=False)
+
+    db.session.commit()
+    cache_stats_increment(evictions=deleted)
+    return deleted
+
+def get_cache_counters() -> Dict:
+    """Process-wide cache counters, without touching the database"""
+    with _stats_lock:
+        return dict(cache_stats)
+
+def get_llm_cache_stats() -> Dict:
+    """Process hit/miss counters plus size and lifetime savings from the table"""
+    stats = get_cache_counters()
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    stats['max_entries'] = LLM_CACHE_MAX_ENTRIES
+    stats['max_bytes'] = LLM_CACHE_MAX_BYTES
+    stats['ttl_hours'] = LLM_CACHE_TTL_HOURS
+    stats['inflight'] = inflight_completions.stats()
+
+    try:
+        entries, total_bytes, hits, tokens_saved = db.session.query(
+            db.func.count(LLMResponseCache.cache_key),
+            db.func.coalesce(db.func.sum(LLMResponseCache.size), 0),
+            db.func.coalesce(db.func.sum(LLMResponseCache.hit_count), 0),
+            db.func.coalesce(db.func.sum(
+                LLMResponseCache.hit_count * (LLMResponseCache.prompt_tokens + LLMResponseCache.completion_tokens)
+            ), 0)
+        ).one()
+        stats.update({
+            'entries': entries,
+            'bytes': total_bytes,
+            'lifetime_hits': hits,
+            'lifetime_tokens_saved': tokens_saved
+        })
+    except Exception as e:
+        metrics.report_error('llm_cache', "LLM cache stats error", e)
+
+    return stats
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+
+class MemoryLRUCache:
+    """Thread-safe in-process LRU cache bounded by entry count and bytes.
+
+    Holds already-decoded objects together with their expiry time, so a hit
+    costs a dict lookup instead of a database query plus json.loads. Callers
+    share the cached objects and must not mutate them.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_ts, stale_until_ts, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self.lookup(key, allow_stale=False)
+        return entry[0] if entry else None
+
+    def lookup(self, key: str, allow_stale: bool = True) -> Optional[Tuple[Any, bool]]:
+        """Return (value, is_stale), or None if missing or past its stale window"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_ts, stale_until_ts, _ = entry
+            now = time.time()
+            if stale_until_ts <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            stale = expires_ts <= now
+            if stale and not allow_stale:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, stale
+
+    def set(self, key: str, value: Any, expires_at: datetime, size: int, stale_until: datetime = None):
+        """Store a value until expires_at (naive UTC), evicting LRU entries to fit.
+
+        With stale_until the entry is kept (and served as stale) past expiry.
+        """
+        if size > self.max_bytes:
+            return
+
+        expires_ts = expires_at.replace(tzinfo=timezone.utc).timestamp()
+        stale_until_ts = (stale_until or expires_at).replace(tzinfo=timezone.utc).timestamp()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_ts, stale_until_ts, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        """Drop a key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        size = self._entries.pop(key)[-1]
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
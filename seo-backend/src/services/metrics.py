@@ -0,0 +1,254 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+from src.services.concurrency import current_tenant
+
+# Attribute cost to individual customers; METRICS_PER_CUSTOMER=false folds
+# them into one series when there are too many customers to label by id
+PER_CUSTOMER = os.environ.get('METRICS_PER_CUSTOMER', 'true').lower() != 'false'
+
+# Histogram buckets in seconds, from hot cache hits to slow completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (name suffix, labels, value) samples of one metric family; histograms
+# use the _bucket, _sum and _count suffixes, everything else ''
+Samples = List[Tuple[str, Dict[str, str], float]]
+
+def customer_label() -> str:
+    """Value of the customer label for work done for the current tenant"""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return 'none'
+    return str(tenant.customer_id) if PER_CUSTOMER else 'all'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+    if value == float('inf'):
+        value_text = '+Inf'
+    elif float(value).is_integer():
+        value_text = str(int(value))
+    else:
+        value_text = repr(float(value))
+    return f"{name}{{{label_text}}} {value_text}" if label_text else f"{name} {value_text}"
+
+class Registry:
+    """Metrics and collectors rendered by /metrics in the Prometheus text format.
+
+    Values are per process; every process serving /metrics is scraped separately.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Samples]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Samples]]]):
+        """Add a function returning (name, type, help, samples) for stats kept elsewhere"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                report_error('metrics', f"Metrics collector error ({collector.__name__})", e)
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(_format_sample(name + suffix, labels, value))
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+class Counter:
+    """Monotonic count per label combination"""
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Samples:
+        with self._lock:
+            values = list(self._values.items())
+        return [('', dict(zip(self.labelnames, key)), value) for key, value in values]
+
+class Histogram:
+    """Bucketed observations (usually seconds) per label combination"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [observations per bucket, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block; an outcome label is set to ok or error"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            if 'outcome' in self.labelnames:
+                labels['outcome'] = outcome
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Samples:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        samples = []
+        for key, counts, total, count in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, observations in zip(self.buckets + (float('inf'),), counts):
+                cumulative += observations
+                samples.append(('_bucket', dict(labels, le=_format_bound(bound)), cumulative))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, count))
+        return samples
+
+def _format_bound(bound: float) -> str:
+    if bound == float('inf'):
+        return '+Inf'
+    return repr(float(bound))
+
+def family(name: str, metric_type: str, documentation: str,
+           samples: Iterable[Tuple[Dict[str, str], float]]) -> Tuple[str, str, str, Samples]:
+    """A collected metric family from (labels, value) pairs"""
+    return name, metric_type, documentation, [('', labels, value) for labels, value in samples]
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing each call's duration in a histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Time spent on behalf of each customer, summed over calls (concurrent calls each count)
+customer_seconds = Counter(
+    'seo_customer_seconds_total',
+    'Seconds spent on behalf of a customer by component (dataforseo lookups, openai completions, pdf rendering)',
+    ('component', 'customer')
+)
+
+errors = Counter(
+    'seo_errors_total',
+    'Errors handled with a fallback, by component and exception type',
+    ('component', 'error', 'customer')
+)
+
+# DataForSEO, by endpoint family (serp, keywords_data, domain_analytics, on_page)
+dataforseo_lookups = Counter(
+    'seo_dataforseo_lookups_total',
+    'DataForSEO lookups by cache outcome (hit, stale, miss, joined an in-flight call)',
+    ('endpoint', 'cache', 'customer')
+)
+dataforseo_lookup_seconds = Histogram(
+    'seo_dataforseo_lookup_seconds',
+    'Time to answer a DataForSEO lookup, from the cache or upstream',
+    ('endpoint', 'cache')
+)
+dataforseo_tasks = Counter(
+    'seo_dataforseo_tasks_total',
+    'Tasks sent to DataForSEO (the unit it bills by)',
+    ('endpoint', 'customer')
+)
+dataforseo_request_seconds = Histogram(
+    'seo_dataforseo_request_seconds',
+    'DataForSEO POSTs including retries and backoff',
+    ('endpoint', 'outcome')
+)
+
+# OpenAI
+openai_completions = Counter(
+    'seo_openai_completions_total',
+    'Chat completions by response cache outcome (hit, miss, joined, bypassed, disabled)',
+    ('cache', 'customer')
+)
+openai_tokens = Counter(
+    'seo_openai_tokens_total',
+    'Tokens billed by OpenAI, from the usage in its responses',
+    ('model', 'kind', 'customer')
+)
+openai_request_seconds = Histogram(
+    'seo_openai_request_seconds',
+    'OpenAI chat completion requests (streamed ones until the last chunk)',
+    ('model', 'outcome')
+)
+
+# Reports
+ai_section_seconds = Histogram(
+    'seo_ai_section_seconds',
+    'Generation of a report section, fallbacks included',
+    ('section',)
+)
+pdf_reports = Counter(
+    'seo_pdf_reports_total',
+    'PDF reports rendered',
+    ('outcome', 'customer')
+)
+pdf_render_seconds = Histogram(
+    'seo_pdf_render_seconds',
+    'PDF report rendering',
+    ('outcome',)
+)
+
+def report_error(component: str, message: str, error: Exception):
+    """Print a handled error and count it by component, exception type and customer"""
+    print(f"{message}: {error}")
+    errors.inc(component=component, error=type(error).__name__, customer=customer_label())
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.models.database import db
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, columns: Sequence) -> List:
+    """Sort key values from a cursor, converted back to the columns' Python types"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+    return [
+        datetime.fromisoformat(value) if value is not None and column.type.python_type is datetime else value
+        for column, value in zip(columns, values)
+    ]
+
+def serialize_row(model, row, fields: Sequence[str]) -> Dict:
+    """Dict of the selected fields, decoding only the JSON columns that were asked for"""
+    json_defaults = getattr(model, 'JSON_DEFAULTS', {})
+    item = {}
+    for field in fields:
+        value = getattr(row, field)
+        if field in json_defaults:
+            value = json.loads(value) if value else json_defaults[field]
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        item[field] = value
+    return item
+
+def paginate(model, filters: Sequence, sort_columns: Sequence, descending: bool, fields: Sequence[str],
+             limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """One keyset-paginated page of a model's rows, returning (items, next_cursor).
+
+    Only the requested fields plus the sort key are selected. sort_columns must
+    end in a unique column so every row has a distinct position.
+    """
+    sort_names = [column.key for column in sort_columns]
+    selected = list(dict.fromkeys(list(fields) + sort_names))
+    query = db.session.query(*[getattr(model, name) for name in selected]).filter(*filters)
+
+    if cursor:
+        position = db.tuple_(*sort_columns)
+        after = db.tuple_(*[
+            db.literal(value, column.type) for column, value in zip(sort_columns, decode_cursor(cursor, sort_columns))
+        ])
+        query = query.filter(position < after if descending else position > after)
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in sort_columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], name) for name in sort_names])
+
+    return [serialize_row(model, row, fields) for row in rows], next_cursor
@@ -0,0 +1,142 @@
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.database import db
+from src.models.seo_models import Customer, RankHistory
+
+SECONDS_PER_DAY = 86400
+
+# Raw points newer than this are kept as-is; older days are rolled up to one point per keyword
+RANK_HISTORY_RAW_DAYS = int(os.environ.get('RANK_HISTORY_RAW_DAYS', 30))
+
+def to_timestamp(value: datetime, round_up: bool = False) -> int:
+    """Naive UTC datetime -> unix seconds"""
+    seconds = (value - datetime(1970, 1, 1)).total_seconds()
+    return math.ceil(seconds) if round_up else int(seconds)
+
+def record_points(customer_id: int, points: List[Dict], recorded_at: datetime = None):
+    """Append one point per keyword ({'keyword_id', 'rank', 'search_volume'}); caller commits"""
+    if not points:
+        return
+
+    timestamp = to_timestamp(recorded_at or datetime.utcnow())
+    rows = [{
+        'keyword_id': point['keyword_id'],
+        'recorded_at': timestamp,
+        'customer_id': customer_id,
+        'rank': point.get('rank'),
+        'search_volume': point.get('search_volume'),
+        'samples': 1
+    } for point in points]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        # Two runs within the same second keep the later point
+        stmt = insert(RankHistory)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['keyword_id', 'recorded_at'],
+            set_={'rank': stmt.excluded.rank, 'search_volume': stmt.excluded.search_volume}
+        )
+        db.session.execute(stmt, rows)
+    else:
+        db.session.bulk_insert_mappings(RankHistory, rows)
+
+def get_series(customer_id: int, start: datetime, end: datetime, keyword_ids: List[int] = None) -> Dict[int, List[Dict]]:
+    """Points in [start, end) per keyword id, oldest first"""
+    query = db.session.query(
+        RankHistory.keyword_id, RankHistory.recorded_at, RankHistory.rank,
+        RankHistory.search_volume, RankHistory.samples
+    ).filter(
+        RankHistory.customer_id == customer_id,
+        RankHistory.recorded_at >= to_timestamp(start),
+        RankHistory.recorded_at < to_timestamp(end, round_up=True)
+    )
+    if keyword_ids:
+        # Served by the (keyword_id, recorded_at) primary key
+        query = query.filter(RankHistory.keyword_id.in_(keyword_ids))
+
+    series = {}
+    for row in query.order_by(RankHistory.keyword_id, RankHistory.recorded_at):
+        series.setdefault(row.keyword_id, []).append({
+            'recorded_at': datetime.utcfromtimestamp(row.recorded_at).isoformat(),
+            'rank': row.rank,
+            'search_volume': row.search_volume,
+            'samples': row.samples
+        })
+    return series
+
+def rollup_rank_history(older_than_days: int = None, since: Optional[datetime] = None,
+                        lookback_days: int = 7) -> Dict:
+    """Downsample raw points older than older_than_days to one point per keyword per day.
+
+    Works one customer per transaction through the (customer_id, recorded_at)
+    index. Keyword-days with several points are replaced by one row at
+    midnight with the average rank, peak volume and the number of samples
+    merged; keyword-days already at daily resolution are left alone. Only the
+    lookback_days before the cutoff are examined unless since is given.
+    """
+    started = time.perf_counter()
+    older_than_days = RANK_HISTORY_RAW_DAYS if older_than_days is None else older_than_days
+    cutoff = to_timestamp(datetime.utcnow() - timedelta(days=older_than_days))
+    cutoff -= cutoff % SECONDS_PER_DAY
+
+    if since is not None:
+        first_day = to_timestamp(since)
+    else:
+        first_day = cutoff - lookback_days * SECONDS_PER_DAY
+    first_day -= first_day % SECONDS_PER_DAY
+
+    day = (RankHistory.recorded_at - RankHistory.recorded_at % SECONDS_PER_DAY).label('day')
+    delete_keyword_day = RankHistory.__table__.delete().where(
+        RankHistory.keyword_id == db.bindparam('k_id'),
+        RankHistory.recorded_at >= db.bindparam('day_start'),
+        RankHistory.recorded_at < db.bindparam('day_end')
+    )
+
+    keyword_days = 0
+    points_before = 0
+    for (customer_id,) in db.session.query(Customer.id).order_by(Customer.id).all():
+        groups = db.session.query(
+            RankHistory.keyword_id,
+            day,
+            db.func.avg(RankHistory.rank).label('rank'),
+            db.func.max(RankHistory.search_volume).label('search_volume'),
+            db.func.sum(RankHistory.samples).label('samples'),
+            db.func.count().label('points')
+        ).filter(
+            RankHistory.customer_id == customer_id,
+            RankHistory.recorded_at >= first_day,
+            RankHistory.recorded_at < cutoff
+        ).group_by(RankHistory.keyword_id, day).having(db.func.count() > 1).all()
+
+        if not groups:
+            continue
+
+        db.session.execute(delete_keyword_day, [
+            {'k_id': group.keyword_id, 'day_start': group.day, 'day_end': group.day + SECONDS_PER_DAY}
+            for group in groups
+        ])
+        db.session.bulk_insert_mappings(RankHistory, [{
+            'keyword_id': group.keyword_id,
+            'recorded_at': group.day,
+            'customer_id': customer_id,
+            'rank': round(group.rank) if group.rank is not None else None,
+            'search_volume': group.search_volume,
+            'samples': min(group.samples, 32767)
+        } for group in groups])
+        db.session.commit()
+
+        keyword_days += len(groups)
+        points_before += sum(group.points for group in groups)
+
+    return {
+        'keyword_days_rolled_up': keyword_days,
+        'points_before': points_before,
+        'points_after': keyword_days,
+        'cutoff': datetime.utcfromtimestamp(cutoff).isoformat(),
+        'duration_seconds': round(time.perf_counter() - started, 3)
+    }
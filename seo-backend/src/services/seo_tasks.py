@@ -0,0 +1,186 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, List
+from src.models.database import db
+from src.models.seo_models import Customer, Keyword, Report, Competitor
+from src.services import analysis_snapshots, customer_stats, rank_history
+from src.services.dataforseo_service import ANALYSIS_PARTS, DataForSEOService
+
+def persist_analysis_results(customer_id: int, keywords: List[str], analysis_results: Dict):
+    """Store keyword rankings/data and replace competitors from an analysis run.
+
+    Set-based: one SELECT for the customer's keywords, one executemany UPDATE,
+    one rank history INSERT, one DELETE and one executemany INSERT for
+    competitors and one stats row write, in one transaction.
+    """
+    keyword_rankings = analysis_results.get('keyword_rankings', {})
+    keyword_data = analysis_results.get('keyword_data', {})
+    now = datetime.utcnow()
+
+    # Load every keyword row for the customer at once
+    all_keyword_rows = db.session.query(
+        Keyword.id, Keyword.keyword, Keyword.current_rank, Keyword.previous_rank, Keyword.search_volume
+    ).filter_by(customer_id=customer_id).all()
+    keyword_rows = {row.keyword: row for row in all_keyword_rows}
+
+    keyword_updates = []
+    for keyword in keywords:
+        keyword_entry = keyword_rows.get(keyword)
+        if not keyword_entry:
+            continue
+
+        update = {'id': keyword_entry.id}
+        if keyword in keyword_rankings:
+            # Store previous rank
+            update['previous_rank'] = keyword_entry.current_rank
+            update['current_rank'] = keyword_rankings[keyword].get('current_rank')
+            update['last_updated'] = now
+
+        if keyword in keyword_data:
+            kw_data = keyword_data[keyword]
+            update['search_volume'] = kw_data.get('search_volume')
+            update['difficulty'] = kw_data.get('difficulty')
+
+        if len(update) > 1:
+            keyword_updates.append(update)
+
+    # Rows are grouped by the columns they set, one executemany per group
+    if keyword_updates:
+        db.session.bulk_update_mappings(Keyword, keyword_updates)
+
+    # Append this run to the rank history
+    rank_history.record_points(customer_id, [{
+        'keyword_id': update['id'],
+        'rank': update['current_rank'],
+        'search_volume': update.get('search_volume')
+    } for update in keyword_updates if 'current_rank' in update], now)
+
+    # Update competitors
+    Competitor.query.filter_by(customer_id=customer_id).delete(synchronize_session=False)
+    competitor_rows = [{
+        'customer_id': customer_id,
+        'competitor_url': competitor_data['url'],
+        'competitor_rank': int(competitor_data['average_rank']),
+        'content_analysis': json.dumps(competitor_data),
+        'last_analyzed': now
+    } for competitor_data in analysis_results.get('competitors', [])]
+    if competitor_rows:
+        db.session.bulk_insert_mappings(Competitor, competitor_rows)
+
+    # Refresh the dashboard aggregates from the rows already in hand
+    updates_by_id = {update['id']: update for update in keyword_updates}
+    customer_stats.update_keyword_stats(customer_id, [
+        (
+            updates_by_id.get(row.id, {}).get('current_rank', row.current_rank),
+            updates_by_id.get(row.id, {}).get('previous_rank', row.previous_rank),
+            updates_by_id.get(row.id, {}).get('search_volume', row.search_volume)
+        ) for row in all_keyword_rows
+    ], competitor_count=len(competitor_rows), analyzed_at=now)
+
+    db.session.commit()
+
+def run_customer_analysis(customer_id: int) -> Dict:
+    """Run a full DataForSEO analysis for a customer and persist the results"""
+    customer = Customer.query.get_or_404(customer_id)
+    keywords = json.loads(customer.target_keywords)
+
+    # Perform SEO analysis
+    seo_service = DataForSEOService()
+    analysis_results = seo_service.analyze_customer_seo({
+        'website_url': customer.website_url,
+        'target_keywords': keywords
+    })
+
+    # Keep the results so report generation can reuse them; failed parts are refetched next time
+    fetched_parts = [part for part in ANALYSIS_PARTS if part not in analysis_results['failed_parts']]
+    analysis_snapshots.save_snapshot(customer_id, customer.website_url, keywords, analysis_results, fetched_parts)
+    persist_analysis_results(customer_id, keywords, analysis_results)
+
+    return analysis_results
+
+def run_report_generation(customer_id: int, generate_pdf: bool = False, force: bool = False) -> Dict:
+    """Generate an AI-powered report for a customer, returning its id and sections.
+
+    With force, cached AI responses are bypassed and regenerated.
+    """
+    from src.services.ai_report_service import AIReportService
+
+    customer = Customer.query.get_or_404(customer_id)
+
+    # Reuse the latest analysis, fetching only parts older than the freshness threshold
+    seo_data = analysis_snapshots.get_customer_analysis(customer)
+
+    # Generate AI report
+    ai_service = AIReportService(force_refresh=force)
+    report_data = ai_service.generate_seo_analysis(customer.to_dict(), seo_data)
+
+    report = save_report(customer, seo_data, report_data, ai_service, generate_pdf)
+
+    return {
+        'report_id': report.id,
+        'report_data': report_data
+    }
+
+def build_report_summary(seo_data: Dict, report_data: Dict) -> Dict:
+    """Small digest of a report for list views, stored next to the full body"""
+    ranks = [r.get('current_rank') for r in seo_data.get('keyword_rankings', {}).values() if r.get('current_rank')]
+    technical_audit = seo_data.get('technical_audit') or {}
+    executive_summary = report_data.get('executive_summary') or ''
+
+    return {
+        'keywords_tracked': len(seo_data.get('keyword_rankings', {})),
+        'keywords_ranked': len(ranks),
+        'keywords_top10': sum(1 for rank in ranks if rank <= 10),
+        'average_rank': round(sum(ranks) / len(ranks), 1) if ranks else None,
+        'competitors': len(seo_data.get('competitors', [])),
+        'critical_issues': len(technical_audit.get('critical', [])) if isinstance(technical_audit, dict) else 0,
+        'content_suggestions': len(report_data.get('content_suggestions') or []),
+        'action_items': len(report_data.get('action_plan') or []),
+        'headline': executive_summary[:280]
+    }
+
+def save_report(customer: Customer, seo_data: Dict, report_data: Dict, ai_service, generate_pdf: bool = False) -> Report:
+    """Persist a generated report (and optionally its PDF) and stamp the customer"""
+    customer_id = customer.id
+
+    # Create report record
+    report = Report(
+        customer_id=customer_id,
+        summary=json.dumps(build_report_summary(seo_data, report_data)),
+        ranking_changes=json.dumps(seo_data.get('keyword_rankings', {})),
+        competitor_data=json.dumps(seo_data.get('competitors', [])),
+        content_suggestions=json.dumps(report_data.get('content_suggestions', [])),
+        technical_issues=json.dumps(seo_data.get('technical_audit', {})),
+        ai_analysis=json.dumps({
+            'executive_summary': report_data.get('executive_summary', ''),
+            'ranking_analysis': report_data.get('ranking_analysis', ''),
+            'competitor_analysis': report_data.get('competitor_analysis', ''),
+            'technical_recommendations': report_data.get('technical_recommendations', []),
+            'action_plan': report_data.get('action_plan', [])
+        })
+    )
+
+    # Generate PDF if requested
+    if generate_pdf:
+        pdf_dir = os.path.join(os.path.dirname(__file__), '..', 'reports')
+        os.makedirs(pdf_dir, exist_ok=True)
+
+        pdf_filename = f"seo_report_{customer_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        pdf_path = os.path.join(pdf_dir, pdf_filename)
+
+        generated_pdf = ai_service.generate_pdf_report(customer.to_dict(), report_data, pdf_path)
+        if generated_pdf:
+            report.pdf_path = pdf_path
+
+    db.session.add(report)
+
+    # Update customer's last report date
+    customer.last_report_date = datetime.utcnow()
+
+    db.session.flush()
+    customer_stats.record_report(report)
+
+    db.session.commit()
+
+    return report
@@ -0,0 +1,223 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, Optional
+from src.services.concurrency import RateLimiter, Tenant, Waiter, current_tenant
+
+# Share of upstream capacity each plan tier gets while requests are queued;
+# work done for no customer (fleet refresh, maintenance) runs as 'background'
+TIER_WEIGHTS = {
+    'enterprise': float(os.environ.get('SCHEDULER_WEIGHT_ENTERPRISE', 8)),
+    'professional': float(os.environ.get('SCHEDULER_WEIGHT_PROFESSIONAL', 4)),
+    'starter': float(os.environ.get('SCHEDULER_WEIGHT_STARTER', 2)),
+    'background': float(os.environ.get('SCHEDULER_WEIGHT_BACKGROUND', 1))
+}
+
+# Tier for plans not listed in TIER_WEIGHTS
+DEFAULT_TIER = 'starter'
+
+# A customer's token bucket holds this many seconds of its rate
+TENANT_BURST_SECONDS = float(os.environ.get('SCHEDULER_TENANT_BURST_SECONDS', 30))
+
+def parse_tier_rates(value: str) -> Dict[str, float]:
+    """Per-tier rates from 'starter:5,professional:20,enterprise:50'"""
+    rates = {}
+    for item in value.split(','):
+        if ':' in item:
+            tier, rate = item.split(':', 1)
+            rates[tier.strip()] = float(rate)
+    return rates
+
+def tier_for(tenant: Optional[Tenant]) -> str:
+    """Scheduling tier of a tenant, by subscription plan"""
+    if tenant is None:
+        return 'background'
+    return tenant.plan if tenant.plan in TIER_WEIGHTS else DEFAULT_TIER
+
+def highest_priority(tenants: Iterable[Optional[Tenant]]) -> Optional[Tenant]:
+    """The tenant whose tier has the largest weight (for requests shared by several tenants)"""
+    return max(tenants, key=lambda tenant: TIER_WEIGHTS[tier_for(tenant)], default=None)
+
+class FairScheduler:
+    """Admission control for one upstream API.
+
+    Two layers, both keyed off the current tenant:
+    - throttle(): each customer's token bucket, sized by plan, so one
+      customer can't use more than its rate however much work it queues
+    - slot(): at most max_concurrency calls in flight; when they are all
+      busy, waiters are dispatched by self-clocked weighted fair queuing
+      across plan tiers, so a tier gets capacity in proportion to its weight.
+      aslot() is the same slot for coroutines, so async clients share the cap
+    """
+
+    def __init__(self, name: str, max_concurrency: int, tenant_rates: Dict[str, float]):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.tenant_rates = tenant_rates
+        self._lock = threading.Lock()
+        self._queue = []  # Heap of (finish tag, sequence, tier, waiter)
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._in_flight = 0
+        self._buckets: Dict[int, RateLimiter] = {}
+        self._tiers = {tier: self._empty_tier_stats() for tier in TIER_WEIGHTS}
+
+    @staticmethod
+    def _empty_tier_stats() -> Dict:
+        return {'queue_depth': 0, 'in_flight': 0, 'dispatched': 0, 'queued': 0,
+                'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'throttled': 0, 'throttled_seconds': 0.0}
+
+    def throttle(self, cost: float = 1):
+        """Wait until the current customer's token bucket allows cost more units"""
+        tenant = current_tenant.get()
+        tier = tier_for(tenant)
+        rate = self.tenant_rates.get(tier)
+        if tenant is None or not rate:
+            return
+
+        with self._lock:
+            bucket = self._buckets.get(tenant.customer_id)
+            if bucket is None:
+                bucket = RateLimiter(rate, burst=rate * TENANT_BURST_SECONDS)
+                self._buckets[tenant.customer_id] = bucket
+
+        waited_before = bucket.waited_seconds
+        bucket.acquire(cost)
+        waited = bucket.waited_seconds - waited_before
+        if waited > 0:
+            with self._lock:
+                self._tiers[tier]['throttled'] += 1
+                self._tiers[tier]['throttled_seconds'] += waited
+
+    @contextmanager
+    def slot(self, cost: float = 1):
+        """Hold one of the upstream's concurrency slots, queuing by tier when all are taken"""
+        tier = tier_for(current_tenant.get())
+        started = time.perf_counter()
+        waiter = self._acquire_or_queue(tier, cost)
+        if waiter is not None:
+            waiter.wait()
+            with self._lock:
+                self._dispatched(tier, time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release(tier)
+
+    @asynccontextmanager
+    async def aslot(self, cost: float = 1):
+        """slot() for coroutines: waits on the event loop instead of blocking a thread"""
+        tier = tier_for(current_tenant.get())
+        started = time.perf_counter()
+        waiter = self._acquire_or_queue(tier, cost, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.wait_async()
+            except BaseException:
+                self._abandon(tier, waiter, time.perf_counter() - started)
+                raise
+            with self._lock:
+                self._dispatched(tier, time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release(tier)
+
+    def _acquire_or_queue(self, tier: str, cost: float, loop=None) -> Optional[Waiter]:
+        """Take a free slot (returning None) or queue a waiter for one"""
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._queue:
+                self._in_flight += 1
+                self._dispatched(tier, 0.0)
+                return None
+
+            # A tier's requests are spaced cost / weight apart in virtual time
+            start_tag = max(self._virtual_time, self._last_finish.get(tier, 0.0))
+            finish_tag = start_tag + cost / TIER_WEIGHTS[tier]
+            self._last_finish[tier] = finish_tag
+            waiter = Waiter(loop)
+            heapq.heappush(self._queue, (finish_tag, next(self._sequence), tier, waiter))
+            self._tiers[tier]['queue_depth'] += 1
+            self._tiers[tier]['queued'] += 1
+            return waiter
+
+    def _abandon(self, tier: str, waiter: Waiter, waited: float):
+        """A cancelled coroutine leaves the queue, or passes on a slot granted meanwhile"""
+        with self._lock:
+            if not waiter.granted:
+                self._queue = [entry for entry in self._queue if entry[3] is not waiter]
+                heapq.heapify(self._queue)
+                self._tiers[tier]['queue_depth'] -= 1
+                return
+            self._dispatched(tier, waited)
+        self._release(tier)
+
+    def _dispatched(self, tier: str, waited: float):
+        stats = self._tiers[tier]
+        stats['in_flight'] += 1
+        stats['dispatched'] += 1
+        stats['wait_seconds'] += waited
+        stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+
+    def _release(self, tier: str):
+        with self._lock:
+            self._tiers[tier]['in_flight'] -= 1
+            if not self._queue:
+                self._in_flight -= 1
+                return
+
+            # Hand the slot straight to the waiter with the smallest finish tag
+            finish_tag, _, next_tier, waiter = heapq.heappop(self._queue)
+            self._virtual_time = finish_tag
+            self._tiers[next_tier]['queue_depth'] -= 1
+            waiter.grant()
+
+    def stats(self) -> Dict:
+        """Concurrency, queue depth and wait times per tier"""
+        with self._lock:
+            tiers = {}
+            for tier, stats in self._tiers.items():
+                tiers[tier] = {
+                    'weight': TIER_WEIGHTS[tier],
+                    'tenant_rate': self.tenant_rates.get(tier),
+                    'queue_depth': stats['queue_depth'],
+                    'in_flight': stats['in_flight'],
+                    'dispatched': stats['dispatched'],
+                    'queued': stats['queued'],
+                    # Raw total, so exporters get a counter that never goes down
+                    'wait_seconds': stats['wait_seconds'],
+                    'avg_wait_ms': round(stats['wait_seconds'] / stats['dispatched'] * 1000, 2) if stats['dispatched'] else 0.0,
+                    'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 2),
+                    'throttled': stats['throttled'],
+                    'throttled_seconds': round(stats['throttled_seconds'], 3)
+                }
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self._in_flight,
+                'queue_depth': len(self._queue),
+                'tenants': len(self._buckets),
+                'tiers': tiers
+            }
+
+# DataForSEO: tasks per second per customer; OpenAI: completions per second per customer
+dataforseo_scheduler = FairScheduler(
+    'dataforseo',
+    max_concurrency=int(os.environ.get('DATAFORSEO_MAX_CONCURRENCY', os.environ.get('DATAFORSEO_MAX_PER_HOST', 4))),
+    tenant_rates=parse_tier_rates(os.environ.get('DATAFORSEO_TENANT_RATES', 'starter:5,professional:20,enterprise:50'))
+)
+openai_scheduler = FairScheduler(
+    'openai',
+    max_concurrency=int(os.environ.get('OPENAI_MAX_CONCURRENCY', 8)),
+    tenant_rates=parse_tier_rates(os.environ.get('OPENAI_TENANT_RATES', 'starter:0.5,professional:2,enterprise:5'))
+)
+
+schedulers = {scheduler.name: scheduler for scheduler in (dataforseo_scheduler, openai_scheduler)}
+
+def get_scheduler_stats() -> Dict:
+    """Stats of every upstream scheduler, by name"""
+    return {name: scheduler.stats() for name, scheduler in schedulers.items()}
@@ -6,6 +6,7 @@ export default function Dashboard() {
   const [dashboardData, setDashboardData] = useState(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
+  const [reportStatus, setReportStatus] = useState(null) // queued, running or null
   
   // Mock customer ID for demo - in real app this would come from authentication
   const customerId = 1
@@ -34,8 +35,26 @@ export default function Dashboard() {
     }
   }
 
+  const waitForJob = async (statusUrl) => {
+    // Poll the job until a worker has finished it
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      const response = await fetch(statusUrl)
+      if (!response.ok) {
+        throw new Error('Failed to fetch report status')
+      }
+      
+      const job = await response.json()
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        return job
+      }
+      setReportStatus(job.status)
+    }
+  }
+
   const generateReport = async () => {
     try {
+      setReportStatus('queued')
       const response = await fetch(`/api/seo/customers/${customerId}/generate-report`, {
         method: 'POST',
         headers: {
@@ -44,17 +63,35 @@ export default function Dashboard() {
         body: JSON.stringify({ generate_pdf: true })
       })
       
-      if (response.ok) {
-        alert('Report generated successfully! Check your reports section.')
-        fetchDashboardData() // Refresh data
-      } else {
+      if (!response.ok) {
         alert('Failed to generate report. Please try again.')
+        return
+      }
+      
+      // 202: the report is generated by a background job
+      if (response.status === 202) {
+        const { status_url } = await response.json()
+        const job = await waitForJob(status_url)
+        if (job.status === 'failed') {
+          alert('Report generation failed: ' + (job.error || 'unknown error'))
+          return
+        }
       }
+      
+      alert('Report generated successfully! Check your reports section.')
+      fetchDashboardData() // Refresh data
     } catch (err) {
       alert('Error generating report: ' + err.message)
+    } finally {
+      setReportStatus(null)
     }
   }
 
+  const reportButtonLabel = {
+    queued: 'Report Queued...',
+    running: 'Generating Report...'
+  }[reportStatus] || 'Generate Report'
+
   const getMockDashboardData = () => ({
     customer: {
       name: 'Demo Customer',
@@ -80,7 +117,7 @@ export default function Dashboard() {
       { competitor_url: 'competitor3.com', competitor_rank: 6 }
     ],
     recent_reports: [
-      { id: 1, report_date: '2025-09-01T00:00:00', ai_analysis: 'Recent analysis shows improvement' }
+      { id: 1, report_date: '2025-09-01T00:00:00', ai_analysis_completed: true }
     ]
   })
 
@@ -118,9 +155,9 @@ export default function Dashboard() {
               <h1 className="text-2xl font-bold text-gray-900">SEO Dashboard</h1>
               <p className="text-gray-600">{customer.website_url}</p>
             </div>
-            <Button onClick={generateReport} className="bg-blue-600 hover:bg-blue-700">
+            <Button onClick={generateReport} disabled={reportStatus !== null} className="bg-blue-600 hover:bg-blue-700">
               <FileText className="h-4 w-4 mr-2" />
-              Generate Report
+              {reportButtonLabel}
             </Button>
           </div>
         </div>
@@ -252,7 +289,7 @@ export default function Dashboard() {
                       SEO Report - {new Date(report.report_date).toLocaleDateString()}
                     </h3>
                     <p className="text-sm text-gray-600">
-                      {report.ai_analysis ? 'AI analysis completed' : 'Processing...'}
+                      {report.ai_analysis_completed ? 'AI analysis completed' : 'Processing...'}
                     </p>
                   </div>
                   <Button variant="outline" size="sm">
@@ -265,8 +302,8 @@ export default function Dashboard() {
             <div className="text-center py-8">
               <FileText className="h-12 w-12 text-gray-400 mx-auto mb-4" />
               <p className="text-gray-600">No reports generated yet</p>
-              <Button onClick={generateReport} className="mt-4">
-                Generate Your First Report
+              <Button onClick={generateReport} disabled={reportStatus !== null} className="mt-4">
+                {reportStatus ? reportButtonLabel : 'Generate Your First Report'}
               </Button>
             </div>
           )}